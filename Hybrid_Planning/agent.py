@@ -5,6 +5,9 @@ import yaml
 from core.loop import AgentLoop
 from core.session import MultiMCP
 from core.context import MemoryItem, AgentContext
+from modules.memory_catalog import MemoryCatalog, DEFAULT_CATALOG_CONFIG
+from modules.query_index import get_query_index
+from modules.embeddings import get_client
 import datetime
 from pathlib import Path
 import json
@@ -23,9 +26,18 @@ async def main():
         profile = yaml.safe_load(f)
         mcp_servers_list = profile.get("mcp_servers", [])
         mcp_servers = {server["id"]: server for server in mcp_servers_list}
+        catalog_config = {**DEFAULT_CATALOG_CONFIG, **(profile.get("memory", {}).get("catalog", {}) or {})}
+
+    # Sessions are indexed as soon as a run ends, so the memory server's search finds them at once
+    catalog = MemoryCatalog("memory", path=catalog_config["path"]) if catalog_config["enabled"] else None
+    # Answers of earlier sessions are reused for repeated or paraphrased questions (AgentLoop.run)
+    query_index = get_query_index(profile.get("memory", {}).get("similar_queries"), catalog=catalog,
+                                  embed=get_client().embed_batch)
 
     multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
     await multi_mcp.initialize()
+    # Hide servers that failed discovery from perception's server selection
+    mcp_servers = {sid: cfg for sid, cfg in mcp_servers.items() if sid not in multi_mcp.unavailable}
     
     try:
         while True:
@@ -48,6 +60,9 @@ async def main():
                     current_session = context.session_id
 
                 result = await agent.run()
+                context.memory.close()  # fold this run's journal into the session JSON
+                if catalog is not None:
+                    catalog.update_session(context.memory.memory_path)
 
                 if isinstance(result, dict):
                     answer = result["result"]
@@ -66,6 +81,12 @@ async def main():
                     break
     except KeyboardInterrupt:
         print("\n👋 Received exit signal. Shutting down...")
+    finally:
+        if query_index is not None and query_index.lookups:
+            stats = query_index.stats()
+            log("memory", f"Similar-query reuse: {stats['lexical_hits']} lexical + {stats['semantic_hits']} semantic hits "
+                          f"in {stats['lookups']} lookups, {stats['stages']['total']['p50_ms']:.3f} ms p50")
+        await multi_mcp.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
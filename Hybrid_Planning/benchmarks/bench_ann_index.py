@@ -0,0 +1,104 @@
+# benchmarks/bench_ann_index.py
+#
+# Recall@k versus query latency versus memory for the index types in modules/ann_index.py,
+# on synthetic clustered 768-dim vectors (unit length, like normalized nomic embeddings).
+# Exact Flat-IP search is the ground truth. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_ann_index.py --sizes 20000 100000
+#   python benchmarks/bench_ann_index.py --sizes 200000 --ef-search 32 64 128 --nprobe 8 16 32
+#
+# Use the results to pick `index:` settings in config/profiles.yaml per deployment.
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.ann_index import configure_search, index_memory_bytes, maybe_promote, merge_config, new_index, prepare_vectors
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian clusters around random centres, so neighbourhoods look like topical embeddings."""
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centres[labels] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build(config: dict, vectors: np.ndarray):
+    index = new_index(vectors.shape[1], config)
+    ids = np.arange(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), 50_000):
+        index.add_with_ids(prepare_vectors(vectors[start:start + 50_000], index, config), ids[start:start + 50_000])
+    return configure_search(maybe_promote(index, config), config)
+
+
+def evaluate(index, config: dict, queries: np.ndarray, truth: np.ndarray, k: int):
+    timings, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        _, I = index.search(prepare_vectors(q, index, config), k)
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += len(set(I[0].tolist()) & set(expected.tolist()))
+    return hits / truth.size, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN index recall / latency / memory benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[64, 192])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        # Queries come from the same clusters as the corpus but are not in it
+        data = synthetic_corpus(n + args.queries, args.dim, clusters=max(10, n // 500), rng=rng)
+        vectors, queries = data[:n], data[n:]
+        exact = faiss.IndexFlatIP(args.dim)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+
+        print(f"\n{n} vectors, dim {args.dim}, recall@{args.k} against exact Flat-IP")
+        print(f"{'index':>30} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'memory MB':>10}")
+
+        configs = [("flat-ip", {"type": "flat"})]
+        for m in args.hnsw_m:
+            for ef in args.ef_search:
+                configs.append((f"hnsw m={m} ef={ef}", {"type": "hnsw", "promote_at": 0,
+                                                        "hnsw": {"m": m, "ef_search": ef}}))
+        for pq_m in args.pq_m:
+            for nprobe in args.nprobe:
+                configs.append((f"ivfpq m={pq_m} nprobe={nprobe}", {"type": "ivfpq", "promote_at": 0,
+                                                                    "ivfpq": {"m": pq_m, "nprobe": nprobe}}))
+
+        built = {}
+        for label, config in configs:
+            config = merge_config(config)
+            # Reuse one build per structure and only vary the query-time parameter
+            key = (config["type"], config["hnsw"]["m"] if config["type"] == "hnsw" else config["ivfpq"]["m"])
+            if key not in built:
+                start = time.perf_counter()
+                index = build(config, vectors)
+                built[key] = (index, time.perf_counter() - start, index_memory_bytes(index))
+            index, build_s, memory = built[key]
+            configure_search(index, config)
+            recall, p50 = evaluate(index, config, queries, truth, args.k)
+            print(f"{label:>30} {build_s:>8.2f} {recall:>7.3f} {p50:>8.3f} {memory / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
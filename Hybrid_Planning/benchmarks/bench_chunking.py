@@ -0,0 +1,141 @@
+# benchmarks/bench_chunking.py
+#
+# Chunking throughput and boundary agreement of the chunking strategies on the fixture
+# documents in benchmarks/fixtures/chunking. Boundaries are compared, within a word
+# tolerance, against the fixtures' marked topic changes and against the LLM segmenter.
+# Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_chunking.py                          # offline: hashed bag-of-words embedder
+#   python benchmarks/bench_chunking.py --embedder ollama        # nomic-embed-text breakpoints
+#   python benchmarks/bench_chunking.py --record-llm             # run phi4 semantic_merge and save its boundaries
+#
+# LLM agreement is reported from fixtures/chunking/llm_reference.json once it has been recorded.
+
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.chunking import get_chunker
+
+FIXTURES = ROOT / "benchmarks" / "fixtures" / "chunking"
+LLM_REFERENCE = FIXTURES / "llm_reference.json"
+MARKER = "<!-- boundary -->"
+STOPWORDS = set("a an the and or of to in on for with is are was were be by as at it its this that from "
+                "after before while than then into over under so not no can will may most more each".split())
+
+
+def load_fixture(path: Path):
+    """Return the markdown without markers and the word offsets of the marked boundaries."""
+    lines, boundaries, words = [], [], 0
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip() == MARKER:
+            boundaries.append(words)
+            continue
+        lines.append(line)
+        words += len(line.split())
+    return "\n".join(lines), boundaries
+
+
+def chunk_boundaries(chunks) -> list:
+    return np.cumsum([len(chunk.split()) for chunk in chunks])[:-1].tolist()
+
+
+def boundary_f1(predicted, reference, tolerance: int) -> float:
+    if not predicted and not reference:
+        return 1.0
+    if not predicted or not reference:
+        return 0.0
+    matched = set()
+    hits = 0
+    for p in predicted:
+        for j, r in enumerate(reference):
+            if j not in matched and abs(p - r) <= tolerance:
+                matched.add(j)
+                hits += 1
+                break
+    precision, recall = hits / len(predicted), hits / len(reference)
+    return 2 * precision * recall / (precision + recall) if hits else 0.0
+
+
+def hashed_embed(texts, dim: int = 768) -> np.ndarray:
+    """Offline stand-in embedder: feature-hashed bag of content words."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for word in re.findall(r"[a-z]+", text.lower()):
+            if word not in STOPWORDS and len(word) > 2:
+                vectors[i, zlib.crc32(word.encode()) % dim] += 1.0
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking strategy benchmark")
+    parser.add_argument("--embedder", choices=["hash", "ollama"], default="hash")
+    parser.add_argument("--record-llm", action="store_true", help="run the LLM segmenter and save its boundaries")
+    parser.add_argument("--tolerance", type=int, default=20, help="boundary match tolerance in words")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.embedder == "ollama":
+        from modules.embeddings import get_client
+        embed = get_client("http://localhost:11434", "nomic-embed-text").embed_batch
+    else:
+        embed = hashed_embed
+
+    fixtures = {path.name: load_fixture(path) for path in sorted(FIXTURES.glob("*.md")) if path.name != "README.md"}
+
+    llm_reference = json.loads(LLM_REFERENCE.read_text()) if LLM_REFERENCE.exists() else {}
+    if args.record_llm:
+        from mcp_server_2 import semantic_merge
+        for name, (markdown, _) in fixtures.items():
+            start = time.perf_counter()
+            chunks = semantic_merge(markdown)
+            llm_reference[name] = {"boundaries": chunk_boundaries(chunks), "chunks": len(chunks),
+                                   "seconds": time.perf_counter() - start}
+        LLM_REFERENCE.write_text(json.dumps(llm_reference, indent=2))
+
+    strategies = {
+        "structure": get_chunker("structure"),
+        "structure+embed": get_chunker("structure", embed=embed),
+    }
+
+    print(f"fixtures: {len(fixtures)}, embedder: {args.embedder}, tolerance: ±{args.tolerance} words")
+    print(f"{'strategy':>16} {'chunks':>7} {'chunks/s':>10} {'F1 vs topics':>13} {'F1 vs llm':>10}")
+    for label, chunker in strategies.items():
+        total_chunks, topic_f1, llm_f1 = 0, [], []
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for markdown, _ in fixtures.values():
+                chunker(markdown)
+        elapsed = time.perf_counter() - start
+        for name, (markdown, reference) in fixtures.items():
+            chunks = chunker(markdown)
+            total_chunks += len(chunks)
+            predicted = chunk_boundaries(chunks)
+            topic_f1.append(boundary_f1(predicted, reference, args.tolerance))
+            if name in llm_reference:
+                llm_f1.append(boundary_f1(predicted, llm_reference[name]["boundaries"], args.tolerance))
+        rate = total_chunks * args.repeat / elapsed
+        llm_col = f"{np.mean(llm_f1):.2f}" if llm_f1 else "n/a"
+        print(f"{label:>16} {total_chunks:>7} {rate:>10.1f} {np.mean(topic_f1):>13.2f} {llm_col:>10}")
+
+    if llm_reference:
+        chunks = sum(entry["chunks"] for entry in llm_reference.values())
+        seconds = sum(entry["seconds"] for entry in llm_reference.values())
+        llm_topic_f1 = np.mean([boundary_f1(llm_reference[name]["boundaries"], reference, args.tolerance)
+                                for name, (_, reference) in fixtures.items() if name in llm_reference])
+        print(f"{'llm (recorded)':>16} {chunks:>7} {chunks / seconds:>10.1f} {llm_topic_f1:>13.2f} {'1.00':>10}")
+    else:
+        print("llm: no recorded reference; run with --record-llm while Ollama is serving phi4")
+
+
+if __name__ == "__main__":
+    main()
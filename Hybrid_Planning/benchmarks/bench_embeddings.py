@@ -0,0 +1,212 @@
+# benchmarks/bench_embeddings.py
+#
+# The embedding client of modules/embeddings.py against a stub Ollama server on localhost
+# (http.server in a background thread), so no Ollama is needed. First checks the failure
+# handling: batched /api/embed in order, retry of 5xx responses and dropped connections, the
+# /api/embeddings fallback on a 404, a changed dimension and an unreachable server, all of
+# which must raise EmbeddingError instead of returning a placeholder vector. Then times the
+# old one-text-per-request loop (a fresh connection each) against embed_batch(). Run from the
+# Hybrid_Planning directory:
+#
+#   python benchmarks/bench_embeddings.py
+#   python benchmarks/bench_embeddings.py --texts 2000 --request-ms 20 --per-text-ms 1
+#
+# The stub answers a request after --request-ms plus --per-text-ms per text, a rough model of
+# Ollama's fixed overhead per call and its cost per input.
+
+import argparse
+import hashlib
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.embeddings import EmbeddingClient, EmbeddingError
+
+
+def stub_vector(text: str, dim: int) -> list:
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+class StubOllama:
+    """A local stand-in for Ollama's /api/embed and /api/embeddings with scriptable faults."""
+
+    def __init__(self, dim: int = 768, request_ms: float = 0.0, per_text_ms: float = 0.0):
+        self.dim = dim
+        self.request_ms = request_ms
+        self.per_text_ms = per_text_ms
+        self.fail_next = 0        # answer this many requests with 503
+        self.drop_next = 0        # close this many connections without an answer
+        self.legacy = False       # 404 on /api/embed, as servers before the batch API
+        self.requests = {"/api/embed": 0, "/api/embeddings": 0}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client's pooled connections are reused
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, body = stub.answer(self.path, payload)
+                if status is None:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True).start()
+
+    def answer(self, path: str, payload: dict):
+        with self._lock:
+            if path in self.requests:
+                self.requests[path] += 1
+            if self.drop_next:
+                self.drop_next -= 1
+                return None, None
+            if self.fail_next:
+                self.fail_next -= 1
+                return 503, {"error": "server busy"}
+        if path == "/api/embed" and not self.legacy:
+            texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            time.sleep((self.request_ms + self.per_text_ms * len(texts)) / 1000)
+            return 200, {"model": payload["model"], "embeddings": [stub_vector(t, self.dim) for t in texts]}
+        if path == "/api/embeddings":
+            time.sleep((self.request_ms + self.per_text_ms) / 1000)
+            return 200, {"embedding": stub_vector(payload["prompt"], self.dim)}
+        return 404, {"error": f"{path} not found"}
+
+    def reset(self):
+        with self._lock:
+            self.requests = dict.fromkeys(self.requests, 0)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def expect_error(fn) -> str:
+    try:
+        fn()
+    except EmbeddingError as e:
+        return str(e)
+    raise AssertionError("expected EmbeddingError")
+
+
+def check_faults(stub: StubOllama) -> list:
+    texts = [f"chunk {i} of a stub document" for i in range(70)]
+    expected = np.array([stub_vector(t, stub.dim) for t in texts], dtype=np.float32)
+    rows = []
+
+    def client(**kwargs):
+        return EmbeddingClient(stub.url, "stub", batch_size=16, backoff=0.01, **kwargs)
+
+    stub.reset()
+    vectors = client().embed_batch(texts)
+    assert np.array_equal(vectors, expected), "batched vectors out of order"
+    rows.append(("batched, in order", f"{stub.requests['/api/embed']} requests for {len(texts)} texts"))
+
+    stub.reset()
+    stub.fail_next = 2
+    assert np.array_equal(client(max_concurrency=1).embed_batch(texts[:16]), expected[:16])
+    rows.append(("503 twice, then ok", f"retried, {stub.requests['/api/embed']} requests"))
+
+    stub.reset()
+    stub.drop_next = 1
+    assert np.array_equal(client(max_concurrency=1).embed_batch(texts[:16]), expected[:16])
+    rows.append(("connection dropped", f"retried, {stub.requests['/api/embed']} requests"))
+
+    stub.reset()
+    stub.fail_next = 10
+    error = expect_error(lambda: client(max_retries=2, max_concurrency=1).embed_batch(texts[:4]))
+    stub.fail_next = 0
+    rows.append(("503 on every attempt", f"EmbeddingError: {error}"))
+
+    stub.reset()
+    stub.legacy = True
+    legacy = client()
+    assert np.array_equal(legacy.embed_batch(texts[:8]), expected[:8])
+    stub.legacy = False
+    rows.append(("404 on /api/embed", f"fell back to {stub.requests['/api/embeddings']} /api/embeddings calls"))
+
+    changed = client()
+    changed.embed(texts[0])
+    stub.dim //= 2
+    error = expect_error(lambda: changed.embed(texts[1]))
+    stub.dim *= 2
+    rows.append(("dimension changed", f"EmbeddingError: {error}"))
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        closed_port = s.getsockname()[1]
+    error = expect_error(lambda: EmbeddingClient(f"http://127.0.0.1:{closed_port}", "stub", max_retries=1,
+                                                 backoff=0.01).embed("hello"))
+    rows.append(("server unreachable", f"EmbeddingError: {error[:60]}..."))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--request-ms", type=float, default=5.0, help="stub latency per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="stub latency per embedded text")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    stub = StubOllama(args.dim)
+    try:
+        print(f"{'fault':<24} result")
+        for name, result in check_faults(stub):
+            print(f"{name:<24} {result}")
+
+        stub.request_ms, stub.per_text_ms = args.request_ms, args.per_text_ms
+        texts = [f"text {i} about agent memory and vector search" for i in range(args.texts)]
+        print(f"\n{args.texts} texts, stub latency {args.request_ms:g} ms per request + "
+              f"{args.per_text_ms:g} ms per text")
+        print(f"{'client':<36} {'seconds':>8} {'texts/s':>9} {'requests':>9}")
+
+        stub.reset()
+        start = time.perf_counter()
+        for text in texts:  # the old get_embedding(): one text per request, a new connection each
+            requests.post(f"{stub.url}/api/embeddings", json={"model": "stub", "prompt": text}).json()
+        seconds = time.perf_counter() - start
+        print(f"{'one text per request (old)':<36} {seconds:>8.2f} {args.texts / seconds:>9.0f} "
+              f"{stub.requests['/api/embeddings']:>9}")
+
+        stub.reset()
+        client = EmbeddingClient(stub.url, "stub", batch_size=args.batch_size, max_concurrency=args.concurrency)
+        start = time.perf_counter()
+        vectors = client.embed_batch(texts)
+        seconds = time.perf_counter() - start
+        assert vectors.shape == (args.texts, args.dim)
+        name = f"embed_batch ({args.batch_size} x {args.concurrency} in flight)"
+        print(f"{name:<36} {seconds:>8.2f} {args.texts / seconds:>9.0f} {stub.requests['/api/embed']:>9}")
+        client.close()
+    finally:
+        stub.close()
+
+
+if __name__ == "__main__":
+    main()
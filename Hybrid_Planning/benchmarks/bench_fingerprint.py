@@ -0,0 +1,160 @@
+# benchmarks/bench_fingerprint.py
+#
+# Change detection cost of a reindex run over a generated folder of large files: the old
+# whole-file md5 against the stat-first fingerprints of modules/fingerprint.py. Then, with
+# --chunks random vectors per file stored in a DocumentStore, a whole no-op reindex: opening
+# the store before fingerprinting (the old process_documents) against process_documents(),
+# which plans against doc_index_cache.json and never loads index.bin, metadata or BM25.
+# Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_fingerprint.py --files 200 --mb 2
+#   python benchmarks/bench_fingerprint.py --files 50 --mb 64 --chunks 500
+#
+# Hashing times are for files already in the page cache; from a cold disk the hashed rows are
+# bound by read throughput while the stat-only row is unchanged. process_documents() needs the
+# server's dependencies (mcp, trafilatura, markitdown, ...); without them its row is skipped.
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.doc_index import DocumentStore
+from modules.fingerprint import fingerprint
+
+HOUR_NS = 3600 * 10**9
+
+
+def make_files(folder: Path, n: int, mb: int) -> list:
+    block = os.urandom(1 << 20)
+    paths = []
+    for i in range(n):
+        path = folder / f"doc_{i}.bin"
+        with open(path, "wb") as f:
+            for j in range(mb):
+                f.write(block[j % 997:] + block[:j % 997])
+            f.write(i.to_bytes(8, "little"))  # every file differs
+        paths.append(path)
+    set_mtime(paths, time.time_ns() - 2 * HOUR_NS)
+    return paths
+
+
+def set_mtime(paths: list, mtime_ns: int):
+    for path in paths:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def timed(fn, paths: list):
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = [fn(path) for path in paths]
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return results, seconds, peak
+
+
+def build_store(index_dir: Path, paths: list, manifest: dict, chunks: int, dim: int, config, shards: int):
+    rng = np.random.default_rng(0)
+    store = DocumentStore(index_dir, config, shards)
+    for path in paths:
+        store.add_file(path.name, manifest[path], [{"doc": path.name, "chunk": f"chunk {i} of {path.stem}",
+                                                    "chunk_id": f"{path.stem}_{i}"} for i in range(chunks)],
+                       rng.standard_normal((chunks, dim)).astype(np.float32))
+    store.save()
+    store.metadata.close()
+
+
+def open_then_fingerprint(index_dir: Path, paths: list, config, shards: int):
+    """The old no-op reindex: DocumentStore first, then the stat-first fingerprint of every file."""
+    store = DocumentStore(index_dir, config, shards)
+    results = [fingerprint(path, store.file_fingerprint(path.name)) for path in paths]
+    store.metadata.close()
+    return results
+
+
+def reindex_rows(folder: Path, paths: list, manifest: dict, chunks: int, dim: int) -> list:
+    try:
+        import mcp_server_2 as server
+    except ImportError as e:
+        print(f"process_documents() skipped: {e}")
+        server = None
+    config, shards = (server.INDEX_CONFIG, server.SHARDS) if server else (None, 0)
+    index_dir = folder / "faiss_index"
+    build_store(index_dir, paths, manifest, chunks, dim, config, shards)
+    rows = []
+
+    start = time.perf_counter()
+    results = open_then_fingerprint(index_dir, paths, config, shards)
+    assert all(unchanged for _, unchanged in results)
+    rows.append(("no-op reindex, store opened first", time.perf_counter() - start, 0, 0))
+
+    if server is not None:
+        start = time.perf_counter()
+        stats = server.process_documents(doc_path=paths[0].parent, index_dir=index_dir)
+        assert stats["files"] == 0
+        rows.append(("no-op process_documents()", time.perf_counter() - start, 0, 0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--mb", type=int, default=2, help="size of each file in MiB")
+    parser.add_argument("--chunks", type=int, default=100, help="stored chunks per file for the reindex rows")
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = Path(tmp) / "documents"
+        docs.mkdir()
+        paths = make_files(docs, args.files, args.mb)
+        print(f"{args.files} files x {args.mb} MiB\n")
+        rows = []
+
+        md5s, seconds, peak = timed(lambda p: hashlib.md5(Path(p).read_bytes()).hexdigest(), paths)
+        rows.append(("md5 read_bytes (old, every run)", seconds, peak, args.files))
+
+        manifest = dict(zip(paths, md5s))
+        results, seconds, peak = timed(lambda p: fingerprint(p, manifest[p]), paths)
+        assert all(unchanged for _, unchanged in results)
+        rows.append(("first run on an md5 cache", seconds, peak, args.files))
+
+        manifest = {p: fp for p, (fp, _) in zip(paths, results)}
+        results, seconds, peak = timed(lambda p: fingerprint(p, manifest[p]), paths)
+        assert all(unchanged for _, unchanged in results)
+        rows.append(("no-op run (stat only)", seconds, peak, 0))
+
+        set_mtime(paths, time.time_ns() - HOUR_NS)  # touched, content unchanged
+        results, seconds, peak = timed(lambda p: fingerprint(p, manifest[p]), paths)
+        assert all(unchanged for _, unchanged in results)
+        rows.append(("all files touched", seconds, peak, args.files))
+
+        manifest = {p: fp for p, (fp, _) in zip(paths, results)}
+        with open(paths[0], "r+b") as f:
+            f.write(b"changed")
+        set_mtime(paths[:1], time.time_ns() - HOUR_NS // 2)
+        results, seconds, peak = timed(lambda p: fingerprint(p, manifest[p]), paths)
+        assert [unchanged for _, unchanged in results].count(False) == 1
+        rows.append(("one file edited", seconds, peak, 1))
+
+        manifest = {p: fp for p, (fp, _) in zip(paths, results)}
+        rows += reindex_rows(Path(tmp), paths, manifest, args.chunks, args.dim)
+
+    print(f"{'run':<34} {'total ms':>10} {'per file us':>12} {'peak MiB':>9} {'hashed':>7}")
+    for name, seconds, peak, hashed in rows:
+        print(f"{name:<34} {seconds * 1000:>10.1f} {seconds * 1e6 / args.files:>12.1f} "
+              f"{peak / 2**20:>9.1f} {hashed:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_hybrid_search.py
+#
+# Dense vs lexical (BM25) vs hybrid document search, two parts:
+#   1. relevance: recall@k and MRR on the labelled queries in benchmarks/fixtures/relevance.json,
+#      over the chunks shipped in faiss_index (re-embedded with the chosen embedder);
+#   2. latency: BM25 query time on synthetic corpora with a Zipfian vocabulary, next to an
+#      exact FAISS search over the same number of 768-dim vectors.
+# Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_hybrid_search.py                      # offline: hashed bag-of-words embedder
+#   python benchmarks/bench_hybrid_search.py --embedder ollama    # nomic-embed-text, as in production
+#   python benchmarks/bench_hybrid_search.py --sizes 10000 100000 --fusion weighted
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_chunking import hashed_embed
+from modules.bm25 import BM25Index
+from modules.doc_index import DocumentStore, ResidentIndex, metadata_by_id
+
+FIXTURE = ROOT / "benchmarks" / "fixtures" / "relevance.json"
+
+
+def load_corpus(index_dir: Path):
+    """Chunk metadata of the shipped index, from metadata.sqlite or the legacy metadata.json."""
+    if (index_dir / "metadata.sqlite").exists():
+        import sqlite3
+        with sqlite3.connect(str(index_dir / "metadata.sqlite")) as conn:
+            rows = conn.execute("SELECT doc, chunk, chunk_id FROM chunks").fetchall()
+        return [{"doc": doc, "chunk": chunk, "chunk_id": chunk_id} for doc, chunk, chunk_id in rows]
+    return list(metadata_by_id(json.loads((index_dir / "metadata.json").read_text())).values())
+
+
+def build_store(entries, embed, workdir: Path) -> ResidentIndex:
+    by_doc = {}
+    for entry in entries:
+        by_doc.setdefault(entry["doc"], []).append({k: entry[k] for k in ("doc", "chunk", "chunk_id")})
+    store = DocumentStore(workdir)
+    for doc, chunks in by_doc.items():
+        store.add_file(doc, "bench", chunks, np.asarray(embed([c["chunk"] for c in chunks]), dtype=np.float32))
+    store.save()
+    return ResidentIndex(workdir, mmap=False)
+
+
+def relevance(index: ResidentIndex, embed, queries, k: int, fusion: str):
+    print(f"\nrelevance on {len(queries)} labelled queries, recall@{k} / MRR@{k}, fusion: {fusion}")
+    print(f"{'mode':>8} {'recall':>7} {'MRR':>6} {'p50 ms':>8}")
+    vectors = np.asarray(embed([q["query"] for q in queries]), dtype=np.float32)
+    for mode in ("dense", "lexical", "hybrid"):
+        recalls, ranks, timings = [], [], []
+        for q, vec in zip(queries, vectors):
+            start = time.perf_counter()
+            results = index.hybrid_search(q["query"], vec, k, mode=mode, fusion=fusion)
+            timings.append((time.perf_counter() - start) * 1000)
+            found = [entry["chunk_id"] for entry in results]
+            relevant = set(q["relevant"])
+            recalls.append(len(relevant & set(found)) / len(relevant))
+            ranks.append(next((1 / (i + 1) for i, cid in enumerate(found) if cid in relevant), 0.0))
+        print(f"{mode:>8} {np.mean(recalls):>7.3f} {np.mean(ranks):>6.3f} {statistics.median(timings):>8.3f}")
+
+
+def synthetic_texts(n: int, rng: np.random.Generator, vocab: int = 50_000, length: int = 180):
+    words = np.array([f"w{i}" for i in range(vocab)])
+    ranks = np.minimum(rng.zipf(1.2, size=(n, length)), vocab) - 1
+    return [" ".join(words[row]) for row in ranks], words
+
+
+def latency(sizes, k: int, queries: int, rng: np.random.Generator):
+    print(f"\nlatency over synthetic chunks (180 words, Zipfian vocabulary), top-{k}")
+    print(f"{'chunks':>8} {'build s':>8} {'bm25 p50 ms':>12} {'bm25 p95 ms':>12} {'flat p50 ms':>12} {'npz MB':>7}")
+    for n in sizes:
+        texts, words = synthetic_texts(n, rng)
+        start = time.perf_counter()
+        lexical = BM25Index()
+        lexical.add(range(n), texts)
+        lexical.search("w1", k)  # builds the term-major postings
+        build_s = time.perf_counter() - start
+
+        # three-term queries mixing common and rare terms, like a name plus context words
+        query_terms = rng.integers(0, 2000, size=(queries, 3))
+        timings = []
+        for terms in query_terms:
+            query = " ".join(words[terms])
+            start = time.perf_counter()
+            lexical.search(query, k)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        dense = faiss.IndexFlatIP(768)
+        dense.add(rng.standard_normal((n, 768), dtype=np.float32))
+        probe = rng.standard_normal((queries, 768), dtype=np.float32)
+        dense_timings = []
+        for q in probe:
+            start = time.perf_counter()
+            dense.search(q[None, :], k)
+            dense_timings.append((time.perf_counter() - start) * 1000)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bm25.npz"
+            lexical.save(path)
+            size_mb = path.stat().st_size / 2**20
+        p95 = float(np.percentile(timings, 95))
+        print(f"{n:>8} {build_s:>8.2f} {statistics.median(timings):>12.3f} {p95:>12.3f} "
+              f"{statistics.median(dense_timings):>12.3f} {size_mb:>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid (FAISS + BM25) search benchmark")
+    parser.add_argument("--embedder", choices=["hash", "ollama"], default="hash")
+    parser.add_argument("--fusion", choices=["rrf", "weighted"], default="rrf")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.embedder == "ollama":
+        from modules.embeddings import get_client
+        embed = get_client("http://localhost:11434", "nomic-embed-text").embed_batch
+    else:
+        embed = hashed_embed
+
+    fixture = json.loads(FIXTURE.read_text())
+    entries = load_corpus(ROOT / fixture["corpus"])
+    workdir = Path(tempfile.mkdtemp(prefix="bench_hybrid_"))
+    try:
+        index = build_store(entries, embed, workdir)
+        print(f"corpus: {len(entries)} chunks from {fixture['corpus']}, embedder: {args.embedder}")
+        relevance(index, embed, fixture["queries"], args.k, args.fusion)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latency(args.sizes, args.k, args.queries, np.random.default_rng(0))
+
+
+if __name__ == "__main__":
+    main()
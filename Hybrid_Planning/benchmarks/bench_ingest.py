@@ -0,0 +1,135 @@
+# benchmarks/bench_ingest.py
+#
+# Throughput of the old serial process_documents loop versus the staged ingestion pipeline
+# over a generated corpus of local markdown and PDF files. The LLM segmenter and the embedder
+# are stubbed with fixed latencies, so no Ollama is needed. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_ingest.py --files 40 --workers 1 2 4
+#   python benchmarks/bench_ingest.py --files 40 --llm-ms 200 --embed-ms 30
+#
+# Every other file is a PDF when PyMuPDF is installed (--no-pdf for a markdown-only corpus).
+# PDF extraction is CPU bound, so its speedup is limited by the number of cores.
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.doc_index import DocumentStore
+from modules.ingest import IngestPipeline, extract_markdown
+
+WORDS = ("agent memory planner tool search index vector chunk embedding document retrieval "
+         "latency throughput cricket market weather policy model server session").split()
+
+
+def make_corpus(doc_dir: Path, n: int, paragraphs: int, rng: np.random.Generator, pdf: bool = True):
+    try:
+        import pymupdf
+    except ImportError:
+        pymupdf = None
+    if not pdf:
+        pymupdf = None
+
+    for i in range(n):
+        sections = []
+        for p in range(paragraphs):
+            body = " ".join(rng.choice(WORDS, size=80))
+            sections.append(f"## Section {p}\n\n{body}.")
+        text = f"# Document {i}\n\n" + "\n\n".join(sections)
+        if pymupdf is not None and i % 2:
+            pdf = pymupdf.open()
+            for section in sections:
+                page = pdf.new_page()
+                page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), section, fontsize=10)
+            pdf.save(str(doc_dir / f"doc_{i}.pdf"))
+        else:
+            (doc_dir / f"doc_{i}.md").write_text(text, encoding="utf-8")
+
+
+class StubModels:
+    """Fixed-latency stand-ins for the phi4 segmenter and nomic-embed-text."""
+
+    def __init__(self, llm_ms: float, embed_ms: float, dim: int):
+        self.llm_ms = llm_ms
+        self.embed_ms = embed_ms
+        self.dim = dim
+
+    def segment(self, markdown: str) -> list:
+        words = markdown.split()
+        for _ in range(0, len(words), 512):  # one LLM call per 512-word window, as semantic_merge does
+            time.sleep(self.llm_ms / 1000)
+        return [" ".join(words[i:i + 128]) for i in range(0, len(words), 128)]
+
+    def embed(self, chunks) -> np.ndarray:
+        time.sleep(self.embed_ms / 1000)  # one batched /api/embed request
+        rng = np.random.default_rng(len(chunks))
+        return rng.standard_normal((len(chunks), self.dim), dtype=np.float32)
+
+
+def serial_ingest(files, store: DocumentStore, models: StubModels, image_dir: Path) -> int:
+    """The pre-pipeline loop: extract, segment, embed and save the whole index per file."""
+    chunks_total = 0
+    for file, fhash in files:
+        markdown = extract_markdown(str(file), str(image_dir))
+        chunks = models.segment(markdown)
+        vectors = models.embed(chunks)
+        metadata = [{"doc": file.name, "chunk": c, "chunk_id": f"{file.stem}_{i}"} for i, c in enumerate(chunks)]
+        store.add_file(file.name, fhash, metadata, vectors)
+        store.save()
+        chunks_total += len(chunks)
+    return chunks_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Document ingestion pipeline benchmark")
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-ms", type=float, default=100.0)
+    parser.add_argument("--embed-ms", type=float, default=20.0)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--no-pdf", action="store_true", help="generate markdown files only")
+    args = parser.parse_args()
+
+    models = StubModels(args.llm_ms, args.embed_ms, args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        doc_dir = Path(tmp) / "documents"
+        doc_dir.mkdir()
+        make_corpus(doc_dir, args.files, args.paragraphs, np.random.default_rng(0), pdf=not args.no_pdf)
+        files = [(file, str(file.stat().st_size)) for file in sorted(doc_dir.glob("*.*"))]
+        kinds = sorted({file.suffix for file, _ in files})
+        print(f"corpus: {len(files)} files ({', '.join(kinds)}), "
+              f"llm {args.llm_ms:.0f}ms/call, embed {args.embed_ms:.0f}ms/batch")
+
+        print(f"{'mode':>22} {'seconds':>8} {'files/s':>8} {'chunks/s':>9} {'commits':>8}")
+        start = time.perf_counter()
+        chunks = serial_ingest(files, DocumentStore(Path(tmp) / "serial"), models, doc_dir / "images")
+        elapsed = time.perf_counter() - start
+        print(f"{'serial':>22} {elapsed:>8.2f} {len(files) / elapsed:>8.2f} {chunks / elapsed:>9.1f} {len(files):>8}")
+
+        for workers in args.workers:
+            pipeline = IngestPipeline(
+                DocumentStore(Path(tmp) / f"pipeline_{workers}"),
+                segment=models.segment,
+                embed=models.embed,
+                image_dir=doc_dir / "images",
+                workers=workers,
+                concurrency=args.concurrency,
+            )
+            stats = pipeline.run(files)
+            label = f"pipeline workers={workers}"
+            print(f"{label:>22} {stats['seconds']:>8.2f} {stats['files_per_sec']:>8.2f} "
+                  f"{stats['chunks_per_sec']:>9.1f} {stats['commits']:>8}")
+            busy = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stats["busy_seconds"].items())
+            print(f"{'':>22} busy: {busy}")
+
+
+if __name__ == "__main__":
+    main()
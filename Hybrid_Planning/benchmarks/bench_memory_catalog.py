@@ -0,0 +1,140 @@
+# benchmarks/bench_memory_catalog.py
+#
+# search_historical_conversations over a generated memory/ tree of synthetic sessions: the old
+# per-call walk + json.load of every session file + substring scan, against the SQLite FTS5
+# catalog of modules/memory_catalog.py (term search, date ranges, newest first). Also times the
+# one-off rebuild, a no-op sync and an incremental sync after a few sessions changed. Run from
+# the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_memory_catalog.py --sessions 5000
+#   python benchmarks/bench_memory_catalog.py --sessions 20000 --runs 3
+#
+# Sessions are written by MemoryManager in its real directory layout. The scan baseline walks
+# the tree recursively and matches the same fields as the catalog (see item_fields), so both
+# return the same items; times are with the files in the page cache.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.memory import MemoryItem, MemoryManager
+from modules.memory_catalog import MemoryCatalog, day_bounds, item_fields
+
+TOPICS = ["DLF apartment", "Capbridge Ventures", "Gensol solar", "Canvas LMS course", "T20 overs",
+          "ASCII exponentials", "Don Tapscott", "Agentic AI history", "log of payment", "Wellray transfers"]
+WORDS = ("price amount paid crore founder company report course transformer agent memory payment "
+         "director invoice transfer relationship summary year value answer").split()
+DAY = 86400
+
+
+def make_sessions(n: int, runs: int, rng: random.Random) -> int:
+    now = time.time()
+    items = 0
+    for s in range(n):
+        started = now - rng.uniform(0, 365) * DAY
+        session_id = time.strftime("%Y/%m/%d", time.localtime(started)) + f"/session-{int(started)}-{s:06x}"
+        manager = MemoryManager(session_id=session_id, journal={"enabled": False})
+        for run in range(runs):
+            topic = rng.choice(TOPICS)
+            query = f"{topic} {' '.join(rng.sample(WORDS, 4))} {s}"
+            ts = started + run * 60
+            manager.items += [
+                MemoryItem(timestamp=ts, type="run_metadata", text=f"Started new session with input: {query}"),
+                MemoryItem(timestamp=ts + 1, type="tool_call", text="Called solve_sandbox", tool_name="solve_sandbox"),
+                MemoryItem(timestamp=ts + 2, type="tool_output", text="Output of solve_sandbox",
+                           tool_name="solve_sandbox", success=True,
+                           tool_result={"result": f"FINAL_ANSWER: {topic} {' '.join(rng.sample(WORDS, 12))}"}),
+            ]
+            items += 1
+        manager.save()
+    return items
+
+
+def scan_search(memory_dir: str, query: str, since=None, until=None, limit=50):
+    """The old search: load every session file on each call and substring-match every term."""
+    terms = query.lower().split()
+    start_ts, end_ts = day_bounds(since, until)
+    matches = []
+    for dirpath, _, files in os.walk(memory_dir):
+        for name in files:
+            if name.startswith("session-") and name.endswith(".json"):
+                with open(os.path.join(dirpath, name)) as f:
+                    for item in json.load(f):
+                        fields = item_fields(item)
+                        ts = item.get("timestamp") or 0
+                        if fields and all(t in " ".join(fields).lower() for t in terms) \
+                                and (start_ts is None or ts >= start_ts) and (end_ts is None or ts < end_ts):
+                            matches.append({"timestamp": ts, "user_query": fields[0]})
+    matches.sort(key=lambda m: m["timestamp"], reverse=True)
+    return matches[:limit]
+
+
+def timed(fn, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=2, help="agent runs (query + answer) per session")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # MemoryManager writes under ./memory
+        start = time.perf_counter()
+        items = make_sessions(args.sessions, args.runs, rng)
+        print(f"{args.sessions} session files, {items} runs, generated in {time.perf_counter() - start:.1f}s\n")
+
+        catalog = MemoryCatalog("memory", min_sync_seconds=0)
+        start = time.perf_counter()
+        rebuilt = catalog.rebuild()
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        noop_ms, _ = timed(lambda: catalog.sync(force=True), args.repeat)
+        sessions = sorted(Path("memory").rglob("session-*.json"))[:10]
+        for path in sessions:
+            os.utime(path)  # touched, as by a compaction
+        start = time.perf_counter()
+        changed = catalog.sync(force=True)
+        incremental_ms = (time.perf_counter() - start) * 1000
+        print(f"rebuild: {rebuilt['sessions']} sessions, {rebuilt['items']} items in {rebuild_ms:.0f} ms, "
+              f"{os.path.getsize(catalog.path) / 2**20:.1f} MB")
+        print(f"sync: no-op {noop_ms:.1f} ms, {changed['indexed']} changed sessions {incremental_ms:.1f} ms "
+              f"(stat walk of the tree)\n")
+
+        today = time.strftime("%Y-%m-%d")
+        month_ago = time.strftime("%Y-%m-%d", time.localtime(time.time() - 30 * DAY))
+        cases = [
+            ("one term", "capbridge", None, None),
+            ("two terms", "dlf payment", None, None),
+            ("rare term", f"{args.sessions // 2}", None, None),
+            ("terms + last 30 days", "gensol solar", month_ago, today),
+            ("recent, no terms", "", None, None),
+        ]
+        print(f"{'search':<22} {'scan ms':>9} {'catalog ms':>11} {'speedup':>8} {'hits':>5}")
+        catalog.min_sync_seconds = 3600  # searches in the server sync in the background, not in line
+        for name, query, since, until in cases:
+            scan_ms, expected = timed(lambda: scan_search("memory", query, since, until), max(1, args.repeat // 2))
+            catalog_ms, found = timed(lambda: catalog.search(query, since, until, limit=50), args.repeat)
+            assert [m["timestamp"] for m in found] == [m["timestamp"] for m in expected], name
+            print(f"{name:<22} {scan_ms:>9.1f} {catalog_ms:>11.2f} {scan_ms / catalog_ms:>7.0f}x {len(found):>5}")
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_memory_journal.py
+#
+# Session memory write cost of MemoryManager: the old rewrite-the-session-JSON-on-every-change
+# (memory.journal.enabled: false) against the append-only journal of modules/memory.py, for a
+# session growing to --items items (a tool call + tool output pair per step and a success patch
+# every --patch-every items). Also times replaying an uncompacted journal after a simulated
+# crash. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_memory_journal.py --items 10000
+#   python benchmarks/bench_memory_journal.py --items 10000 --legacy-items 2000 --fsync-seconds 0
+#
+# The old mode is quadratic, so it is measured up to --legacy-items and its totals for --items
+# are extrapolated (marked ~). Bytes written are the process's write() bytes from /proc/self/io
+# (Linux), falling back to the sizes of the files written.
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.memory import MemoryManager, journal_path
+
+RESULT = {"result": "Capbridge Ventures paid 42.94 crore for the apartment, see INVG67564 page 7. " * 2}
+
+
+def written_bytes() -> int:
+    try:
+        with open("/proc/self/io") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("wchar"))
+    except (OSError, StopIteration):
+        return -1
+
+
+def fill(manager: MemoryManager, items: int, patch_every: int) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):  # keep log() lines out of the byte count
+        for i in range(items // 2):
+            args = {"query": f"question {i}", "k": 5}
+            manager.add_tool_call("search_stored_documents", args, tags=["bench"])
+            manager.add_tool_output("search_stored_documents", args, RESULT, success=True, tags=["bench"])
+            if patch_every and (2 * i + 2) % patch_every == 0:
+                manager.add_tool_success("search_stored_documents", True)
+
+
+def run(session_id: str, items: int, patch_every: int, journal: dict, close: bool = True):
+    start_bytes = written_bytes()
+    start = time.perf_counter()
+    manager = MemoryManager(session_id=session_id, journal=journal)
+    fill(manager, items, patch_every)
+    if close:
+        manager.close()
+    seconds = time.perf_counter() - start
+    written = written_bytes() - start_bytes if start_bytes >= 0 else -1
+    if written < 0:
+        written = (manager.journal.bytes_written if manager.journal else 0) or os.path.getsize(manager.memory_path)
+    return manager, seconds, written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--legacy-items", type=int, default=1_000, help="items measured in the old mode")
+    parser.add_argument("--patch-every", type=int, default=10, help="add_tool_success after every N items")
+    parser.add_argument("--flush-every", type=int, default=32)
+    parser.add_argument("--fsync-seconds", type=float, default=2.0)
+    parser.add_argument("--compact-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    journal = {"enabled": True, "flush_every": args.flush_every, "fsync_seconds": args.fsync_seconds,
+               "compact_every": args.compact_every}
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # MemoryManager writes under ./memory
+
+        legacy_items = min(args.legacy_items, args.items)
+        _, seconds, written = run("2026/01/01/session-1-legacy", legacy_items, args.patch_every, {"enabled": False})
+        scale = (args.items / legacy_items) ** 2  # every change rewrites a file of O(items) bytes
+        extrapolated = "~" if legacy_items < args.items else ""
+        rows.append(("rewrite JSON per change (old)", legacy_items, seconds, written, ""))
+        if extrapolated:
+            rows.append((f"  extrapolated to {args.items}", args.items, seconds * scale, written * scale, "~"))
+
+        manager, seconds, written = run("2026/01/01/session-2-journal", args.items, args.patch_every, journal)
+        rows.append(("append-only journal", args.items, seconds, written, ""))
+
+        # Simulated crash: the journal is flushed (as at exit) but never compacted into the JSON
+        journal_only = {**journal, "compact_every": 10**9}
+        crashed, seconds, written = run("2026/01/01/session-3-crash", args.items, args.patch_every, journal_only,
+                                        close=False)
+        crashed.journal.flush()
+        size = os.path.getsize(journal_path(crashed.memory_path))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            recovered = MemoryManager(session_id="2026/01/01/session-3-crash", journal=journal)
+        replay = time.perf_counter() - start
+        assert recovered.items == crashed.items and len(recovered.items) == len(manager.items)
+        recovered.close()
+
+    print(f"{'mode':<32} {'items':>7} {'wall s':>9} {'MB written':>11} {'us/item':>9}")
+    for name, items, seconds, written, mark in rows:
+        print(f"{name:<32} {items:>7} {mark + format(seconds, '.3f'):>9} {mark + format(written / 2**20, '.1f'):>11} "
+              f"{mark + format(seconds * 1e6 / items, '.1f'):>9}")
+    print(f"\ncrash recovery: replayed a {size / 2**20:.1f} MB journal of {args.items} items "
+          f"in {replay * 1000:.1f} ms (and compacted it)")
+
+
+if __name__ == "__main__":
+    main()
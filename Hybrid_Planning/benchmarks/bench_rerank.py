@@ -0,0 +1,139 @@
+# benchmarks/bench_rerank.py
+#
+# search_stored_documents with and without the rerank stage of modules/rerank.py, on the
+# labelled queries in benchmarks/fixtures/relevance.json over the chunks shipped in faiss_index.
+# Every chunk is also ingested again as a near-duplicate copy under another file name (as when
+# the same report is saved twice), which plain hybrid search returns side by side. Reports
+# recall / MRR, duplicates and distinct sources in the top k, returned tokens and the latency
+# of each stage. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_rerank.py
+#   python benchmarks/bench_rerank.py --k 8 --token-budget 3000 --mmr-lambda 0.5
+#   python benchmarks/bench_rerank.py --embedder ollama
+#
+# Chunk vectors are read back from the resident index by chunk id, as the server does, so the
+# chunk_vectors stage makes no embedding calls.
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_chunking import hashed_embed
+from benchmarks.bench_hybrid_search import FIXTURE, build_store, load_corpus
+from modules.rerank import Reranker, estimate_tokens, normalize_text
+
+
+def with_duplicates(entries):
+    copies = [{"doc": f"copy_of_{e['doc']}", "chunk": e["chunk"].rstrip() + "\n", "chunk_id": f"copy_{e['chunk_id']}"}
+              for e in entries]
+    return entries + copies
+
+
+def canonical(chunk_id: str) -> str:
+    return chunk_id[len("copy_"):] if chunk_id.startswith("copy_") else chunk_id
+
+
+def evaluate(search, queries, k: int):
+    recalls, ranks, duplicates, sources, tokens, timings = [], [], [], [], [], []
+    for q in queries:
+        start = time.perf_counter()
+        results = search(q)
+        timings.append((time.perf_counter() - start) * 1000)
+        found = [canonical(entry["chunk_id"]) for entry in results]
+        relevant = set(q["relevant"])
+        recalls.append(len(relevant & set(found)) / len(relevant))
+        ranks.append(next((1 / (i + 1) for i, cid in enumerate(found) if cid in relevant), 0.0))
+        duplicates.append(len(found) - len({normalize_text(entry["chunk"]) for entry in results}))
+        sources.append(len({entry["doc"].replace("copy_of_", "") for entry in results}))
+        tokens.append(sum(estimate_tokens(entry["chunk"]) for entry in results))
+    return {
+        "recall": np.mean(recalls), "mrr": np.mean(ranks), "duplicates": np.mean(duplicates),
+        "sources": np.mean(sources), "tokens": np.mean(tokens), "p50_ms": statistics.median(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerank stage benchmark")
+    parser.add_argument("--embedder", choices=["hash", "ollama"], default="hash")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--token-budget", type=int, default=0, help="0 = no limit, as the default config")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the queries for the stage timings")
+    args = parser.parse_args()
+
+    if args.embedder == "ollama":
+        from modules.embeddings import get_client
+        embed = get_client("http://localhost:11434", "nomic-embed-text").embed_batch
+    else:
+        embed = hashed_embed
+
+    fixture = json.loads(FIXTURE.read_text())
+    entries = with_duplicates(load_corpus(ROOT / fixture["corpus"]))
+    queries = fixture["queries"]
+    query_vecs = {q["query"]: np.asarray(embed([q["query"]]), dtype=np.float32)[0] for q in queries}
+    reranker = Reranker({"enabled": True, "candidates": args.candidates, "mmr_lambda": args.mmr_lambda,
+                         "token_budget": args.token_budget})
+    workdir = Path(tempfile.mkdtemp(prefix="bench_rerank_"))
+    try:
+        index = build_store(entries, embed, workdir)
+
+        def plain(q):
+            return index.hybrid_search(q["query"], query_vecs[q["query"]], args.k)
+
+        def truncated(q):
+            # plain hybrid results cut at the same token budget, for an equal-cost comparison
+            results, used = [], 0
+            for entry in plain(q):
+                used += estimate_tokens(entry["chunk"])
+                if args.token_budget and results and used > args.token_budget:
+                    break
+                results.append(entry)
+            return results
+
+        def reranked(q):
+            timings = reranker.timings
+            with timings.stage("fetch"):
+                candidates = index.hybrid_search(q["query"], query_vecs[q["query"]], args.candidates)
+            with timings.stage("chunk_vectors"):
+                vectors = index.chunk_vectors(candidates, embed)
+            with timings.stage("bm25"):
+                lexical_scores = index.lexical.score(q["query"], [entry["id"] for entry in candidates])
+            return reranker.rerank(candidates, query_vecs[q["query"]], vectors, lexical_scores, args.k)
+
+        print(f"corpus: {len(entries)} chunks ({len(entries) // 2} + near-duplicate copies), "
+              f"{len(queries)} queries, embedder: {args.embedder}, k={args.k}\n")
+        print(f"{'search':<26} {'recall':>7} {'MRR':>6} {'dup':>5} {'sources':>8} {'tokens':>7} {'p50 ms':>8}")
+        searches = [(f"hybrid top-{args.k}", plain)]
+        if args.token_budget:
+            searches.append((f"hybrid top-{args.k}, budgeted", truncated))
+        searches.append((f"rerank {args.candidates} -> {args.k}", reranked))
+        for name, search in searches:
+            for _ in range(args.repeat - 1):
+                evaluate(search, queries, args.k)
+            r = evaluate(search, queries, args.k)
+            print(f"{name:<26} {r['recall']:>7.3f} {r['mrr']:>6.3f} {r['duplicates']:>5.2f} {r['sources']:>8.2f} "
+                  f"{r['tokens']:>7.0f} {r['p50_ms']:>8.3f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stats = reranker.stats()
+    print(f"\nrerank stages over {stats['queries']} queries "
+          f"({stats['duplicates_dropped']} duplicates, {stats['over_budget_dropped']} over-budget chunks dropped)")
+    print(f"{'stage':<14} {'avg ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, stage in stats["stages"].items():
+        print(f"{name:<14} {stage['avg_ms']:>8.3f} {stage['p50_ms']:>8.3f} {stage['p95_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_resident_index.py
+#
+# Query latency of search_stored_documents' old reload-per-query path (read_index +
+# json.loads on every call) versus the resident index, on synthetic vectors so no
+# embedding server is needed. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_resident_index.py --sizes 1000 100000
+#   python benchmarks/bench_resident_index.py --sizes 1000 100000 1000000   # ~3 GB at 768-dim
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.doc_index import ResidentIndex, write_index
+
+
+def build_store(index_dir: Path, n: int, dim: int, rng: np.random.Generator):
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, n, 100_000):
+        index.add(rng.standard_normal((min(100_000, n - start), dim), dtype=np.float32))
+    metadata = [{"doc": f"doc_{i // 50}.md", "chunk": f"synthetic chunk {i}", "chunk_id": f"doc_{i // 50}_{i % 50}"}
+                for i in range(n)]
+    (index_dir / "metadata.json").write_text(json.dumps(metadata))
+    write_index(index, index_dir / "index.bin")
+
+
+def time_queries(fn, queries) -> list:
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident FAISS index benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+    print(f"{'chunks':>10} {'reload/query':>14} {'resident':>10} {'resident+mmap':>14} {'first load':>11}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = Path(tmp)
+            build_store(index_dir, n, args.dim, rng)
+
+            def reload_per_query(q):
+                index = faiss.read_index(str(index_dir / "index.bin"))
+                metadata = json.loads((index_dir / "metadata.json").read_text())
+                D, I = index.search(q.reshape(1, -1), args.k)
+                return [metadata[idx] for idx in I[0]]
+
+            # The reload path grows linearly with corpus size; sample fewer queries on big stores.
+            reload_ms = statistics.median(time_queries(reload_per_query, queries[:max(3, args.queries // 10)]))
+
+            row = []
+            for mmap in (False, True):
+                resident = ResidentIndex(index_dir, mmap=mmap)
+                start = time.perf_counter()
+                resident.load()
+                first_load_ms = (time.perf_counter() - start) * 1000
+                row.append(statistics.median(time_queries(lambda q: resident.search(q, args.k), queries)))
+
+            print(f"{n:>10} {reload_ms:>12.2f}ms {row[0]:>8.2f}ms {row[1]:>12.2f}ms {first_load_ms:>9.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
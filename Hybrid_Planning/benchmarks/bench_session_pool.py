@@ -0,0 +1,72 @@
+# benchmarks/bench_session_pool.py
+#
+# Per-call latency of the reconnect-per-call MCP path versus pooled MultiMCP sessions
+# against the local math server. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_session_pool.py --calls 20
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.session import MCP, MultiMCP
+
+SERVER = {"id": "math", "script": "mcp_server_1.py", "cwd": str(ROOT)}
+ARGS = {"input": {"a": 1, "b": 2}}
+
+
+def report(label: str, timings: list):
+    timings_ms = sorted(t * 1000 for t in timings)
+    p95 = timings_ms[int(0.95 * (len(timings_ms) - 1))]
+    print(f"{label:<22} mean={statistics.mean(timings_ms):8.2f}ms  "
+          f"p50={statistics.median(timings_ms):8.2f}ms  p95={p95:8.2f}ms  n={len(timings_ms)}")
+
+
+async def bench_reconnect(calls: int) -> list:
+    client = MCP(server_script=SERVER["script"], working_dir=SERVER["cwd"])
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await client.call_tool("add", ARGS)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def bench_pooled(calls: int) -> tuple:
+    multi_mcp = MultiMCP(server_configs=[SERVER])
+    start = time.perf_counter()
+    await multi_mcp.initialize()
+    warmup = time.perf_counter() - start
+    timings = []
+    try:
+        for _ in range(calls):
+            start = time.perf_counter()
+            await multi_mcp.call_tool("add", ARGS)
+            timings.append(time.perf_counter() - start)
+    finally:
+        await multi_mcp.shutdown()
+    return warmup, timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MCP session pool benchmark")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    reconnect = await bench_reconnect(args.calls)
+    warmup, pooled = await bench_pooled(args.calls)
+
+    report("reconnect-per-call", reconnect)
+    report("pooled", pooled)
+    print(f"pooled warm-up (spawn + initialize + list_tools): {warmup * 1000:.2f}ms")
+    print(f"speedup (mean): {statistics.mean(reconnect) / statistics.mean(pooled):.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
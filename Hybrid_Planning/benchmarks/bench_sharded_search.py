@@ -0,0 +1,94 @@
+# benchmarks/bench_sharded_search.py
+#
+# Dense search latency of the single in-process index against the sharded mode (ShardSet +
+# ShardPool worker processes) across shard counts, on random unit vectors. Also times routing
+# the corpus into shards and saving them. Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_sharded_search.py --vectors 200000 --shards 1 2 4 8
+#   python benchmarks/bench_sharded_search.py --vectors 500000 --type hnsw --batch 16
+#
+# Sharding pays off once a shard search outweighs the scatter/gather round trip (~0.1-0.3 ms
+# of pickling and pipe I/O), i.e. with large exact (flat) shards and at least as many cores
+# as shards; with fewer cores the workers just take turns.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.ann_index import configure_search, merge_config, new_index, prepare_vectors
+from modules.doc_index import ShardSet
+from modules.shard_pool import ShardPool
+
+
+def latency(search, queries: np.ndarray, k: int, batch: int):
+    times = []
+    for start in range(0, len(queries), batch):
+        t = time.perf_counter()
+        search(queries[start:start + batch], k)
+        times.append((time.perf_counter() - t) * 1000)
+    times = np.array(times)
+    return np.percentile(times, 50), np.percentile(times, 95), len(queries) / (times.sum() / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1, help="queries per search call")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--type", choices=["flat", "hnsw"], default="flat")
+    args = parser.parse_args()
+
+    config = merge_config({"type": args.type, "promote_at": 0})
+    rng = np.random.default_rng(0)
+    vectors = prepare_vectors(rng.normal(size=(args.vectors, args.dim)).astype(np.float32), config=config)
+    ids = rng.integers(0, 2**63 - 1, size=args.vectors, dtype=np.int64)
+    queries = prepare_vectors(rng.normal(size=(args.queries, args.dim)).astype(np.float32), config=config)
+    print(f"{args.vectors} x {args.dim} {args.type} vectors, {args.queries} queries in batches of {args.batch}, "
+          f"k={args.k}, {os.cpu_count()} cores\n")
+
+    rows = []
+    start = time.perf_counter()
+    single = configure_search(new_index(args.dim, config), config)
+    single.add_with_ids(vectors, ids)
+    build = time.perf_counter() - start
+    _, expected = single.search(queries, args.k)
+    p50, p95, qps = latency(single.search, queries, args.k, args.batch)
+    rows.append(("in-process", build, p50, p95, qps, 1.0))
+
+    for count in args.shards:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            shard_set = ShardSet.create(count, args.dim, config)
+            shard_set.add_with_ids(vectors, ids)
+            shard_set.save(Path(tmp))
+            build = time.perf_counter() - start
+            del shard_set
+
+            pool = ShardPool(Path(tmp), config).load()
+            try:
+                pool.search(queries[:1], args.k)  # warm up the workers
+                _, found = pool.search(queries, args.k)
+                agreement = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, expected)])
+                p50, p95, qps = latency(pool.search, queries, args.k, args.batch)
+            finally:
+                pool.close()
+        rows.append((f"{count} shards", build, p50, p95, qps, agreement))
+
+    print(f"{'mode':<12} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'queries/s':>10} {'same top-k':>11}")
+    for name, build, p50, p95, qps, agreement in rows:
+        print(f"{name:<12} {build:>8.2f} {p50:>8.2f} {p95:>8.2f} {qps:>10.1f} {agreement:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# benchmarks/bench_similar_queries.py
+#
+# The answer-reuse lookup at the start of AgentLoop.run(): the old get_similar_memory_queries()
+# Jaccard scan over every memory item against the MinHash/LSH + FAISS index of
+# modules/query_index.py, over a synthetic history of answered questions. Test queries are
+# repeats with different case/punctuation, near-duplicates (a word added, dropped or moved),
+# rephrasings, and the same questions about other numbers or another subject (any hit there is
+# a false reuse, as with --ignore-numbers or --ignore-terms). Run from the Hybrid_Planning directory:
+#
+#   python benchmarks/bench_similar_queries.py --history 5000
+#   python benchmarks/bench_similar_queries.py --history 20000 --bands 32 --lexical-threshold 0.6
+#   python benchmarks/bench_similar_queries.py --embedder ollama --semantic-threshold 0.9
+#
+# Offline, queries are embedded with the hashed bag of words of bench_chunking.py, which cannot
+# see synonyms; the "semantic" rows are only meaningful with --embedder ollama. Lookup times
+# exclude the embedding request (the query embedding is usually an embedding cache hit).
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_chunking import hashed_embed
+from modules.query_index import SimilarQueryIndex
+from modules.tools import get_similar_memory_queries
+
+SUBJECTS = ["Anmol Singh", "DLF", "Capbridge Ventures", "Gensol", "Go-Auto", "Wellray Solar", "Canvas LMS",
+            "Don Tapscott", "Anthony Williams", "theschoolof.ai", "Parsons Brinckerhoff", "Make My Trip"]
+TEMPLATES = [
+    "How much did {s} pay for the {n} apartment deal",
+    "What is the relationship between {s} and invoice {n}",
+    "Summarize the {n} report about {s}",
+    "Who is the CEO of the parent company of {s} in {n}",
+    "What is the log value of the amount {s} paid in {n}",
+    "Which course about {s} do you recommend for batch {n}",
+    "List the transfers from {s} recorded in {n}",
+]
+REPHRASE = {"How much did": "What amount did", "What is": "Tell me", "Summarize": "Give a summary of",
+            "Which course": "What course", "List": "Show"}
+FILLER = ["please", "exactly", "now", "briefly"]
+
+
+def history(n: int, rng: random.Random):
+    seen, queries = set(), []
+    while len(queries) < n:
+        q = rng.choice(TEMPLATES).format(s=rng.choice(SUBJECTS), n=rng.randint(1, 10 * n))
+        if q not in seen:
+            seen.add(q)
+            queries.append(q)
+    return queries
+
+
+def variants(queries, count: int, rng: random.Random):
+    picked = rng.sample(queries, count)
+    repeats = [q.upper().rstrip() + "?" if i % 2 else q.lower() + "." for i, q in enumerate(picked)]
+    near = []
+    for i, q in enumerate(picked):
+        words = q.split()
+        if i % 3 == 0:
+            words.append(rng.choice(FILLER))
+        elif i % 3 == 1:
+            words.insert(len(words) // 2, rng.choice(FILLER))
+        else:
+            words[0], words[1] = words[1], words[0]
+        near.append(" ".join(words))
+    rephrased = []
+    for q in picked:
+        for old, new in REPHRASE.items():
+            if q.startswith(old):
+                q = new + q[len(old):]
+                break
+        rephrased.append(q + " " + rng.choice(FILLER))
+    # the same question about another number: reusing the stored answer would be wrong
+    other = [" ".join(str(10**9 + i) if w.isdigit() else w for w in q.split()) for i, q in enumerate(picked)]
+    # ... and about another subject ("capital of Germany" after "capital of France"), same number
+    subject = []
+    for q in picked:
+        s = next(s for s in SUBJECTS if s in q)
+        subject.append(q.replace(s, rng.choice([t for t in SUBJECTS if t != s])))
+    return {"repeats": (repeats, picked), "near-duplicates": (near, picked), "rephrased": (rephrased, picked),
+            "other numbers": (other, [None] * count), "other subject": (subject, [None] * count)}
+
+
+def run_old(items, queries, expected):
+    hits, correct, times = 0, 0, []
+    for query, answer_of in zip(queries, expected):
+        start = time.perf_counter()
+        found = get_similar_memory_queries(query, items)
+        times.append((time.perf_counter() - start) * 1000)
+        if found:
+            hits += 1
+            correct += found[-1]["user_query"] == answer_of
+    return hits, correct, times
+
+
+def run_index(index, queries, expected):
+    hits, correct, times = 0, 0, []
+    for query, answer_of in zip(queries, expected):
+        start = time.perf_counter()
+        hit = index.lookup(query)
+        times.append((time.perf_counter() - start) * 1000)
+        if hit is not None:
+            hits += 1
+            correct += hit["query"] == answer_of
+    return hits, correct, times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=5000, help="answered queries in memory")
+    parser.add_argument("--queries", type=int, default=200, help="test queries per kind")
+    parser.add_argument("--lexical-threshold", type=float, default=0.7)
+    parser.add_argument("--semantic-threshold", type=float, default=0.92)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--bands", type=int, default=16)
+    parser.add_argument("--ignore-numbers", action="store_true", help="match_numbers off")
+    parser.add_argument("--ignore-terms", action="store_true", help="match_terms off")
+    parser.add_argument("--embedder", choices=["hash", "ollama"], default="hash")
+    args = parser.parse_args()
+
+    if args.embedder == "ollama":
+        from modules.embeddings import get_client
+        embed = get_client().embed_batch
+    else:
+        embed = hashed_embed
+
+    rng = random.Random(0)
+    queries = history(args.history, rng)
+    tests = variants(queries, args.queries, rng)
+    items = [{"user_query": q, "final_answer": f"FINAL_ANSWER: {i}"} for i, q in enumerate(queries)]
+    config = {"lexical_threshold": args.lexical_threshold, "semantic_threshold": args.semantic_threshold,
+              "num_perm": args.num_perm, "bands": args.bands, "match_numbers": not args.ignore_numbers, "match_terms": not args.ignore_terms}
+
+    indexes = {}
+    for name, semantic in (("index, lexical", False), ("index, + semantic", True)):
+        start = time.perf_counter()
+        index = SimilarQueryIndex({**config, "semantic": semantic}, embed=embed)
+        index.add_many([{"query": q, "answer": f"{i}"} for i, q in enumerate(queries)])
+        indexes[name] = index
+        print(f"{name}: built over {args.history} queries in {(time.perf_counter() - start) * 1000:.0f} ms")
+    if args.embedder == "ollama":
+        for kind, (test_queries, _) in tests.items():
+            embed(test_queries)  # warm the embedding cache so lookups time the index, not Ollama
+    print(f"\n{'lookup':<20} {'queries':<16} {'hit rate':>8} {'correct':>8} {'p50 ms':>8} {'p95 ms':>8}")
+
+    for kind, (test_queries, expected) in tests.items():
+        rows = [("old Jaccard scan", run_old(items, test_queries, expected))]
+        rows += [(name, run_index(index, test_queries, expected)) for name, index in indexes.items()]
+        for name, (hits, correct, times) in rows:
+            print(f"{name:<20} {kind:<16} {hits / len(test_queries):>8.2f} {correct / max(hits, 1):>8.2f} "
+                  f"{statistics.median(times):>8.3f} {float(np.percentile(times, 95)):>8.3f}")
+
+    stats = indexes["index, + semantic"].stats()
+    print(f"\nindex, + semantic: {stats['lookups']} lookups, {stats['lexical_hits']} lexical and "
+          f"{stats['semantic_hits']} semantic hits, hit rate {stats['hit_rate']:.2f}")
+    for name, stage in stats["stages"].items():
+        print(f"  {name:<9} p50 {stage['p50_ms']:.3f} ms  p95 {stage['p95_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
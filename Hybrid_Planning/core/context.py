@@ -1,7 +1,7 @@
 # core/context.py
 
 from typing import List, Optional, Dict, Any
-from modules.memory import MemoryManager, MemoryItem
+from modules.memory import MemoryManager, MemoryItem, load_journal_config
 from core.session import MultiMCP  # For dispatcher typing
 from pathlib import Path
 import yaml
@@ -54,7 +54,7 @@ class AgentContext:
 
         self.user_input = user_input
         self.agent_profile = AgentProfile()
-        self.memory = MemoryManager(session_id=session_id)
+        self.memory = MemoryManager(session_id=session_id, journal=load_journal_config())
         self.session_id = self.memory.session_id
         self.dispatcher = dispatcher  # 🆕 Added formally
         self.mcp_server_descriptions = mcp_server_descriptions  # 🆕 Added formally
@@ -9,6 +9,7 @@ from core.session import MultiMCP
 from core.strategy import select_decision_prompt_path
 from core.context import AgentContext
 from modules.tools import summarize_tools, get_similar_memory_queries, prioritize_search_tools
+from modules.query_index import get_query_index
 import re
 
 try:
@@ -24,12 +25,25 @@ class AgentLoop:
         self.context = context
         self.mcp = self.context.dispatcher
         self.model = ModelManager()
+        # Answered queries of all sessions (built once per process, see agent.py); None = this session only
+        self.query_index = get_query_index(self.context.agent_profile.memory_config.get("similar_queries"))
+
+    def _answered(self) -> dict:
+        """Finish with the final answer and offer it to the similar-query index for later runs."""
+        if self.query_index is not None:
+            self.query_index.add(self.context.user_input, self.context.final_answer, self.context.session_id)
+        return {"status": "done", "result": self.context.final_answer}
 
     async def run(self):
         max_steps = self.context.agent_profile.strategy.max_steps
 
-        similar_queries = get_similar_memory_queries(self.context.user_input, self.context.memory.get_session_items())
-        if similar_queries:
+        if self.query_index is not None:
+            hit = self.query_index.lookup(self.context.user_input)
+            if hit is not None:
+                log("strategy", f"✅ Found similar query in memory ({hit['match']} match, {hit['score']:.2f}): {hit['query']}")
+                return {"status": "done", "result": hit["answer"]}
+        else:
+            similar_queries = get_similar_memory_queries(self.context.user_input, self.context.memory.get_session_items())
             # Use the most recent successful answer
             for item in reversed(similar_queries):
                 if item.success and item.text:
@@ -101,7 +115,7 @@ class AgentLoop:
                                 success=True,
                                 tags=["sandbox"],
                             )
-                            return {"status": "done", "result": self.context.final_answer}
+                            return self._answered()
                         elif result.startswith("FURTHER_PROCESSING_REQUIRED:"):
                             content = result.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
                             self.context.user_input_override  = (
@@ -138,7 +152,7 @@ class AgentLoop:
                     )
 
                     if success and "FURTHER_PROCESSING_REQUIRED:" not in result:
-                        return {"status": "done", "result": self.context.final_answer}
+                        return self._answered()
                     else:
                         lifelines_left -= 1
                         log("loop", f"🛠 Retrying... Lifelines left: {lifelines_left}")
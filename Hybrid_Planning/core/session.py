@@ -2,9 +2,44 @@
 
 import os
 import sys
+import asyncio
+import time
+import json
+import re
+import hashlib
+from pathlib import Path
 from typing import Optional, Any, List, Dict
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.types import Tool
+
+DEFAULT_MAX_CONCURRENCY = 4  # in-flight calls per server process
+HEALTH_CHECK_TIMEOUT = 5.0  # seconds
+SHUTDOWN_TIMEOUT = 5.0  # seconds
+DEFAULT_STARTUP_TIMEOUT = 30.0  # seconds per server during discovery
+TOOL_CACHE_PATH = "cache/tool_catalog.json"
+TOOL_CACHE_VERSION = 1
+
+
+def server_fingerprint(config: dict) -> Optional[str]:
+    """
+    Hash a server script together with the local modules it imports (e.g. models.py),
+    so a change to either invalidates the cached tool schemas. None if the script is missing.
+    """
+    cwd = Path(config.get("cwd", os.getcwd()))
+    script = cwd / config["script"]
+    if not script.is_file():
+        return None
+
+    source = script.read_bytes()
+    digest = hashlib.sha256(source)
+    local_imports = sorted(set(re.findall(rb"^\s*(?:from|import)\s+([A-Za-z_]\w*)", source, re.MULTILINE)))
+    for name in local_imports:
+        module = cwd / f"{name.decode()}.py"
+        if module.is_file():
+            digest.update(name)
+            digest.update(module.read_bytes())
+    return digest.hexdigest()
 
 
 class MCP:
@@ -48,92 +83,280 @@ class MCP:
                 return await session.call_tool(tool_name, arguments=arguments)
 
 
+class PersistentMCPSession:
+    """
+    Long-lived stdio session to a single MCP server.
+    The server process is spawned once and reused for every call; a crashed
+    process is respawned on the next call. Concurrent calls are bounded by
+    max_concurrency.
+    """
+
+    def __init__(self, config: dict, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.config = config
+        self.server_id = config.get("id", config["script"])
+        self.params = StdioServerParameters(
+            command=sys.executable,
+            args=[config["script"]],
+            cwd=config.get("cwd", os.getcwd())
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session: Optional[ClientSession] = None
+        self.restarts = 0
+        self._runner: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._start_error: Optional[BaseException] = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._runner is not None and not self._runner.done()
+
+    async def _run(self):
+        # stdio_client/ClientSession must be entered and exited in the same task,
+        # so a dedicated task owns them for the lifetime of the server process.
+        try:
+            async with stdio_client(self.params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+        except Exception as e:
+            self._start_error = e
+            print(f"❌ MCP server '{self.server_id}' session ended: {type(e).__name__}: {e}", file=sys.stderr)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def start(self) -> ClientSession:
+        async with self._start_lock:
+            if self.alive:
+                return self.session
+            if self._runner is not None:
+                self.restarts += 1
+                print(f"🔁 Respawning MCP server '{self.server_id}' (restart #{self.restarts})", file=sys.stderr)
+            self._ready = asyncio.Event()
+            self._closing = asyncio.Event()
+            self._start_error = None
+            self._runner = asyncio.create_task(self._run())
+            await self._ready.wait()
+            if self.session is None:
+                raise RuntimeError(f"Failed to start MCP server '{self.server_id}': {self._start_error}")
+            return self.session
+
+    async def _responsive(self, timeout: float = HEALTH_CHECK_TIMEOUT) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            print(f"⚠️ Health check failed for '{self.server_id}': {e}", file=sys.stderr)
+            return False
+
+    async def health_check(self) -> bool:
+        """Ping the server; a dead or unresponsive process is respawned."""
+        if await self._responsive():
+            return True
+        await self.close()
+        try:
+            await self.start()
+            return True
+        except Exception:
+            return False
+
+    async def list_tools(self) -> List[Any]:
+        session = await self.start()
+        async with self.semaphore:
+            result = await session.list_tools()
+        return result.tools
+
+    async def call_tool(self, tool_name: str, arguments: dict, timeout: Optional[float] = None) -> Any:
+        for attempt in range(2):
+            session = await self.start()
+            try:
+                async with self.semaphore:
+                    return await asyncio.wait_for(session.call_tool(tool_name, arguments), timeout)
+            except asyncio.TimeoutError:
+                raise
+            except Exception:
+                # A dead server surfaces as a transport error; retry once on a fresh process.
+                if attempt or await self._responsive():
+                    raise
+                print(f"⚠️ MCP server '{self.server_id}' crashed during '{tool_name}', respawning", file=sys.stderr)
+                await self.close()
+
+    async def close(self):
+        if self._runner is None:
+            return
+        if self._closing is not None:
+            self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._runner), SHUTDOWN_TIMEOUT)
+        except (asyncio.TimeoutError, Exception):
+            self._runner.cancel()
+        self.session = None
+
+
 class MultiMCP:
     """
-    Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
-    Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Discovers tools from multiple MCP servers and keeps one persistent session per server.
+    Sessions stay warm across call_tool() and AgentLoop.run() invocations until shutdown().
     """
 
-    def __init__(self, server_configs: List[dict]):
+    def __init__(
+        self,
+        server_configs: List[dict],
+        call_timeout: Optional[float] = None,
+        tool_cache_path: Optional[str] = TOOL_CACHE_PATH,
+    ):
         self.server_configs = server_configs
+        self.call_timeout = call_timeout
+        self.tool_cache_path = Path(tool_cache_path) if tool_cache_path else None
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
         self.server_tools: Dict[str, List[Any]] = {}  # server_name -> list of tools
+        self.sessions: Dict[str, PersistentMCPSession] = {}  # server_id -> pooled session
+        self.unavailable: Dict[str, str] = {}  # server_id -> startup error
+        self.startup_report: Dict[str, Dict[str, Any]] = {}  # server_id -> {status, seconds, ...}
+
+    def _get_session(self, config: dict) -> PersistentMCPSession:
+        server_key = config.get("id", config["script"])
+        if server_key not in self.sessions:
+            self.sessions[server_key] = PersistentMCPSession(
+                config, max_concurrency=config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+            )
+        return self.sessions[server_key]
+
+
+    async def _discover(self, config: dict) -> List[Any]:
+        pooled = self._get_session(config)
+        print(f"→ Scanning tools from: {config['script']} in {pooled.params.cwd}", file=sys.stderr)
+        print(f"Command: {pooled.params.command} {pooled.params.args}", file=sys.stderr)
+        timeout = config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+        return await asyncio.wait_for(pooled.list_tools(), timeout)
+
+    def _load_tool_cache(self) -> Dict[str, Any]:
+        if not self.tool_cache_path or not self.tool_cache_path.exists():
+            return {}
+        try:
+            cache = json.loads(self.tool_cache_path.read_text(encoding="utf-8"))
+            return cache.get("servers", {}) if cache.get("version") == TOOL_CACHE_VERSION else {}
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable tool cache {self.tool_cache_path}: {e}", file=sys.stderr)
+            return {}
 
+    def _save_tool_cache(self, servers: Dict[str, Any]):
+        if not self.tool_cache_path:
+            return
+        try:
+            self.tool_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.tool_cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"version": TOOL_CACHE_VERSION, "servers": servers}, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.tool_cache_path)
+        except Exception as e:
+            print(f"⚠️ Failed to write tool cache {self.tool_cache_path}: {e}", file=sys.stderr)
 
     async def initialize(self):
+        """
+        Load tool schemas from the on-disk catalog for servers whose fingerprint is unchanged,
+        and discover the rest concurrently. Cached servers are spawned lazily on first call_tool().
+        A server that fails or times out is marked unavailable instead of aborting startup.
+        """
         print("in MultiMCP initialize")
+        started = time.perf_counter()
+        catalog = self._load_tool_cache()
+        fingerprints = {config.get("id", config["script"]): server_fingerprint(config) for config in self.server_configs}
+        discovered: Dict[str, List[Any]] = {}
+        pending = []
+
         for config in self.server_configs:
-            try:
-                print(f"Initializing server: {config['script']}", file=sys.stderr)
-                params = StdioServerParameters(
-                    command=sys.executable,
-                    args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
-                )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}", file=sys.stderr)
-                print(f"Command: {params.command} {params.args}", file=sys.stderr)
-                
+            server_key = config.get("id", config["script"])
+            cached = catalog.get(server_key)
+            if fingerprints[server_key] and cached and cached.get("fingerprint") == fingerprints[server_key]:
                 try:
-                    async with stdio_client(params) as (read, write):
-                        print("Connection established, creating session...", file=sys.stderr)
-                        try:
-                            async with ClientSession(read, write) as session:
-                                print("[agent] Session created, initializing...", file=sys.stderr)
-                                try:
-                                    await session.initialize()
-                                    print("[agent] MCP session initialized", file=sys.stderr)
-                                    tools = await session.list_tools()
-                                    print(f"→ Tools received: {[tool.name for tool in tools.tools]}", file=sys.stderr)
-                                    for tool in tools.tools:
-                                        self.tool_map[tool.name] = {
-                                            "config": config,
-                                            "tool": tool
-                                        }
-                                        server_key = config["id"]  # fallback to script name if no key
-                                        if server_key not in self.server_tools:
-                                            self.server_tools[server_key] = []
-                                        self.server_tools[server_key].append(tool)
-                                except Exception as init_error:
-                                    print(f"❌ Session initialization error: {init_error}", file=sys.stderr)
-                                    print(f"Error details: {type(init_error).__name__}: {str(init_error)}", file=sys.stderr)
-                                    import traceback
-                                    traceback.print_exc(file=sys.stderr)
-                                    raise
-                        except Exception as session_error:
-                            print(f"❌ Session creation error: {session_error}", file=sys.stderr)
-                            print(f"Error details: {type(session_error).__name__}: {str(session_error)}", file=sys.stderr)
-                            import traceback
-                            traceback.print_exc(file=sys.stderr)
-                            raise
-                except Exception as client_error:
-                    print(f"❌ Client connection error: {client_error}", file=sys.stderr)
-                    print(f"Error details: {type(client_error).__name__}: {str(client_error)}", file=sys.stderr)
-                    import traceback
-                    traceback.print_exc(file=sys.stderr)
-                    raise
-            except Exception as e:
-                print(f"❌ Error initializing MCP server {config['script']}: {e}", file=sys.stderr)
-                print(f"Error details: {type(e).__name__}: {str(e)}", file=sys.stderr)
-                import traceback
-                traceback.print_exc(file=sys.stderr)
+                    discovered[server_key] = [Tool.model_validate(tool) for tool in cached["tools"]]
+                    self.startup_report[server_key] = {"status": "cached", "seconds": 0.0, "tools": len(cached["tools"])}
+                    continue
+                except Exception as e:
+                    print(f"⚠️ Stale tool cache entry for {server_key}: {e}", file=sys.stderr)
+            pending.append(config)
+
+        async def timed_discover(config: dict):
+            start = time.perf_counter()
+            try:
+                return await self._discover(config), time.perf_counter() - start
+            except BaseException as e:
+                e.elapsed = time.perf_counter() - start
                 raise
 
+        results = await asyncio.gather(
+            *(timed_discover(config) for config in pending),
+            return_exceptions=True,
+        )
+
+        for config, result in zip(pending, results):
+            server_key = config.get("id", config["script"])
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.TimeoutError):
+                    error = f"timed out after {config.get('startup_timeout', DEFAULT_STARTUP_TIMEOUT)}s"
+                else:
+                    error = f"{type(result).__name__}: {result}"
+                print(f"❌ Error initializing MCP server {config['script']}: {error}", file=sys.stderr)
+                self.unavailable[server_key] = error
+                self.startup_report[server_key] = {
+                    "status": "unavailable",
+                    "seconds": getattr(result, "elapsed", None),
+                    "error": error,
+                }
+                await self.sessions.pop(server_key).close()
+                continue
+
+            tools, elapsed = result
+            print(f"→ Tools received from {server_key}: {[tool.name for tool in tools]}", file=sys.stderr)
+            discovered[server_key] = tools
+            self.startup_report[server_key] = {"status": "ok", "seconds": elapsed, "tools": len(tools)}
+            if fingerprints[server_key]:
+                catalog[server_key] = {
+                    "fingerprint": fingerprints[server_key],
+                    "script": config["script"],
+                    "tools": [tool.model_dump(mode="json") for tool in tools],
+                }
+
+        for config in self.server_configs:
+            server_key = config.get("id", config["script"])
+            for tool in discovered.get(server_key, []):
+                self.tool_map[tool.name] = {
+                    "config": config,
+                    "tool": tool
+                }
+                if server_key not in self.server_tools:
+                    self.server_tools[server_key] = []
+                self.server_tools[server_key].append(tool)
+
+        if pending:
+            self._save_tool_cache(catalog)
+        self.print_startup_report(time.perf_counter() - started)
+
+    def print_startup_report(self, total_seconds: float):
+        print("MCP server startup:", file=sys.stderr)
+        for server_key, entry in self.startup_report.items():
+            seconds = f"{entry['seconds']:.2f}s" if entry.get("seconds") is not None else "-"
+            detail = entry["error"] if entry["status"] == "unavailable" else f"{entry['tools']} tools"
+            print(f"  {server_key:<12} {entry['status']:<12} {seconds:>8}  {detail}", file=sys.stderr)
+        print(f"  {'total':<12} {'':<12} {total_seconds:>7.2f}s", file=sys.stderr)
+
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
 
-        config = entry["config"]
-        params = StdioServerParameters(
-            command=sys.executable,
-            args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
-        )
+        pooled = self._get_session(entry["config"])
+        return await pooled.call_tool(tool_name, arguments, timeout=self.call_timeout)
 
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments)
+    async def health_check(self) -> Dict[str, bool]:
+        """Ping every pooled server, respawning any that have died."""
+        return {server_id: await pooled.health_check() for server_id, pooled in self.sessions.items()}
 
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
@@ -151,4 +374,6 @@ class MultiMCP:
 
 
     async def shutdown(self):
-        pass  # no persistent sessions to close
\ No newline at end of file
+        for pooled in self.sessions.values():
+            await pooled.close()
+        self.sessions.clear()
@@ -15,7 +15,7 @@ from markitdown import MarkItDown
 import time
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput, SearchDocumentsInput
 from tqdm import tqdm
-import hashlib
+import yaml
 from pydantic import BaseModel
 import subprocess
 import sqlite3
@@ -23,6 +23,19 @@ import trafilatura
 import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+from modules.ann_index import load_index_config
+from modules.doc_index import (
+    ResidentIndex, DocumentStore, migrate_metadata_json, read_manifest, manifest_fingerprint,
+    refresh_manifest_entry, layout_pending, write_json, MANIFEST,
+)
+from modules.shard_pool import ShardPool
+from modules.result_cache import QueryResultCache
+from modules.rerank import Reranker
+from modules.captions import ImageCaptioner
+from modules.fingerprint import fingerprint
+from modules.embeddings import get_client
+from modules.chunking import get_chunker, DEFAULT_STRATEGY
+from modules.ingest import IngestPipeline, IngestStats, DEFAULT_WORKERS, pdf_to_markdown, url_to_markdown
 
 
 # Initialize FastMCP server
@@ -30,7 +43,7 @@ print("Creating FastMCP instance...", file=sys.stderr)
 mcp = FastMCP("Calculator")
 print("FastMCP instance created", file=sys.stderr)
 
-EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBED_URL = "http://localhost:11434/api/embed"
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 EMBED_MODEL = "nomic-embed-text"
@@ -42,6 +55,24 @@ CHUNK_OVERLAP = 40
 MAX_CHUNK_LENGTH = 512  # characters
 TOP_K = 3  # FAISS top-K matches
 ROOT = Path(__file__).parent.resolve()
+INDEX_CONFIG = load_index_config(ROOT / "config" / "profiles.yaml")  # flat / hnsw / ivfpq
+EMBEDDER = get_client(EMBED_URL, EMBED_MODEL)  # shares the project-wide embedding cache
+NOMIC_EMBED_DIM = 768  # nomic-embed-text; used only before the first embedding response
+
+
+def load_profile_section(section: str) -> dict:
+    profile_path = ROOT / "config" / "profiles.yaml"
+    if not profile_path.exists():
+        return {}
+    return (yaml.safe_load(profile_path.read_text()) or {}).get(section, {}) or {}
+
+
+SHARDING = load_profile_section("sharding")
+SHARDS = int(SHARDING.get("shards", 0) or 0)  # 0 = one in-process index
+SHARD_POOL = ShardPool(ROOT / "faiss_index", INDEX_CONFIG, threads_per_worker=SHARDING.get("threads_per_worker", 0)) \
+    if SHARDS else None  # workers start on the first search
+DOC_INDEX = ResidentIndex(ROOT / "faiss_index", config=INDEX_CONFIG,
+                          shard_pool=SHARD_POOL)  # loaded once, hot-reloaded when index.bin (or shards.json) changes
 
 
 def check_ollama_connection():
@@ -56,14 +87,8 @@ def check_ollama_connection():
         return False
 
 def get_embedding(text: str) -> np.ndarray:
-    try:
-        result = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text}, timeout=10)
-        result.raise_for_status()
-        return np.array(result.json()["embedding"], dtype=np.float32)
-    except requests.exceptions.RequestException as e:
-        print(f"Error getting embedding: {str(e)}")
-        # Return a zero vector of appropriate dimension as fallback
-        return np.zeros(384, dtype=np.float32)
+    # Raises EmbeddingError on failure rather than returning a placeholder vector
+    return EMBEDDER.embed(text)
 
 def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     words = text.split()
@@ -117,110 +142,134 @@ Just respond in one word (Yes or No), and do not provide any further explanation
 
 @mcp.tool()
 def search_stored_documents(input: SearchDocumentsInput) -> list[str]:
-    """Search documents to get relevant extracts. Usage: input={"input": {"query": "your query"}} result = await mcp.call_tool('search_stored_documents', input)"""
+    """Search documents to get relevant extracts. mode is "hybrid" (default, embeddings + BM25 keywords), "dense" or "lexical" (exact terms such as names, codes and amounts). Usage: input={"input": {"query": "your query", "mode": "hybrid", "k": 5}} result = await mcp.call_tool('search_stored_documents', input)"""
     print("CALLED: search_stored_documents", file=sys.stderr)
-    ensure_faiss_ready()
+    if not DOC_INDEX.load():
+        ensure_faiss_ready()
     query = input.query
-    mcp_log("SEARCH", f"Query: {query}")
+    mcp_log("SEARCH", f"Query: {query} (mode: {input.mode})")
     try:
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
-        query_vec = get_embedding(query).reshape(1, -1)
-        D, I = index.search(query_vec, k=5)
+        # Cached results are dropped whenever the index is reloaded (DOC_INDEX.generation changes)
+        cached = RESULT_CACHE.get(query, input.k, input.mode, DOC_INDEX.generation)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        # The reranker needs the query embedding for its cosine scores even in lexical mode
+        query_vec = get_embedding(query) if input.mode != "lexical" or RERANKER.enabled else None
+        if RERANKER.enabled:
+            RERANKER.timings.record("embed_query", time.perf_counter() - start)
+        if query_vec is not None:
+            cached = RESULT_CACHE.get_similar(query_vec, input.k, input.mode, DOC_INDEX.generation)
+            if cached is not None:
+                return cached
+        if RERANKER.enabled:
+            hits = reranked_search(query, query_vec, input.k, input.mode)
+            RERANKER.timings.record("total", time.perf_counter() - start)
+        else:
+            hits = DOC_INDEX.hybrid_search(query, query_vec, k=input.k, mode=input.mode, **SEARCH_CONFIG)
         results = []
-        for idx in I[0]:
-            data = metadata[idx]
+        for data in hits:
             results.append(f"{data['chunk']}\n[Source: {data['doc']}, ID: {data['chunk_id']}]")
+        RESULT_CACHE.put(query, input.k, input.mode, results, DOC_INDEX.generation, query_vec)
         return results
     except Exception as e:
         return [f"ERROR: Failed to search: {str(e)}"]
 
 
-def caption_image(img_url_or_path: str) -> str:
-    mcp_log("CAPTION", f"🖼️ Attempting to caption image: {img_url_or_path}")
+def reranked_search(query: str, query_vec: np.ndarray, k: int, mode: str) -> list[dict]:
+    """Over-fetch candidates with hybrid_search and rerank them (modules/rerank.py), timing each stage."""
+    timings = RERANKER.timings
+    with timings.stage("fetch"):
+        candidates = DOC_INDEX.hybrid_search(query, query_vec, k=RERANKER.config["candidates"], mode=mode,
+                                             **SEARCH_CONFIG)
+    if not candidates:
+        return []
+    with timings.stage("chunk_vectors"):
+        # Read back from the index by chunk id; the embedder only sees chunks it cannot reconstruct
+        vectors = DOC_INDEX.chunk_vectors(candidates, EMBEDDER.embed_batch)
+    with timings.stage("bm25"):
+        lexical_scores = DOC_INDEX.lexical.score(query, [entry["id"] for entry in candidates])
+    return RERANKER.rerank(candidates, query_vec, vectors, lexical_scores, k)
 
-    full_path = Path(__file__).parent / "documents" / img_url_or_path
-    full_path = full_path.resolve()
 
-    if not full_path.exists():
-        mcp_log("ERROR", f"❌ Image file not found: {full_path}")
-        return f"[Image file not found: {img_url_or_path}]"
+@mcp.tool()
+def rerank_stats() -> dict:
+    """Report per-stage search latency (fetch, chunk vectors, BM25, scoring, MMR selection) and dropped duplicates when reranking is enabled. Usage: result = await mcp.call_tool('rerank_stats', {})"""
+    return RERANKER.stats()
 
-    try:
-        if img_url_or_path.startswith("http"): # for extract_web_pages
-            result = requests.get(img_url_or_path)
-            encoded_image = base64.b64encode(result.content).decode("utf-8")
-        else:
-            with open(full_path, "rb") as img_file:
-                encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
-
-        # Set stream=True to get the full generator-style output
-        with requests.post(OLLAMA_URL, json={
-            "model": GEMMA_MODEL,
-            "prompt": "If there is lot of text in the image, then ONLY reply back with exact text in the image, else Describe the image such that your result can replace 'alt-text' for it. Only explain the contents of the image and provide no further explaination.",
-            "images": [encoded_image],
-            "stream": True
-        }, stream=True) as result:
-
-            caption_parts = []
-            for line in result.iter_lines():
-                if not line:
-                    continue
-                try:
-                    data = json.loads(line)
-                    caption_parts.append(data.get("result", ""))
-                    if data.get("done", False):
-                        break
-                except json.JSONDecodeError:
-                    continue  # silently skip malformed lines
-
-            caption = "".join(caption_parts).strip()
-            mcp_log("CAPTION", f"✅ Caption generated: {caption}")
-            return caption if caption else "[No caption returned]"
 
-    except Exception as e:
-        mcp_log("ERROR", f"⚠️ Failed to caption image {img_url_or_path}: {e}")
-        return f"[Image could not be processed: {img_url_or_path}]"
+@mcp.tool()
+def embedding_cache_stats() -> dict:
+    """Report embedding cache hit rate and estimated saved latency. Usage: result = await mcp.call_tool('embedding_cache_stats', {})"""
+    return EMBEDDER.cache.stats()
 
 
+@mcp.tool()
+def search_cache_stats() -> dict:
+    """Report hit/miss counters of the search_stored_documents result cache. Usage: result = await mcp.call_tool('search_cache_stats', {})"""
+    return RESULT_CACHE.stats()
+
+
+def caption_image_bytes(image: bytes) -> str:
+    """Caption one (already downscaled) image with the vision model; "" if nothing came back."""
+    encoded_image = base64.b64encode(image).decode("utf-8")
+    # Set stream=True to get the full generator-style output
+    with requests.post(OLLAMA_URL, json={
+        "model": GEMMA_MODEL,
+        "prompt": "If there is lot of text in the image, then ONLY reply back with exact text in the image, else Describe the image such that your result can replace 'alt-text' for it. Only explain the contents of the image and provide no further explaination.",
+        "images": [encoded_image],
+        "stream": True
+    }, stream=True, timeout=300) as result:
+        result.raise_for_status()
+        caption_parts = []
+        for line in result.iter_lines():
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                caption_parts.append(data.get("response", data.get("result", "")))
+                if data.get("done", False):
+                    break
+            except json.JSONDecodeError:
+                continue  # silently skip malformed lines
 
+    caption = "".join(caption_parts).strip()
+    mcp_log("CAPTION", f"✅ Caption generated: {caption}")
+    return caption
 
 
-def replace_images_with_captions(markdown: str) -> str:
-    def replace(match):
-        alt, src = match.group(1), match.group(2)
-        try:
-            caption = caption_image(src)
-            # Attempt to delete only if local and file exists
-            if not src.startswith("http"):
-                img_path = Path(__file__).parent / "documents" / src
-                if img_path.exists():
-                    img_path.unlink()
-                    mcp_log("INFO", f"🗑️ Deleted image after captioning: {img_path}")
-            return f"**Image:** {caption}"
-        except Exception as e:
-            mcp_log("WARN", f"Image deletion failed: {e}")
-            return f"[Image could not be processed: {src}]"
+# Captions are cached by image content hash, so re-ingesting a document reuses them
+CAPTIONER = ImageCaptioner(caption_image_bytes, GEMMA_MODEL, ROOT / "documents",
+                           config=load_profile_section("captioning"))
+
+
+def replace_images_with_captions(markdown: str, name: str = "document") -> str:
+    markdown, _ = CAPTIONER(markdown, name)
+    return markdown
+
+
+@mcp.tool()
+def caption_cache_stats() -> dict:
+    """Report caption cache hit rate and per-document captioning time. Usage: result = await mcp.call_tool('caption_cache_stats', {})"""
+    return CAPTIONER.stats()
+
 
-    return re.sub(r'!\[(.*?)\]\((.*?)\)', replace, markdown)
+@mcp.tool()
+def shard_stats() -> dict:
+    """Report shard sizes and scatter/gather search latency when sharding is enabled. Usage: result = await mcp.call_tool('shard_stats', {})"""
+    if SHARD_POOL is None:
+        return {"shards": 0}
+    return SHARD_POOL.stats()
 
 
 @mcp.tool()
 def convert_webpage_url_into_markdown(input: UrlInput) -> MarkdownOutput:
     """Return clean webpage content without Ads, and clutter. Usage: input={{"input": {{"url": "https://example.com"}}}} result = await mcp.call_tool('convert_webpage_url_into_markdown', input)"""
 
-    downloaded = trafilatura.fetch_url(input.url)
-    if not downloaded:
+    markdown = url_to_markdown(input.url)
+    if not markdown:
         return MarkdownOutput(markdown="Failed to download the webpage.")
 
-    markdown = trafilatura.extract(
-        downloaded,
-        include_comments=False,
-        include_tables=True,
-        include_images=True,
-        output_format='markdown'
-    ) or ""
-
     markdown = replace_images_with_captions(markdown)
     return MarkdownOutput(markdown=markdown)
 
@@ -233,23 +282,7 @@ def extract_pdf(input: FilePathInput) -> MarkdownOutput:
         return MarkdownOutput(markdown=f"File not found: {input.file_path}")
 
     ROOT = Path(__file__).parent.resolve()
-    global_image_dir = ROOT / "documents" / "images"
-    global_image_dir.mkdir(parents=True, exist_ok=True)
-
-    # Actual markdown with relative image paths
-    markdown = pymupdf4llm.to_markdown(
-        input.file_path,
-        write_images=True,
-        image_path=str(global_image_dir)
-    )
-
-    # Re-point image links in the markdown
-    markdown = re.sub(
-        r'!\[\]\((.*?/images/)([^)]+)\)',
-        r'![](images/\2)',
-        markdown.replace("\\", "/")
-    )
-
+    markdown = pdf_to_markdown(input.file_path, ROOT / "documents" / "images")
     markdown = replace_images_with_captions(markdown)
     return MarkdownOutput(markdown=markdown)
 
@@ -324,98 +357,100 @@ Keep markdown formatting intact.
 
 
 
-def process_documents():
+CHUNKING = load_profile_section("chunking")
+SEARCH_CONFIG = load_profile_section("search")  # hybrid fusion settings for search_stored_documents
+RERANKER = Reranker(load_profile_section("rerank"))  # disabled unless rerank.enabled is set
+CACHE_CONFIG = load_profile_section("result_cache")
+RESULT_CACHE = QueryResultCache(
+    max_entries=CACHE_CONFIG.get("max_entries", 512),
+    semantic_threshold=CACHE_CONFIG.get("semantic_threshold"),  # None = exact (normalized) matches only
+)
+# "structure" (default) splits on markdown structure + embedding breakpoints; "llm" uses semantic_merge
+CHUNKER = get_chunker(
+    CHUNKING.get("strategy", DEFAULT_STRATEGY),
+    embed=EMBEDDER.embed_batch,
+    llm_segment=semantic_merge,
+    **{k: v for k, v in CHUNKING.items() if k != "strategy"},
+)
+
+
+def chunk_markdown(markdown: str) -> list[str]:
+    if len(markdown.split()) < 10:
+        mcp_log("WARN", "Content too short for chunking → Keeping as one chunk.")
+        return [markdown.strip()]
+    return CHUNKER(markdown)
+
+
+def process_documents(workers: int = DEFAULT_WORKERS, doc_path: Path = None, index_dir: Path = None):
     """Process documents and create FAISS index using unified multimodal strategy."""
     mcp_log("INFO", "Indexing documents with unified RAG pipeline...")
     ROOT = Path(__file__).parent.resolve()
-    DOC_PATH = ROOT / "documents"
-    INDEX_CACHE = ROOT / "faiss_index"
-    INDEX_CACHE.mkdir(exist_ok=True)
-    INDEX_FILE = INDEX_CACHE / "index.bin"
-    METADATA_FILE = INDEX_CACHE / "metadata.json"
-    CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
-
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
-    CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-
-    for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
+    DOC_PATH = Path(doc_path) if doc_path else ROOT / "documents"
+    INDEX_CACHE = Path(index_dir) if index_dir else ROOT / "faiss_index"
+
+    if not DOC_PATH.is_dir():
+        mcp_log("WARN", f"Document folder not found: {DOC_PATH}")
+        return
+
+    # Plan against the manifest alone. Files whose size, mtime and inode match it are not read;
+    # the rest are hashed. index.bin, metadata and BM25 are loaded only if there is work to do.
+    manifest = read_manifest(INDEX_CACHE)
+    files = list(DOC_PATH.glob("*.*"))
+    present = {file.name for file in files}
+    deleted = [name for name in manifest if name not in present]
+    pending, refreshed = [], 0
+    for file in files:
+        fp, unchanged = fingerprint(file, manifest_fingerprint(manifest, file.name))
+        if unchanged:
+            refreshed += refresh_manifest_entry(manifest, file.name, fp)
             mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
             continue
-
-        mcp_log("PROC", f"Processing: {file.name}")
-        try:
-            ext = file.suffix.lower()
-            markdown = ""
-
-            if ext == ".pdf":
-                mcp_log("INFO", f"Using MuPDF4LLM to extract {file.name}")
-                markdown = extract_pdf(FilePathInput(file_path=str(file))).markdown
-
-            elif ext in [".html", ".htm", ".url"]:
-                mcp_log("INFO", f"Using Trafilatura to extract {file.name}")
-                markdown = extract_webpage(UrlInput(url=file.read_text().strip())).markdown
-
-            else:
-                # Fallback to MarkItDown for other formats
-                converter = MarkItDown()
-                mcp_log("INFO", f"Using MarkItDown fallback for {file.name}")
-                markdown = converter.convert(str(file)).text_content
-
-            if not markdown.strip():
-                mcp_log("WARN", f"No content extracted from {file.name}")
-                continue
-
-            if len(markdown.split()) < 10:
-                mcp_log("WARN", f"Content too short for semantic merge in {file.name} → Skipping chunking.")
-                chunks = [markdown.strip()]
-            else:
-                mcp_log("INFO", f"Running semantic merge on {file.name} with {len(markdown.split())} words")
-                chunks = semantic_merge(markdown)
-
-
-            embeddings_for_file = []
-            new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
-                new_metadata.append({
-                    "doc": file.name,
-                    "chunk": chunk,
-                    "chunk_id": f"{file.stem}_{i}"
-                })
-
-            if embeddings_for_file:
-                if index is None:
-                    dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
-                metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
-
-                # ✅ Immediately save index and metadata
-                CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
-                METADATA_FILE.write_text(json.dumps(metadata, indent=2))
-                faiss.write_index(index, str(INDEX_FILE))
-                mcp_log("SAVE", f"Saved FAISS index and metadata after processing {file.name}")
-
-        except Exception as e:
-            mcp_log("ERROR", f"Failed to process {file.name}: {e}")
+        pending.append((file, fp))
+    if refreshed:
+        write_json(manifest, INDEX_CACHE / MANIFEST)
+
+    if not pending and not deleted and not layout_pending(INDEX_CACHE, SHARDS):
+        mcp_log("INFO", f"No changes in {len(files)} files; index left as is")
+        return IngestStats(0).summary()
+
+    store = DocumentStore(INDEX_CACHE, INDEX_CONFIG, shards=SHARDS)
+
+    # Purge files that were indexed but no longer exist
+    deleted = [name for name in store.manifest if name not in present]
+    for name in deleted:
+        removed = store.remove_file(name)
+        mcp_log("DEL", f"Removed {removed} chunks of deleted file: {name}")
+    if deleted or store.layout_changed:  # layout: shard count changed in profiles.yaml
+        store.save()
+        DOC_INDEX.invalidate()
+
+    # Extraction runs in a process pool; captioning, semantic merge and embedding overlap
+    # across files, and a single writer saves the index every few files.
+    pipeline = IngestPipeline(
+        store,
+        segment=chunk_markdown,
+        embed=EMBEDDER.embed_batch,
+        caption=replace_images_with_captions,
+        image_dir=DOC_PATH / "images",
+        workers=workers,
+        on_commit=DOC_INDEX.invalidate,
+    )
+    stats = pipeline.run(pending)
+    mcp_log("INFO", f"Indexed {stats['files']} files ({stats['failed']} failed), {stats['chunks']} chunks "
+                    f"in {stats['seconds']:.1f}s: {stats['files_per_sec']:.2f} files/s, "
+                    f"{stats['chunks_per_sec']:.1f} chunks/s")
+    return stats
 
 
 
 def ensure_faiss_ready():
     from pathlib import Path
-    index_path = ROOT / "faiss_index" / "index.bin"
-    meta_path = ROOT / "faiss_index" / "metadata.json"
-    
+    index_path = DOC_INDEX.index_path  # index.bin, or shards/shards.json when sharded
+    meta_path = ROOT / "faiss_index" / "metadata.sqlite"
+    legacy_meta_path = ROOT / "faiss_index" / "metadata.json"
+
     try:
-        if not (index_path.exists() and meta_path.exists()):
+        if not (index_path.exists() and (meta_path.exists() or legacy_meta_path.exists())):
             mcp_log("INFO", "Index not found — running process_documents()...")
             # Create faiss_index directory if it doesn't exist
             (ROOT / "faiss_index").mkdir(exist_ok=True)
@@ -426,10 +461,10 @@ def ensure_faiss_ready():
         mcp_log("ERROR", f"Failed to initialize FAISS index: {str(e)}")
         # Create empty index if initialization fails
         if not index_path.exists():
-            dim = 384  # Default dimension for nomic-embed-text
-            index = faiss.IndexFlatL2(dim)
-            faiss.write_index(index, str(index_path))
-            meta_path.write_text("[]")
+            dim = EMBEDDER.dimension or NOMIC_EMBED_DIM
+            store = DocumentStore(ROOT / "faiss_index", INDEX_CONFIG, shards=SHARDS)
+            store.create_index(dim)
+            store.save()
             mcp_log("INFO", "Created empty FAISS index as fallback")
 
 
@@ -444,7 +479,19 @@ if __name__ == "__main__":
     
     print("Starting MCP server...", file=sys.stderr)
     try:
-        if len(sys.argv) > 1 and sys.argv[1] == "dev":
+        if len(sys.argv) > 1 and sys.argv[1] == "index":
+            # Offline (re)indexing: python mcp_server_2.py index --workers 8
+            import argparse
+            parser = argparse.ArgumentParser(prog="mcp_server_2.py index")
+            parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                                help="extraction processes (pymupdf4llm/trafilatura/MarkItDown)")
+            args = parser.parse_args(sys.argv[2:])
+            process_documents(workers=args.workers)
+        elif len(sys.argv) > 1 and sys.argv[1] == "migrate":
+            # One-time move of faiss_index/metadata.json into metadata.sqlite
+            migrated = migrate_metadata_json(ROOT / "faiss_index", INDEX_CONFIG, shards=SHARDS)
+            print(f"Migrated {migrated} metadata entries to faiss_index/metadata.sqlite", file=sys.stderr)
+        elif len(sys.argv) > 1 and sys.argv[1] == "dev":
             print("Running in dev mode", file=sys.stderr)
             mcp.run()  # Run without transport for dev server
         else:
@@ -13,6 +13,9 @@ import re
 from pydantic import BaseModel, Field
 from models import SearchInput, UrlInput
 from models import PythonCodeOutput  # Import the models we need
+from pathlib import Path
+import yaml
+from modules.result_cache import QueryResultCache
 
 
 @dataclass
@@ -214,17 +217,45 @@ searcher = DuckDuckGoSearcher()
 fetcher = WebContentFetcher()
 
 
+def load_cache_config() -> dict:
+    profile_path = Path(__file__).parent / "config" / "profiles.yaml"
+    if not profile_path.exists():
+        return {}
+    return (yaml.safe_load(profile_path.read_text()) or {}).get("result_cache", {}) or {}
+
+
+CACHE_CONFIG = load_cache_config()
+# Web results go stale, so entries expire; there is no index generation to invalidate on
+SEARCH_CACHE = QueryResultCache(
+    max_entries=CACHE_CONFIG.get("max_entries", 512),
+    ttl=CACHE_CONFIG.get("web_ttl_seconds", 900),
+)
+
+
 @mcp.tool()
 async def duckduckgo_search_results(input: SearchInput, ctx: Context) -> str:
     """Search DuckDuckGo. Usage: input={"input": {"query": "latest AI developments", "max_results": 5} } result = await mcp.call_tool('duckduckgo_search_results', input)"""
     try:
+        cached = SEARCH_CACHE.get(input.query, input.max_results, "web")
+        if cached is not None:
+            await ctx.info(f"Returning cached results for: {input.query}")
+            return PythonCodeOutput(result=cached)
         results = await searcher.search(input.query, ctx, input.max_results)
-        return PythonCodeOutput(result=searcher.format_results_for_llm(results))
+        formatted = searcher.format_results_for_llm(results)
+        if results:  # an empty page is usually bot detection; retry it next time
+            SEARCH_CACHE.put(input.query, input.max_results, "web", formatted)
+        return PythonCodeOutput(result=formatted)
     except Exception as e:
         traceback.print_exc(file=sys.stderr)
         return f"An error occurred while searching: {str(e)}"
 
 
+@mcp.tool()
+def web_search_cache_stats() -> dict:
+    """Report hit/miss counters of the duckduckgo_search_results cache. Usage: result = await mcp.call_tool('web_search_cache_stats', {})"""
+    return SEARCH_CACHE.stats()
+
+
 @mcp.tool()
 async def download_raw_html_from_url(input: UrlInput, ctx: Context) -> str:
     """Fetch webpage content. Usage: input={"input": {"url": "https://example.com"} } result = await mcp.call_tool('download_raw_html_from_url', input)"""
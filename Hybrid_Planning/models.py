@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Literal
 
 # --- Math Tools ---
 
@@ -169,6 +169,8 @@ class SearchInput(BaseModel):
 
 class SearchDocumentsInput(BaseModel):
     query: str
+    mode: Literal["hybrid", "dense", "lexical"] = "hybrid"  # lexical = BM25 only, no embedding call
+    k: int = Field(5, ge=1, le=50)
 
 class UrlInput(BaseModel):
     url: str
@@ -0,0 +1,204 @@
+# modules/bm25.py
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60  # reciprocal rank fusion constant
+
+TOKEN = re.compile(r"[\w][\w.,/-]*[\w]|[\w]", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. Amounts and codes such as 1,73,06,250 or NSE/INVG/67564 are kept
+    whole and also split into their parts, so both forms of a query match.
+    """
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[.,/-]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-process BM25 over chunks addressed by the same int64 ids as the FAISS index.
+    Documents are kept as compact (term id, tf) arrays so add/remove are incremental; the
+    term-major postings used for scoring are rebuilt with one argsort when the index changes.
+    """
+
+    def __init__(self, k1: float = K1, b: float = B):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.docs: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}  # id -> (term ids, tfs)
+        self._lock = threading.Lock()
+        self._postings = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _term_ids(self, tokens: Iterable[str], grow: bool) -> List[int]:
+        ids = []
+        for token in tokens:
+            term = self.vocab.get(token)
+            if term is None and grow:
+                term = self.vocab[token] = len(self.vocab)
+            if term is not None:
+                ids.append(term)
+        return ids
+
+    def add(self, ids: Sequence[int], texts: Sequence[str]):
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                terms, tfs = np.unique(np.array(self._term_ids(tokenize(text), grow=True), dtype=np.int32),
+                                       return_counts=True)
+                self.docs[int(doc_id)] = (terms.astype(np.int32), tfs.astype(np.int32))
+            self._postings = None
+
+    def remove(self, ids: Iterable[int]):
+        with self._lock:
+            for doc_id in ids:
+                self.docs.pop(int(doc_id), None)
+            self._postings = None
+
+    def _build_postings(self):
+        doc_ids = np.fromiter(self.docs.keys(), dtype=np.int64, count=len(self.docs))
+        lengths = np.array([tfs.sum() for _, tfs in self.docs.values()], dtype=np.float32)
+        counts = np.array([len(terms) for terms, _ in self.docs.values()], dtype=np.int64)
+        if len(doc_ids):
+            terms = np.concatenate([terms for terms, _ in self.docs.values()])
+            tfs = np.concatenate([tfs for _, tfs in self.docs.values()]).astype(np.float32)
+        else:
+            terms, tfs = np.zeros(0, np.int32), np.zeros(0, np.float32)
+        rows = np.repeat(np.arange(len(doc_ids)), counts)
+        order = np.argsort(terms, kind="stable")
+        offsets = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=offsets[1:])
+        avgdl = max(lengths.mean() if len(lengths) else 1.0, 1e-9)
+        self._postings = {
+            "doc_ids": doc_ids,
+            "avgdl": avgdl,
+            "norm": self.k1 * (1 - self.b + self.b * lengths / avgdl),
+            "offsets": offsets,
+            "rows": rows[order],
+            "tfs": tfs[order],
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top-k (id, score) pairs; only documents containing a query term are scored."""
+        with self._lock:
+            if not self.docs:
+                return []
+            if self._postings is None:
+                self._build_postings()
+            postings = self._postings
+            terms = set(self._term_ids(tokenize(query), grow=False))
+        n = len(postings["doc_ids"])
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            start, end = postings["offsets"][term], postings["offsets"][term + 1]
+            if start == end:
+                continue
+            rows, tfs = postings["rows"][start:end], postings["tfs"][start:end]
+            df = end - start
+            idf = np.log1p((n - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + postings["norm"][rows])
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits])[:k]]
+        return [(int(postings["doc_ids"][row]), float(scores[row])) for row in top]
+
+    def score(self, query: str, ids: Sequence[int]) -> np.ndarray:
+        """BM25 scores of the given ids (e.g. dense candidates); 0 for ids without a query term."""
+        scores = np.zeros(len(ids), dtype=np.float32)
+        with self._lock:
+            if not self.docs:
+                return scores
+            if self._postings is None:
+                self._build_postings()
+            postings = self._postings
+            terms = np.array(sorted(set(self._term_ids(tokenize(query), grow=False))), dtype=np.int32)
+            docs = [self.docs.get(int(doc_id)) for doc_id in ids]
+        if not len(terms):
+            return scores
+        n = len(postings["doc_ids"])
+        df = np.diff(postings["offsets"])[terms]
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        for i, doc in enumerate(docs):
+            if doc is None:
+                continue
+            doc_terms, doc_tfs = doc
+            mask = np.isin(doc_terms, terms)
+            if not mask.any():
+                continue
+            tfs = doc_tfs[mask].astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_tfs.sum() / postings["avgdl"])
+            scores[i] = np.sum(idf[np.searchsorted(terms, doc_terms[mask])] * tfs * (self.k1 + 1) / (tfs + norm))
+        return scores
+
+    def save(self, path: Path):
+        """Write-then-rename, like the FAISS index next to it."""
+        with self._lock:
+            doc_ids = np.fromiter(self.docs.keys(), dtype=np.int64, count=len(self.docs))
+            counts = np.array([len(terms) for terms, _ in self.docs.values()], dtype=np.int64)
+            terms = np.concatenate([t for t, _ in self.docs.values()]) if self.docs else np.zeros(0, np.int32)
+            tfs = np.concatenate([f for _, f in self.docs.values()]) if self.docs else np.zeros(0, np.int32)
+            vocab = np.array(sorted(self.vocab, key=self.vocab.get), dtype=np.str_)
+        tmp_path = Path(str(path) + ".tmp.npz")
+        np.savez(tmp_path, doc_ids=doc_ids, counts=counts, terms=terms, tfs=tfs, vocab=vocab,
+                 params=np.array([self.k1, self.b]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        if not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            index = cls(*data["params"].tolist())
+            index.vocab = {term: i for i, term in enumerate(data["vocab"].tolist())}
+            bounds = np.concatenate([[0], np.cumsum(data["counts"])])
+            terms, tfs = data["terms"], data["tfs"]
+            for i, doc_id in enumerate(data["doc_ids"].tolist()):
+                index.docs[doc_id] = (terms[bounds[i]:bounds[i + 1]], tfs[bounds[i]:bounds[i + 1]])
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def weighted_fusion(dense: Sequence[Tuple[int, float]], lexical: Sequence[Tuple[int, float]],
+                    dense_weight: float = 0.5) -> List[Tuple[int, float]]:
+    """Blend min-max normalised dense similarities and BM25 scores."""
+    def normalise(results):
+        if not results:
+            return {}
+        values = np.array([score for _, score in results], dtype=np.float32)
+        span = float(values.max() - values.min()) or 1.0
+        return {doc_id: (score - float(values.min())) / span for doc_id, score in results}
+
+    dense_scores, lexical_scores = normalise(dense), normalise(lexical)
+    fused = {doc_id: dense_weight * dense_scores.get(doc_id, 0.0) + (1 - dense_weight) * lexical_scores.get(doc_id, 0.0)
+             for doc_id in set(dense_scores) | set(lexical_scores)}
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -0,0 +1,205 @@
+# modules/captions.py
+
+import io
+import re
+import sys
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / "cache" / "captions.sqlite"
+IMAGE_LINK = re.compile(r'!\[(.*?)\]\((.*?)\)')
+
+# Settings under `captioning:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_CAPTION_CONFIG = {
+    "concurrency": 2,            # caption requests in flight across all documents
+    "max_side": 1024,            # longest image side sent to the vision model, in pixels
+    "max_images_per_doc": 40,    # uncached images captioned per document; the rest keep their alt text
+    "max_seconds_per_doc": 300,  # wall-clock captioning budget per document
+}
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def downscale_image(data: bytes, max_side: int) -> bytes:
+    """Re-encode as JPEG with the longest side at most max_side; small images pass through."""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) <= max_side and img.format in ("JPEG", "PNG"):
+                return data
+            img.thumbnail((max_side, max_side))
+            out = io.BytesIO()
+            img.convert("RGB").save(out, format="JPEG", quality=85)
+    except Exception as e:
+        _log("WARN", f"Could not downscale image ({e}), sending it unchanged")
+        return data
+    return out.getvalue()
+
+
+class CaptionCache:
+    """Captions keyed by (model, sha256 of the image bytes), so a figure is captioned once."""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS captions ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, caption TEXT NOT NULL, PRIMARY KEY (model, key))"
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, model: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT caption FROM captions WHERE model = ? AND key = ?", (model, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, key: str, caption: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captions (model, key, caption) VALUES (?, ?, ?)", (model, key, caption)
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {"entries": entries, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class ImageCaptioner:
+    """
+    Replaces markdown image links with captions. All images of a document are read and hashed
+    up front, cache misses are captioned on a shared pool of `concurrency` workers (so parallel
+    documents never exceed it), and captions are substituted back in document order.
+    Images past the per-document count or time budget keep their alt text and are not cached,
+    so a later ingest can still caption them.
+    """
+
+    def __init__(self, caption_bytes: Callable[[bytes], str], model: str, base_dir: Path,
+                 config: Optional[dict] = None, cache: Optional[CaptionCache] = None,
+                 delete_images: bool = True):
+        self.config = {**DEFAULT_CAPTION_CONFIG, **(config or {})}
+        self.caption_bytes = caption_bytes
+        self.model = model
+        self.base_dir = Path(base_dir)
+        self.cache = cache or CaptionCache()
+        self.delete_images = delete_images
+        self.history = deque(maxlen=50)  # per-document stats of the most recent documents
+        self._pool = ThreadPoolExecutor(max_workers=self.config["concurrency"], thread_name_prefix="caption")
+
+    def _read(self, src: str) -> Optional[bytes]:
+        if src.startswith("http"):
+            response = requests.get(src, timeout=30)
+            response.raise_for_status()
+            return response.content
+        path = (self.base_dir / src).resolve()
+        return path.read_bytes() if path.exists() else None
+
+    def _caption(self, key: str, data: bytes) -> str:
+        caption = self.caption_bytes(downscale_image(data, self.config["max_side"]))
+        if caption:
+            self.cache.put(self.model, key, caption)
+        return caption
+
+    def __call__(self, markdown: str, name: str = "document") -> Tuple[str, dict]:
+        """Return the captioned markdown and per-document timing stats."""
+        start = time.perf_counter()
+        matches = list(IMAGE_LINK.finditer(markdown))
+        stats = {"images": len(matches), "cached": 0, "captioned": 0, "over_budget": 0, "failed": 0}
+        captions: Dict[str, str] = {}
+        captioned = set()  # local images whose caption is now cached, safe to delete
+        pending: Dict[str, tuple] = {}  # src -> (key, bytes) of cache misses
+        for match in matches:
+            src = match.group(2)
+            if src in captions or src in pending:
+                continue
+            try:
+                data = self._read(src)
+            except Exception as e:
+                _log("WARN", f"Could not read image {src}: {e}")
+                data = None
+            if data is None:
+                captions[src] = f"[Image file not found: {src}]"
+                stats["failed"] += 1
+                continue
+            key = CaptionCache.key(data)
+            cached = self.cache.get(self.model, key)
+            if cached is not None:
+                captions[src] = cached
+                captioned.add(src)
+                stats["cached"] += 1
+            else:
+                pending[src] = (key, data)
+
+        budget = list(pending.items())[: self.config["max_images_per_doc"]]  # cache hits are free
+        futures = {self._pool.submit(self._caption, key, data): src for src, (key, data) in budget}
+        remaining = self.config["max_seconds_per_doc"] - (time.perf_counter() - start)
+        done, not_done = wait(futures, timeout=max(0.0, remaining))
+        for future in not_done:
+            future.cancel()  # still running ones finish in the background and populate the cache
+        for future in done:
+            src = futures[future]
+            try:
+                caption = future.result()
+            except Exception as e:
+                _log("WARN", f"Failed to caption image {src}: {e}")
+                caption = ""
+            if caption:
+                captions[src] = caption
+                captioned.add(src)
+                stats["captioned"] += 1
+            else:
+                stats["failed"] += 1
+        stats["over_budget"] = len(pending) - len(done)
+
+        def replace(match):
+            alt, src = match.group(1), match.group(2)
+            if src in captions:
+                return f"**Image:** {captions[src]}"
+            return f"**Image:** {alt}" if alt else f"[Image not captioned: {src}]"
+
+        result = IMAGE_LINK.sub(replace, markdown)
+        if self.delete_images:
+            # over-budget and failed images stay on disk for a later ingest to caption
+            for src in (src for src in captioned if not src.startswith("http")):
+                path = self.base_dir / src
+                if path.exists():
+                    path.unlink()
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        if matches:
+            self.history.append({"document": name, **stats})
+            _log("INFO", f"Captioned {name}: {stats['images']} images, {stats['cached']} cached, "
+                         f"{stats['captioned']} new, {stats['over_budget']} over budget, "
+                         f"{stats['failed']} failed in {stats['seconds']:.1f}s")
+        return result, stats
+
+    def stats(self) -> dict:
+        return {"cache": self.cache.stats(), "config": self.config, "documents": list(self.history)}
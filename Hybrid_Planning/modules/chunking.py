@@ -0,0 +1,173 @@
+# modules/chunking.py
+
+import re
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_STRATEGY = "structure"
+MAX_WORDS = 512
+MIN_WORDS = 40
+BREAKPOINT_PERCENTILE = 90  # consecutive blocks further apart than this percentile start a new chunk
+
+HEADING = re.compile(r"^#{1,6}\s")
+FENCE = re.compile(r"^(```|~~~)")
+
+
+class Block:
+    __slots__ = ("text", "words", "hard")
+
+    def __init__(self, text: str, hard: bool = False):
+        self.text = text
+        self.words = len(text.split())
+        self.hard = hard  # a chunk must start here (heading)
+
+
+def split_blocks(markdown: str, max_words: int = MAX_WORDS) -> List[Block]:
+    """
+    Split markdown into paragraph-level blocks. Headings attach to the block that follows
+    them and force a boundary; tables and fenced code stay whole; blocks longer than
+    max_words are cut into max_words windows.
+    """
+    blocks: List[Block] = []
+    lines: List[str] = []
+    heading: List[str] = []
+    in_fence = in_table = False
+
+    def flush():
+        nonlocal lines, heading
+        if not lines:
+            return
+        text = "\n".join(heading + lines).strip()
+        if text:
+            blocks.append(Block(text, hard=bool(heading)))
+        lines, heading = [], []
+
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if in_fence:
+            lines.append(line)
+            if FENCE.match(stripped):
+                in_fence = False
+                flush()
+            continue
+        if FENCE.match(stripped):
+            flush()
+            in_fence = True
+            lines.append(line)
+            continue
+        if HEADING.match(stripped):
+            if lines:
+                flush()
+            heading.append(line)  # consecutive headings stay together
+            in_table = False
+            continue
+        is_table_row = stripped.startswith("|")
+        if is_table_row != in_table:  # a table starts or ends
+            flush()
+            in_table = is_table_row
+        if not stripped:
+            flush()
+            continue
+        lines.append(line)
+    flush()
+    if heading:  # trailing heading with no body
+        blocks.append(Block("\n".join(heading).strip(), hard=True))
+
+    sized: List[Block] = []
+    for block in blocks:
+        if block.words <= max_words:
+            sized.append(block)
+            continue
+        words = block.text.split()
+        for i in range(0, len(words), max_words):
+            sized.append(Block(" ".join(words[i:i + max_words]), hard=block.hard and i == 0))
+    return sized
+
+
+def semantic_breakpoints(vectors: np.ndarray, percentile: float = BREAKPOINT_PERCENTILE) -> np.ndarray:
+    """
+    Boolean mask over block gaps: True where the cosine distance between block i and
+    block i+1 exceeds the given percentile of all gaps in the document.
+    """
+    if len(vectors) < 3:
+        return np.zeros(max(len(vectors) - 1, 0), dtype=bool)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.maximum(norms, 1e-12)
+    distances = 1.0 - np.einsum("ij,ij->i", unit[:-1], unit[1:])
+    return distances > np.percentile(distances, percentile)
+
+
+def structure_chunks(
+    markdown: str,
+    embed: Optional[Callable[[Sequence[str]], np.ndarray]] = None,
+    max_words: int = MAX_WORDS,
+    min_words: int = MIN_WORDS,
+    percentile: float = BREAKPOINT_PERCENTILE,
+) -> List[str]:
+    """
+    Chunk on markdown structure, then on embedding-similarity breakpoints between
+    paragraphs (one batched embed call per document). Without embed, structure only.
+    """
+    blocks = split_blocks(markdown, max_words)
+    if not blocks:
+        return []
+    breaks = np.zeros(len(blocks) - 1, dtype=bool)
+    if embed is not None and len(blocks) > 2:
+        breaks = semantic_breakpoints(embed([block.text for block in blocks]), percentile)
+
+    chunks: List[List[str]] = [[blocks[0].text]]
+    size = blocks[0].words
+    for i, block in enumerate(blocks[1:]):
+        too_big = size + block.words > max_words
+        topic_shift = breaks[i] and size >= min_words
+        if block.hard or too_big or topic_shift:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(block.text)
+        size += block.words
+    return ["\n\n".join(parts) for parts in chunks]
+
+
+class StructureChunker:
+    """Fast default: markdown structure + embedding breakpoints, no LLM calls."""
+
+    name = "structure"
+
+    def __init__(self, embed=None, max_words: int = MAX_WORDS, min_words: int = MIN_WORDS,
+                 breakpoint_percentile: float = BREAKPOINT_PERCENTILE, **_):
+        self.embed = embed
+        self.max_words = max_words
+        self.min_words = min_words
+        self.percentile = breakpoint_percentile
+
+    def __call__(self, markdown: str) -> List[str]:
+        return structure_chunks(markdown, self.embed, self.max_words, self.min_words, self.percentile)
+
+
+class LLMChunker:
+    """Opt-in: the LLM segmenter (semantic_merge), one chat call per 512-word window."""
+
+    name = "llm"
+
+    def __init__(self, llm_segment: Callable[[str], List[str]] = None, **_):
+        if llm_segment is None:
+            raise ValueError("The llm chunking strategy needs an llm_segment function")
+        self.llm_segment = llm_segment
+
+    def __call__(self, markdown: str) -> List[str]:
+        return self.llm_segment(markdown)
+
+
+CHUNKERS = {
+    StructureChunker.name: StructureChunker,
+    LLMChunker.name: LLMChunker,
+}
+
+
+def get_chunker(strategy: str = DEFAULT_STRATEGY, **options) -> Callable[[str], List[str]]:
+    """Build a chunker by name; options not used by a strategy are ignored."""
+    if strategy not in CHUNKERS:
+        raise ValueError(f"Unknown chunking strategy '{strategy}', expected one of {sorted(CHUNKERS)}")
+    return CHUNKERS[strategy](**options)
@@ -0,0 +1,604 @@
+# modules/doc_index.py
+
+import json
+import math
+import os
+import sys
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+from modules.ann_index import (
+    configure_search, conform_metric, has_ids, index_contents, maybe_promote, merge_config, new_index,
+    prepare_vectors, reconstruct_ids, remove_ids,
+)
+from modules.bm25 import RRF_K, BM25Index, reciprocal_rank_fusion, weighted_fusion
+
+SEARCH_MODES = ("hybrid", "dense", "lexical")
+SHARD_DIR = "shards"
+SHARD_MANIFEST = "shards.json"
+MANIFEST = "doc_index_cache.json"
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def read_index(path: Path, mmap: bool = True):
+    """Read a FAISS index, memory-mapping it where the index type supports IO_FLAG_MMAP."""
+    if mmap and hasattr(faiss, "IO_FLAG_MMAP"):
+        try:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass  # index type without mmap support
+    return faiss.read_index(str(path))
+
+
+def write_index(index: Any, path: Path) -> None:
+    """Write-then-rename so a memory-mapped reader never sees a half-written file."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+
+
+def write_json(data: Any, path: Path, indent: Optional[int] = 2) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def chunk_faiss_id(doc: str, chunk_index: int) -> int:
+    """Stable non-negative int64 id for the chunk_index-th chunk of a document."""
+    digest = hashlib.blake2b(f"{doc}\x00{chunk_index}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def build_lexical(chunks: List[Tuple[int, str]]) -> BM25Index:
+    """BM25 index over (id, chunk text) pairs, for stores written before bm25.npz existed."""
+    lexical = BM25Index()
+    if chunks:
+        ids, texts = zip(*chunks)
+        lexical.add(ids, texts)
+    _log("INFO", f"Built BM25 index over {len(chunks)} chunks")
+    return lexical
+
+
+def metadata_by_id(metadata: Any) -> Dict[int, dict]:
+    """Index metadata entries by FAISS id; legacy lists without ids map by position."""
+    if isinstance(metadata, dict):
+        return {int(k): v for k, v in metadata.items()}
+    return {int(entry.get("id", pos)): entry for pos, entry in enumerate(metadata)}
+
+
+class MetadataStore:
+    """
+    Chunk metadata in an indexed SQLite table keyed by FAISS id, so a search reads only its
+    top-k rows and an ingest writes only the rows of the file it changed.
+    Writes stay in an open transaction until commit(), which DocumentStore.save() calls
+    before the index itself is replaced.
+    """
+
+    FIELDS = ("doc", "chunk", "chunk_id")
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id INTEGER PRIMARY KEY, doc TEXT NOT NULL, chunk TEXT NOT NULL, chunk_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc)")
+        self._conn.commit()
+
+    def get_many(self, ids) -> Dict[int, dict]:
+        ids = [int(i) for i in ids if i >= 0]
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, doc, chunk, chunk_id FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {row[0]: {"id": row[0], "doc": row[1], "chunk": row[2], "chunk_id": row[3]} for row in rows}
+
+    def put_many(self, entries: List[dict]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, doc, chunk, chunk_id) VALUES (?, ?, ?, ?)",
+                [(int(e["id"]), e["doc"], e["chunk"], str(e["chunk_id"])) for e in entries],
+            )
+
+    def ids_for_doc(self, doc: str) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM chunks WHERE doc = ?", (doc,))]
+
+    def delete_ids(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(int(i),) for i in ids])
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def all_chunks(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._conn.execute("SELECT id, chunk FROM chunks").fetchall()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def shard_of(ids, count: int) -> np.ndarray:
+    """Shard of each chunk id. Ids are blake2b hashes, so id % count spreads them evenly."""
+    return np.asarray(ids, dtype=np.int64) % count
+
+
+def shard_path(index_dir: Path, shard: int) -> Path:
+    return Path(index_dir) / SHARD_DIR / f"shard_{shard}.bin"
+
+
+def read_manifest(index_dir: Path) -> Dict[str, Any]:
+    """The per-file manifest alone, without loading the index, metadata or BM25."""
+    path = Path(index_dir) / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def manifest_fingerprint(manifest: Dict[str, Any], name: str) -> Optional[dict]:
+    entry = manifest.get(name)
+    if not isinstance(entry, dict):
+        return {"hash": entry} if entry else None
+    return {key: value for key, value in entry.items() if key != "chunk_ids"}
+
+
+def refresh_manifest_entry(manifest: Dict[str, Any], name: str, fingerprint: dict) -> bool:
+    """Record new stat fields of an unchanged file; True if the manifest changed."""
+    entry = manifest.get(name)
+    if not isinstance(entry, dict):
+        return False
+    updated = {**entry, **fingerprint}
+    if updated == entry:
+        return False
+    manifest[name] = updated
+    return True
+
+
+def layout_pending(index_dir: Path, shards: int) -> bool:
+    """
+    True when opening a DocumentStore with `shards` would move vectors between index.bin and
+    shards/ (see DocumentStore._apply_sharding), decided from file presence and shards.json only.
+    """
+    index_dir = Path(index_dir)
+    shard_manifest = index_dir / SHARD_DIR / SHARD_MANIFEST
+    has_index = (index_dir / "index.bin").exists()
+    if not shards:
+        return not has_index and shard_manifest.exists()
+    if shard_manifest.exists():
+        return json.loads(shard_manifest.read_text())["count"] != shards
+    return has_index
+
+
+class ShardSet:
+    """
+    A document index split by chunk id into `count` shards of the configured index type, stored
+    as shards/shard_<i>.bin with shards/shards.json written last. DocumentStore routes adds and
+    removals to the owning shard; ShardPool (modules/shard_pool.py) searches them in parallel.
+    """
+
+    def __init__(self, shards: List[Any], config: Optional[dict] = None):
+        self.shards = shards
+        self.config = config
+        self._dirty = set(range(len(shards)))  # shards changed since the last save()
+
+    @property
+    def count(self) -> int:
+        return len(self.shards)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards)
+
+    @property
+    def d(self) -> int:
+        return self.shards[0].d
+
+    @classmethod
+    def create(cls, count: int, dim: int, config: Optional[dict] = None) -> "ShardSet":
+        return cls([new_index(dim, config) for _ in range(count)], config)
+
+    @classmethod
+    def split(cls, index, count: int, config: Optional[dict] = None) -> "ShardSet":
+        """Re-route every vector of a single index, or of a ShardSet of another size."""
+        shard_set = cls.create(count, index.d, config)
+        for source in (index.shards if isinstance(index, ShardSet) else [index]):
+            vectors, ids = index_contents(source)
+            shard_set.add_with_ids(vectors, ids)
+        _log("INFO", f"Split {shard_set.ntotal} vectors into {count} shards")
+        return shard_set
+
+    def merged(self):
+        """All shards as one index, for turning sharding off again."""
+        index = new_index(self.d, self.config)
+        for shard in self.shards:
+            vectors, ids = index_contents(shard)
+            if len(ids):
+                index.add_with_ids(vectors, ids)
+        return index
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = shard_of(ids, self.count)
+        for shard in np.unique(owners).tolist():
+            mask = owners == shard
+            self.shards[shard].add_with_ids(vectors[mask], ids[mask])
+            self._dirty.add(shard)
+
+    def remove_ids(self, ids: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = shard_of(ids, self.count)
+        for shard in np.unique(owners).tolist():
+            self.shards[shard] = remove_ids(self.shards[shard], ids[owners == shard])
+            self._dirty.add(shard)
+
+    def promote(self) -> None:
+        """maybe_promote() each shard, with promote_at divided over the shards."""
+        config = merge_config(self.config)
+        config["promote_at"] = math.ceil(config["promote_at"] / self.count)
+        for i, shard in enumerate(self.shards):
+            promoted = maybe_promote(shard, config)
+            if promoted is not shard:
+                self.shards[i] = promoted
+                self._dirty.add(i)
+
+    def save(self, index_dir: Path) -> None:
+        (Path(index_dir) / SHARD_DIR).mkdir(parents=True, exist_ok=True)
+        for shard in sorted(self._dirty):
+            write_index(self.shards[shard], shard_path(index_dir, shard))
+        self._dirty.clear()
+        # Readers reload when the manifest changes, so it goes last
+        write_json({"count": self.count, "dim": self.d, "ntotal": [shard.ntotal for shard in self.shards]},
+                   Path(index_dir) / SHARD_DIR / SHARD_MANIFEST)
+
+    @classmethod
+    def load(cls, index_dir: Path, config: Optional[dict] = None) -> Optional["ShardSet"]:
+        manifest_path = Path(index_dir) / SHARD_DIR / SHARD_MANIFEST
+        if not manifest_path.exists():
+            return None
+        manifest = json.loads(manifest_path.read_text())
+        shard_set = cls([read_index(shard_path(index_dir, i), mmap=False) for i in range(manifest["count"])], config)
+        shard_set._dirty.clear()
+        return shard_set
+
+    @staticmethod
+    def delete(index_dir: Path) -> None:
+        """Remove the shard files after the index was written as a single index.bin."""
+        shard_dir = Path(index_dir) / SHARD_DIR
+        if (shard_dir / SHARD_MANIFEST).exists():
+            (shard_dir / SHARD_MANIFEST).unlink()
+        for path in shard_dir.glob("shard_*.bin"):
+            path.unlink()
+
+
+class ResidentIndex:
+    """
+    Holds the FAISS index in process memory; chunk metadata is read per query from
+    metadata.sqlite (or held in memory for a legacy, not yet migrated metadata.json).
+    The BM25 index in bm25.npz is held alongside for lexical and hybrid search.
+    The files are re-read only when index.bin changes on disk or invalidate() is called
+    after process_documents() writes a new index. With a shard_pool the dense index is a
+    ShardSet searched by worker processes, reloaded when shards/shards.json changes.
+    """
+
+    def __init__(self, index_dir: Path, mmap: bool = True, config: Optional[dict] = None, shard_pool=None):
+        self.shard_pool = shard_pool
+        self.index_path = Path(index_dir) / SHARD_DIR / SHARD_MANIFEST if shard_pool is not None \
+            else Path(index_dir) / "index.bin"
+        self.metadata_path = Path(index_dir) / "metadata.json"  # legacy, until migrated
+        self.sqlite_path = Path(index_dir) / "metadata.sqlite"
+        self.lexical_path = Path(index_dir) / "bm25.npz"
+        self.mmap = mmap
+        self.config = config
+        self.index = None
+        self.metadata: Dict[int, dict] = {}
+        self.metadata_db: Optional[MetadataStore] = None
+        self.lexical: Optional[BM25Index] = None
+        self.generation = 0  # bumped on every reload
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _disk_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.index_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+
+    def load(self) -> bool:
+        """Return True if an index is resident, reloading it first when it changed on disk."""
+        signature = self._disk_signature()
+        if signature is None:
+            return self.index is not None
+        if signature == self._signature:
+            return True
+
+        with self._lock:
+            if signature == self._signature:
+                return True
+            if self.shard_pool is not None:
+                index = self.shard_pool.load()  # workers re-read their shard files
+            else:
+                index = configure_search(read_index(self.index_path, mmap=self.mmap), self.config)
+            if self.sqlite_path.exists():
+                if self.metadata_db is None:
+                    self.metadata_db = MetadataStore(self.sqlite_path)
+                metadata = {}
+            else:
+                metadata = metadata_by_id(json.loads(self.metadata_path.read_text())) if self.metadata_path.exists() else {}
+            lexical = BM25Index.load(self.lexical_path)
+            if lexical is None:
+                chunks = self.metadata_db.all_chunks() if self.metadata_db is not None else \
+                    [(chunk_id, entry["chunk"]) for chunk_id, entry in metadata.items()]
+                lexical = build_lexical(chunks)
+            self.index, self.metadata, self.lexical = index, metadata, lexical
+            self._signature = signature
+            self.generation += 1
+            _log("INFO", f"Loaded FAISS index generation {self.generation}: {index.ntotal} vectors")
+        return True
+
+    def _entries(self, ids: List[int]) -> List[dict]:
+        metadata = self.metadata_db.get_many(ids) if self.metadata_db is not None else self.metadata
+        return [{**metadata[idx], "id": idx} for idx in ids if idx in metadata]  # only the top-k rows
+
+    def dense_ids(self, query_vec: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        index = self.index
+        if index is self.shard_pool:
+            D, I = index.search(query_vec, k)  # scattered to the shards, which prepare the vectors
+        else:
+            D, I = index.search(prepare_vectors(query_vec, index, self.config), k)
+        return [(int(idx), float(score)) for idx, score in zip(I[0], D[0]) if idx >= 0]
+
+    def chunk_vectors(self, entries: List[dict], embed) -> np.ndarray:
+        """
+        Vectors of search results, read back from the resident index (or the shard workers) by
+        chunk id. Only chunks it cannot reconstruct, e.g. of an IVF-PQ index without a direct
+        map or removed by a reload since the search, are passed to embed.
+        """
+        index = self.index
+        ids = [entry["id"] for entry in entries]
+        vectors, found = index.reconstruct_ids(ids) if index is self.shard_pool else reconstruct_ids(index, ids)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            vectors[missing] = np.asarray(embed([entries[i]["chunk"] for i in missing]), dtype=np.float32)
+        return vectors
+
+    def search(self, query_vec: np.ndarray, k: int) -> List[dict]:
+        if not self.load() or self.index.ntotal == 0:
+            return []
+        return self._entries([idx for idx, _ in self.dense_ids(query_vec, k)])
+
+    def hybrid_search(self, query: str, query_vec: Optional[np.ndarray], k: int, mode: str = "hybrid",
+                      fusion: str = "rrf", candidates: int = 50, rrf_k: int = RRF_K,
+                      dense_weight: float = 0.5) -> List[dict]:
+        """
+        Dense, lexical (BM25) or hybrid search. Hybrid takes `candidates` hits from each side and
+        fuses them by reciprocal rank (fusion="rrf") or by a weighted blend of normalized scores.
+        query_vec may be None in lexical mode.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {', '.join(SEARCH_MODES)}")
+        if not self.load() or self.index.ntotal == 0:
+            return []
+        if mode == "dense":
+            return self.search(query_vec, k)
+        if mode == "lexical":
+            return self._entries([idx for idx, _ in self.lexical.search(query, k)])
+
+        fetch = max(k, candidates)
+        dense, lexical = self.dense_ids(query_vec, fetch), self.lexical.search(query, fetch)
+        if self.index.metric_type == faiss.METRIC_L2:
+            dense = [(idx, -distance) for idx, distance in dense]  # higher is better for the blend
+        if fusion == "weighted":
+            fused = weighted_fusion(dense, lexical, dense_weight)
+        else:
+            fused = reciprocal_rank_fusion([[idx for idx, _ in dense], [idx for idx, _ in lexical]], rrf_k)
+        return self._entries([idx for idx, _ in fused[:k]])
+
+
+class DocumentStore:
+    """
+    Delete-aware document index: an IndexIDMap2 with stable per-chunk ids, chunk metadata
+    keyed by id in metadata.sqlite, a BM25 index over the same ids in bm25.npz, and a
+    per-file manifest ({file: {"hash", "size", "mtime_ns", "inode", "chunk_ids"}}, see
+    modules/fingerprint.py) in doc_index_cache.json.
+    Changed or deleted files have their old vectors removed before new ones are added, and
+    save() writes every file through a temp file + rename so a crash cannot corrupt the store.
+    With shards > 0 the vectors live in a ShardSet under shards/ instead of index.bin; changing
+    the shard count (or going back to 0) re-routes the existing vectors on load.
+    """
+
+    def __init__(self, index_dir: Path, config: Optional[dict] = None, shards: int = 0):
+        self.index_dir = Path(index_dir)
+        self.config = config  # `index:` section of profiles.yaml (see modules/ann_index.py)
+        self.shard_count = shards  # `sharding.shards` in profiles.yaml; 0 = a single index.bin
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.index_dir / "index.bin"
+        self.metadata_path = self.index_dir / "metadata.json"  # legacy, imported once
+        self.sqlite_path = self.index_dir / "metadata.sqlite"
+        self.lexical_path = self.index_dir / "bm25.npz"
+        self.manifest_path = self.index_dir / MANIFEST
+        self.index = None
+        self.metadata: Optional[MetadataStore] = None
+        self.lexical: Optional[BM25Index] = None
+        self.manifest: Dict[str, dict] = {}
+        self.migrated_rows = 0  # rows imported from metadata.json, retired on the next save()
+        self.layout_changed = False  # vectors moved between index.bin and shards/, not yet saved
+        self.load()
+
+    def load(self):
+        manifest = read_manifest(self.index_dir)
+        legacy = json.loads(self.metadata_path.read_text()) if self.metadata_path.exists() else None
+        index = read_index(self.index_path, mmap=False) if self.index_path.exists() else None
+
+        if index is not None and not has_ids(index):
+            index, legacy, manifest = self._upgrade_legacy(index, legacy or [], manifest)
+
+        self.index = self._apply_sharding(conform_metric(index, self.config))
+        self.metadata = MetadataStore(self.sqlite_path)
+        self.manifest = manifest
+        if legacy is not None:
+            entries = metadata_by_id(legacy)
+            self.metadata.put_many([{**entry, "id": chunk_id} for chunk_id, entry in entries.items()])
+            self.migrated_rows = len(entries)
+        self.lexical = BM25Index.load(self.lexical_path) or build_lexical(self.metadata.all_chunks())
+
+    def _apply_sharding(self, index):
+        shard_set = ShardSet.load(self.index_dir, self.config)
+        if not self.shard_count:
+            if index is None and shard_set is not None:
+                self.layout_changed = True
+                return shard_set.merged()
+            return index
+        if shard_set is not None and shard_set.count == self.shard_count:
+            return shard_set
+        source = shard_set if shard_set is not None else index
+        if source is None:
+            return None
+        self.layout_changed = True
+        return ShardSet.split(source, self.shard_count, self.config)
+
+    def create_index(self, dim: int):
+        self.index = ShardSet.create(self.shard_count, dim, self.config) if self.shard_count \
+            else new_index(dim, self.config)
+
+    @staticmethod
+    def _upgrade_legacy(index, metadata: List[dict], manifest: Dict[str, Any]):
+        """
+        Convert a positional IndexFlatL2 store to ids. Each re-ingestion appended a new block of
+        chunks (chunk_id suffix _0, _1, ...), so only the latest block per document is kept.
+        """
+        _log("INFO", f"Upgrading legacy FAISS index ({index.ntotal} vectors) to IndexIDMap2")
+        latest_start: Dict[str, int] = {}
+        for pos, entry in enumerate(metadata):
+            if str(entry.get("chunk_id", "")).rsplit("_", 1)[-1] == "0":
+                latest_start[entry["doc"]] = pos
+
+        keep: List[int] = []
+        for doc, start in latest_start.items():
+            pos = start
+            while pos < len(metadata) and metadata[pos]["doc"] == doc and \
+                    str(metadata[pos]["chunk_id"]).rsplit("_", 1)[-1] == str(pos - start):
+                keep.append(pos)
+                pos += 1
+
+        vectors = index.reconstruct_n(0, index.ntotal)
+        upgraded = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+        new_metadata, new_manifest = [], {}
+        ids = []
+        for pos in sorted(keep):
+            entry = dict(metadata[pos])
+            chunk_index = pos - latest_start[entry["doc"]]
+            entry["id"] = chunk_faiss_id(entry["doc"], chunk_index)
+            ids.append(entry["id"])
+            new_metadata.append(entry)
+            file_entry = new_manifest.setdefault(entry["doc"], {"hash": manifest.get(entry["doc"]), "chunk_ids": []})
+            file_entry["chunk_ids"].append(entry["id"])
+        if keep:
+            upgraded.add_with_ids(vectors[sorted(keep)], np.array(ids, dtype=np.int64))
+        _log("INFO", f"Kept {len(keep)} of {index.ntotal} vectors after dropping stale duplicates")
+        return upgraded, new_metadata, new_manifest
+
+    def file_hash(self, name: str) -> Optional[str]:
+        entry = self.manifest.get(name)
+        return entry.get("hash") if isinstance(entry, dict) else entry
+
+    def file_fingerprint(self, name: str) -> Optional[dict]:
+        return manifest_fingerprint(self.manifest, name)
+
+    def refresh_fingerprint(self, name: str, fingerprint: dict) -> bool:
+        """Record new stat fields of an unchanged file; True if the manifest changed."""
+        return refresh_manifest_entry(self.manifest, name, fingerprint)
+
+    def remove_file(self, name: str) -> int:
+        """Remove every vector and metadata entry of a file; returns the number removed."""
+        entry = self.manifest.pop(name, None)
+        ids = set(entry.get("chunk_ids", [])) if isinstance(entry, dict) else set()
+        # Also sweep metadata in case a crash left chunks the manifest does not know about
+        ids.update(self.metadata.ids_for_doc(name))
+        self.metadata.delete_ids(ids)
+        self.lexical.remove(ids)
+        if ids and isinstance(self.index, ShardSet):
+            self.index.remove_ids(np.array(sorted(ids), dtype=np.int64))
+        elif ids and self.index is not None:
+            self.index = remove_ids(self.index, np.array(sorted(ids), dtype=np.int64))
+        return len(ids)
+
+    def add_file(self, name: str, fingerprint: Union[dict, str], chunks: List[dict], embeddings: np.ndarray):
+        """
+        Replace a file's chunks; chunks are metadata dicts in order, one per embedding row.
+        fingerprint comes from modules.fingerprint (a bare hash string is accepted too).
+        """
+        self.remove_file(name)
+        ids = np.array([chunk_faiss_id(name, i) for i in range(len(chunks))], dtype=np.int64)
+        if len(chunks):
+            if self.index is None:
+                self.create_index(embeddings.shape[1])
+            target = None if isinstance(self.index, ShardSet) else self.index  # shards share the config's metric
+            self.index.add_with_ids(prepare_vectors(embeddings, target, self.config), ids)
+        self.metadata.put_many([{**chunk, "id": chunk_id} for chunk_id, chunk in zip(ids.tolist(), chunks)])
+        self.lexical.add(ids.tolist(), [chunk["chunk"] for chunk in chunks])
+        fingerprint = fingerprint if isinstance(fingerprint, dict) else {"hash": fingerprint}
+        self.manifest[name] = {**fingerprint, "chunk_ids": ids.tolist()}
+
+    def save(self):
+        # Metadata first and manifest last: after a crash the manifest never claims a file whose
+        # vectors were not written, so that file is simply re-ingested.
+        self.metadata.commit()
+        if self.migrated_rows and self.metadata_path.exists():
+            self.metadata_path.replace(self.metadata_path.with_suffix(".json.migrated"))
+            _log("INFO", f"Migrated {self.migrated_rows} metadata entries from metadata.json to metadata.sqlite")
+            self.migrated_rows = 0
+        self.lexical.save(self.lexical_path)
+        if isinstance(self.index, ShardSet):
+            self.index.promote()
+            self.index.save(self.index_dir)
+            if self.index_path.exists():
+                self.index_path.unlink()  # superseded by the shards
+        elif self.index is not None:
+            self.index = maybe_promote(self.index, self.config)
+            write_index(self.index, self.index_path)
+            ShardSet.delete(self.index_dir)
+        self.layout_changed = False
+        self.save_manifest()
+
+    def save_manifest(self):
+        """Write only the manifest, e.g. after refreshing fingerprints of unchanged files."""
+        write_json(self.manifest, self.manifest_path)
+
+
+def migrate_metadata_json(index_dir: Path, config: Optional[dict] = None, shards: int = 0) -> int:
+    """
+    One-time migration of faiss_index/metadata.json into metadata.sqlite (upgrading a legacy
+    positional index to ids on the way). Returns the number of entries migrated.
+    """
+    store = DocumentStore(index_dir, config, shards)
+    migrated = store.migrated_rows
+    store.save()
+    return migrated
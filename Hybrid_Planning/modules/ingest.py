@@ -0,0 +1,223 @@
+# modules/ingest.py
+
+import asyncio
+import os
+import re
+import sys
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_CONCURRENCY = 4  # in-flight caption/segment/embed calls against Ollama
+DEFAULT_COMMIT_EVERY = 8  # files per index save
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+# === EXTRACTION (runs in worker processes, so keep it importable without the server) ===
+
+def pdf_to_markdown(path: str, image_dir: Path) -> str:
+    import pymupdf4llm
+
+    image_dir.mkdir(parents=True, exist_ok=True)
+    markdown = pymupdf4llm.to_markdown(path, write_images=True, image_path=str(image_dir))
+    # Re-point image links in the markdown
+    return re.sub(r'!\[\]\((.*?/images/)([^)]+)\)', r'![](images/\2)', markdown.replace("\\", "/"))
+
+
+def url_to_markdown(url: str) -> str:
+    import trafilatura
+
+    downloaded = trafilatura.fetch_url(url)
+    if not downloaded:
+        return ""
+    return trafilatura.extract(
+        downloaded,
+        include_comments=False,
+        include_tables=True,
+        include_images=True,
+        output_format='markdown'
+    ) or ""
+
+
+def extract_markdown(path: str, image_dir: str) -> str:
+    """Convert one document to markdown with image links left in place for the caption stage."""
+    file = Path(path)
+    ext = file.suffix.lower()
+    if ext == ".pdf":
+        return pdf_to_markdown(str(file), Path(image_dir))
+    if ext in [".html", ".htm", ".url"]:
+        return url_to_markdown(file.read_text().strip())
+    if ext in [".md", ".txt"]:
+        return file.read_text(encoding="utf-8", errors="replace")
+
+    from markitdown import MarkItDown
+    return MarkItDown().convert(str(file)).text_content
+
+
+# === PIPELINE ===
+
+class IngestStats:
+    """Progress and throughput counters; busy seconds are summed across concurrent workers."""
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files = 0
+        self.chunks = 0
+        self.failed = 0
+        self.commits = 0
+        self.busy = {"extract": 0.0, "caption": 0.0, "segment": 0.0, "embed": 0.0, "write": 0.0}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_busy(self, stage: str, seconds: float):
+        with self._lock:
+            self.busy[stage] += seconds
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "files": self.files,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "commits": self.commits,
+            "seconds": elapsed,
+            "files_per_sec": self.files / elapsed if elapsed else 0.0,
+            "chunks_per_sec": self.chunks / elapsed if elapsed else 0.0,
+            "busy_seconds": dict(self.busy),
+        }
+
+
+class IngestPipeline:
+    """
+    Staged producer/consumer ingestion:
+      extract  - process pool of `workers` (pymupdf4llm / trafilatura / MarkItDown are CPU bound)
+      caption, segment, embed - I/O bound Ollama calls, at most `concurrency` in flight per stage
+      write    - a single consumer that owns the DocumentStore and saves every `commit_every` files
+    Stage callables are injected so the server and the benchmark share the same pipeline.
+    """
+
+    def __init__(
+        self,
+        store,
+        segment: Callable[[str], List[str]],
+        embed: Callable[[Sequence[str]], np.ndarray],
+        caption: Optional[Callable[[str, str], str]] = None,  # (markdown, file name) -> markdown
+        extract: Callable[[str, str], str] = extract_markdown,
+        image_dir: Optional[Path] = None,
+        workers: int = DEFAULT_WORKERS,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        commit_every: int = DEFAULT_COMMIT_EVERY,
+        on_commit: Optional[Callable[[], None]] = None,
+    ):
+        self.store = store
+        self.segment = segment
+        self.embed = embed
+        self.caption = caption
+        self.extract = extract
+        self.image_dir = str(image_dir or ".")
+        self.workers = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self.commit_every = max(1, commit_every)
+        self.on_commit = on_commit
+
+    async def _timed(self, stats: IngestStats, stage: str, executor, fn, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        finally:
+            stats.add_busy(stage, time.perf_counter() - start)
+
+    async def _produce(self, file: Path, fingerprint: dict, pools, sems, queue: asyncio.Queue, stats: IngestStats):
+        extract_pool, io_pool = pools
+        extract_sem, caption_sem, segment_sem, embed_sem = sems
+        try:
+            async with extract_sem:
+                markdown = await self._timed(stats, "extract", extract_pool, self.extract, str(file), self.image_dir)
+            if self.caption is not None and "![" in markdown:
+                async with caption_sem:
+                    markdown = await self._timed(stats, "caption", io_pool, self.caption, markdown, file.name)
+            if not markdown.strip():
+                _log("WARN", f"No content extracted from {file.name}")
+                await queue.put((file, fingerprint, None, None))
+                return
+            async with segment_sem:
+                chunks = await self._timed(stats, "segment", io_pool, self.segment, markdown)
+            async with embed_sem:
+                vectors = await self._timed(stats, "embed", io_pool, self.embed, chunks)
+            await queue.put((file, fingerprint, chunks, vectors))
+        except Exception as e:
+            _log("ERROR", f"Failed to process {file.name}: {e}")
+            await queue.put((file, fingerprint, None, None))
+
+    def _commit(self, stats: IngestStats):
+        start = time.perf_counter()
+        self.store.save()
+        stats.add_busy("write", time.perf_counter() - start)
+        stats.commits += 1
+        if self.on_commit is not None:
+            self.on_commit()
+        s = stats.summary()
+        _log("SAVE", f"Committed {stats.files}/{stats.total_files} files, {stats.chunks} chunks "
+                     f"({s['files_per_sec']:.2f} files/s, {s['chunks_per_sec']:.1f} chunks/s)")
+
+    async def _write(self, queue: asyncio.Queue, stats: IngestStats):
+        pending = 0
+        for _ in range(stats.total_files):
+            file, fingerprint, chunks, vectors = await queue.get()
+            if chunks is None or not len(vectors):
+                stats.failed += 1
+                continue
+            start = time.perf_counter()
+            metadata = [{"doc": file.name, "chunk": chunk, "chunk_id": f"{file.stem}_{i}"}
+                        for i, chunk in enumerate(chunks)]
+            self.store.add_file(file.name, fingerprint, metadata, vectors)
+            stats.add_busy("write", time.perf_counter() - start)
+            stats.files += 1
+            stats.chunks += len(chunks)
+            pending += 1
+            _log("PROC", f"[{stats.files + stats.failed}/{stats.total_files}] {file.name}: {len(chunks)} chunks")
+            if pending >= self.commit_every:
+                self._commit(stats)
+                pending = 0
+        if pending:
+            self._commit(stats)
+
+    async def run_async(self, files: List[Tuple[Path, dict]]) -> dict:
+        """Ingest (path, fingerprint) pairs and return throughput stats."""
+        stats = IngestStats(len(files))
+        if not files:
+            return stats.summary()
+        # Bounded queue gives backpressure: producers wait while the writer is saving
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.commit_every * 2)
+        sems = (asyncio.Semaphore(self.workers),) + tuple(asyncio.Semaphore(self.concurrency) for _ in range(3))
+        extract_pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 \
+            else ThreadPoolExecutor(max_workers=1)
+        io_pool = ThreadPoolExecutor(max_workers=self.concurrency * 3)
+        try:
+            writer = asyncio.create_task(self._write(queue, stats))
+            await asyncio.gather(*(self._produce(file, fingerprint, (extract_pool, io_pool), sems, queue, stats)
+                                   for file, fingerprint in files))
+            await writer
+        finally:
+            extract_pool.shutdown()
+            io_pool.shutdown()
+        return stats.summary()
+
+    def run(self, files: List[Tuple[Path, dict]]) -> dict:
+        """Synchronous entry point; safe to call from inside a running event loop (sync MCP tools)."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run_async(files))
+        with ThreadPoolExecutor(max_workers=1) as runner:
+            return runner.submit(asyncio.run, self.run_async(files)).result()
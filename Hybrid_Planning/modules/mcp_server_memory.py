@@ -2,16 +2,22 @@ from mcp.server.fastmcp import FastMCP, Context
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import yaml
-from memory import MemoryManager  # Import MemoryManager to use its path structure
+from memory import MemoryManager, load_session_items  # Import MemoryManager to use its path structure
+from memory_catalog import MemoryCatalog, DEFAULT_CATALOG_CONFIG, day_bounds, item_fields
 import json
 import os
 import sys
 import signal
+import time
 from pydantic import BaseModel  # Add this import
 
 # Define input model here
 class SearchInput(BaseModel):
     query: str
+    since: Optional[str] = None   # YYYY-MM-DD, inclusive
+    until: Optional[str] = None   # YYYY-MM-DD, inclusive
+    order: str = "recent"         # "recent" (newest first) or "oldest"
+    limit: int = 50
 
 BASE_MEMORY_DIR = "memory"
 
@@ -26,6 +32,7 @@ try:
         config = yaml.safe_load(f)
         MEMORY_CONFIG = config.get("memory", {}).get("storage", {})
         BASE_MEMORY_DIR = MEMORY_CONFIG.get("base_dir", "memory")
+        CATALOG_CONFIG = {**DEFAULT_CATALOG_CONFIG, **(config.get("memory", {}).get("catalog", {}) or {})}
 except Exception as e:
     print(f"Error loading config from {CONFIG_PATH}: {e}")
     sys.exit(1)
@@ -38,6 +45,10 @@ class MemoryStore:
         # self.memory_manager = None
         self.current_session = None  # Track current session
         os.makedirs(self.memory_dir, exist_ok=True)
+        # Indexed search over all sessions; None = walk and load every session file per search
+        self.catalog = MemoryCatalog(self.memory_dir, path=CATALOG_CONFIG["path"],
+                                     min_sync_seconds=CATALOG_CONFIG["min_sync_seconds"]) \
+            if CATALOG_CONFIG["enabled"] else None
 
     def load_session(self, session_id: str):
         """Load memory manager for a specific session."""
@@ -67,9 +78,9 @@ class MemoryStore:
                     for file in os.listdir(day_path):
                         if file.endswith('.json'):
                             try:
-                                with open(os.path.join(day_path, file), 'r') as f:
-                                    session_memories = json.load(f)
-                                    all_memories.extend(session_memories)  # Extend instead of append
+                                # includes journal records not yet compacted into the JSON
+                                session_memories = load_session_items(os.path.join(day_path, file))
+                                all_memories.extend(session_memories)  # Extend instead of append
                             except Exception as e:
                                 print(f"Failed to load {file}: {e}")
         
@@ -162,33 +173,44 @@ async def get_current_conversations(input: Dict) -> Dict[str, Any]:
         print(f"[memory] Error: {str(e)}")  # Debug print
         return {"error": str(e)}
 
+def scan_memories(input: SearchInput) -> List[Dict]:
+    """Substring search over every session file, loaded on each call (catalog disabled)."""
+    all_memories = memory_store._list_all_memories()
+    search_terms = input.query.lower().split()
+    start_ts, end_ts = day_bounds(input.since, input.until)
+
+    matches = []
+    for memory in all_memories:
+        # Search the same query, answer and intent fields the catalog indexes (item_fields)
+        fields = item_fields(memory)
+        if fields is None:
+            continue
+        user_query, final_answer, intent = fields
+        memory_content = " ".join(fields).lower()
+        timestamp = memory.get("timestamp") or 0
+
+        if all(term in memory_content for term in search_terms) \
+                and (start_ts is None or timestamp >= start_ts) and (end_ts is None or timestamp < end_ts):
+            # Only keep fields we want to return
+            matches.append({
+                "user_query": user_query,
+                "final_answer": final_answer,
+                "timestamp": timestamp,
+                "intent": intent
+            })
+
+    matches.sort(key=lambda x: x["timestamp"], reverse=input.order != "oldest")
+    return matches[:input.limit]
+
 @mcp.tool()
 async def search_historical_conversations(input: SearchInput) -> Dict[str, Any]:
-    """Search conversation memory between user and YOU. Usage: input={"input": {"query": "anmol singh"}} result = await mcp.call_tool('search_historical_conversations', input)"""
+    """Search conversation memory between user and YOU, newest first. Optional since/until dates (YYYY-MM-DD), order ("recent" or "oldest") and limit. Usage: input={"input": {"query": "anmol singh", "since": "2025-04-01"}} result = await mcp.call_tool('search_historical_conversations', input)"""
     try:
-        all_memories = memory_store._list_all_memories()
-        search_terms = input.query.lower().split()
-        
-        matches = []
-        for memory in all_memories:
-            # Only search in user query, final answer, and intent
-            memory_content = " ".join([
-                str(memory.get("user_query", "")),
-                str(memory.get("final_answer", "")),
-                str(memory.get("intent", ""))
-            ]).lower()
-            
-            if all(term in memory_content for term in search_terms):
-                # Only keep fields we want to return
-                matches.append({
-                    "user_query": memory.get("user_query", ""),
-                    "final_answer": memory.get("final_answer", ""),
-                    "timestamp": memory.get("timestamp", ""),
-                    "intent": memory.get("intent", "")
-                })
-
-        # Sort by timestamp (most recent last)
-        matches.sort(key=lambda x: x.get("timestamp", ""), reverse=False)
+        if memory_store.catalog is not None:
+            matches = memory_store.catalog.search(input.query, since=input.since, until=input.until,
+                                                  limit=input.limit, order=input.order)
+        else:
+            matches = scan_memories(input)
         
         # Count total words in matches
         total_words = 0
@@ -208,14 +230,27 @@ async def search_historical_conversations(input: SearchInput) -> Dict[str, Any]:
             else:
                 break
         
-        return {"result": {
-                    "status": "error",
-                    "message": str(e)
-                }}
+        return {"result": filtered_matches}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@mcp.tool()
+async def memory_catalog_stats(input: Dict) -> Dict[str, Any]:
+    """Report sessions and items in the memory catalog and its sync/search latency. Usage: input={"input":{}} result = await mcp.call_tool('memory_catalog_stats', input)"""
+    if memory_store.catalog is None:
+        return {"result": {"enabled": False}}
+    return {"result": memory_store.catalog.stats()}
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        # One full scan of the memory/ tree into the catalog: python modules/mcp_server_memory.py rebuild
+        catalog = memory_store.catalog or MemoryCatalog(BASE_MEMORY_DIR, path=CATALOG_CONFIG["path"])
+        start = time.perf_counter()
+        result = catalog.rebuild()
+        print(f"Indexed {result['sessions']} sessions ({result['items']} items) into {catalog.path} "
+              f"in {time.perf_counter() - start:.1f}s")
+        sys.exit(0)
+
     print("Memory MCP server starting...")
     
     # Setup signal handlers
@@ -1,9 +1,13 @@
 # modules/memory.py
 
+import atexit
+import hashlib
 import json
 import os
+import threading
 import time
-from typing import List, Optional, Dict, Any
+import weakref
+from typing import List, Optional, Dict, Any, Tuple
 from pydantic import BaseModel
 
 # Optional fallback logger
@@ -40,6 +44,209 @@ def merge_memory_items(raw: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     
     return merged
 
+
+# Settings under `memory.journal:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_JOURNAL_CONFIG = {
+    "enabled": True,          # false = rewrite the whole session JSON on every change (old behaviour)
+    "flush_every": 32,        # records buffered in the process before they are written to the journal
+    "fsync_seconds": 2.0,     # fsync the journal at most this often (and on compaction / close)
+    "compact_every": 1000,    # journal records before they are folded into the session JSON
+}
+JOURNAL_SUFFIX = ".jsonl"
+
+
+def load_journal_config(profile_path: str = os.path.join("config", "profiles.yaml")) -> dict:
+    """Read `memory.journal:` from a profiles.yaml, if there is one."""
+    config = {}
+    if os.path.exists(profile_path):
+        import yaml
+        with open(profile_path, "r", encoding="utf-8") as f:
+            config = ((yaml.safe_load(f) or {}).get("memory", {}) or {}).get("journal", {}) or {}
+    return {**DEFAULT_JOURNAL_CONFIG, **config}
+
+
+def journal_path(memory_path: str) -> str:
+    return os.path.splitext(memory_path)[0] + JOURNAL_SUFFIX
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def read_session(memory_path: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+    """
+    (items of the session JSON, journal records not yet folded into it, journal line count).
+    A compaction logs {"op": "compact", "seq", "digest"} before it replaces the JSON, so records up
+    to seq are skipped only if the JSON on disk is the one that compaction wrote. A torn last line
+    (the process died mid-write) ends the replay.
+    """
+    raw, digest = [], None
+    if os.path.exists(memory_path):
+        with open(memory_path, "rb") as f:
+            data = f.read()
+        digest = _digest(data)
+        raw = json.loads(data) if data.strip() else []
+
+    records, lines = [], 0
+    path = journal_path(memory_path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    log("memory", f"⚠️ Ignoring torn record at line {lines} of {path}")
+                    break
+    compacted = max((r["seq"] for r in records if r.get("op") == "compact" and r.get("digest") == digest), default=0)
+    return raw, [r for r in records if r.get("op") != "compact" and r["seq"] > compacted], lines
+
+
+def apply_records(raw: List[Dict[str, Any]], records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Replay journal records (in order) onto session items."""
+    for record in records:
+        if record["op"] == "add":
+            raw.append(record["item"])
+        elif record["op"] == "patch":
+            for item in reversed(raw):
+                if item.get("timestamp") == record["timestamp"] and item.get("type") == record["type"] \
+                        and item.get("tool_name") == record["tool_name"]:
+                    item.update(record["fields"])
+                    break
+    return raw
+
+
+def load_session_items(memory_path: str) -> List[Dict[str, Any]]:
+    """Merged items of a session as saved plus its journal, for readers outside the session."""
+    raw, records, _ = read_session(memory_path)
+    return merge_memory_items(apply_records(raw, records)) if records else raw
+
+
+class SessionJournal:
+    """
+    Append-only JSONL log of one session's memory changes, next to its JSON view. Records are
+    buffered by the file object, written every flush_every records and fsynced at most every
+    fsync_seconds; compact() writes the merged JSON view (temp file + rename) and truncates the log.
+    """
+
+    def __init__(self, memory_path: str, config: Optional[dict] = None):
+        self.memory_path = memory_path
+        self.path = journal_path(memory_path)
+        self.config = {**DEFAULT_JOURNAL_CONFIG, **(config or {})}
+        self.seq = 0            # last record number in the current log
+        self.records = 0        # records since the last compaction
+        self.unflushed = 0
+        self.bytes_written = 0
+        self._file = None
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+    def _write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._open().write(line)
+        self.bytes_written += len(line.encode("utf-8"))
+
+    def _flush(self, fsync: bool = False) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        self.unflushed = 0
+        if fsync or time.monotonic() - self._last_fsync >= self.config["fsync_seconds"]:
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self.seq += 1
+            self._write({"seq": self.seq, **record})
+            self.records += 1
+            self.unflushed += 1
+            if self.unflushed >= self.config["flush_every"]:
+                self._flush()
+
+    def flush(self, fsync: bool = True) -> None:
+        with self._lock:
+            self._flush(fsync)
+
+    def compact(self, view: bytes) -> None:
+        """Replace the session JSON with `view` (everything logged so far) and start an empty log."""
+        with self._lock:
+            self._write({"seq": self.seq, "op": "compact", "digest": _digest(view)})
+            self._flush(fsync=True)
+            tmp_path = self.memory_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(view)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.memory_path)
+            self.bytes_written += len(view)
+            self._file.close()
+            self._file = open(self.path, "w", encoding="utf-8")  # truncate
+            os.fsync(self._file.fileno())
+            self.seq = 0
+            self.records = 0
+
+    def adopt(self) -> None:
+        """
+        Take over the log a previous process left: cut it after the last readable record (a torn
+        line would hide anything appended after it from read_session) and continue its numbering,
+        so the next compaction marker is readable and covers every replayed record.
+        """
+        with self._lock:
+            if self._file is not None or not os.path.exists(self.path):
+                return
+            good, seq, newline = 0, 0, True
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        break
+                    good += len(line)
+                    seq = max(seq, record.get("seq", 0))
+                    newline = line.endswith(b"\n")
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+                if not newline:
+                    f.seek(good)
+                    f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.seq = seq
+
+    def reset(self) -> None:
+        """Empty the log without touching the session JSON (nothing in it was recoverable)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.path, "w", encoding="utf-8")  # truncate
+            os.fsync(self._file.fileno())
+            self.seq = 0
+            self.records = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._flush(fsync=True)
+                self._file.close()
+                self._file = None
+
+
+_OPEN_JOURNALS: "weakref.WeakValueDictionary[str, SessionJournal]" = weakref.WeakValueDictionary()
+
+
+@atexit.register
+def _close_journals():
+    for journal in list(_OPEN_JOURNALS.values()):
+        journal.close()
+
+
 class MemoryItem(BaseModel):
     """Represents a single memory entry for a session."""
     timestamp: float
@@ -56,26 +263,64 @@ class MemoryItem(BaseModel):
 
 
 class MemoryManager:
-    """Manages session memory (read/write/append)."""
+    """
+    Manages session memory (read/write/append).
+    Changes go to an append-only journal (see SessionJournal) that is folded into the session
+    JSON every compact_every records and on close(); load() replays whatever a previous process
+    left in the journal. With journal.enabled false every change rewrites the JSON instead.
+    """
 
-    def __init__(self, session_id: str, memory_dir: str = "memory"):
+    def __init__(self, session_id: str, memory_dir: str = "memory", journal: Optional[dict] = None):
         self.session_id = session_id
         self.memory_dir = memory_dir
         self.memory_path = os.path.join('memory', session_id.split('-')[0], session_id.split('-')[1], session_id.split('-')[2], f'session-{session_id}.json')
         self.items: List[MemoryItem] = []
+        self.journal_config = {**DEFAULT_JOURNAL_CONFIG, **(journal or {})}
+        self.journal: Optional[SessionJournal] = None
 
         if not os.path.exists(self.memory_dir):
             os.makedirs(self.memory_dir)
 
+        if self.journal_config["enabled"]:
+            previous = _OPEN_JOURNALS.get(self.memory_path)
+            if previous is not None:
+                previous.close()  # an earlier run of this session: write out its buffered records first
+            self.journal = SessionJournal(self.memory_path, self.journal_config)
+            _OPEN_JOURNALS[self.memory_path] = self.journal
+
         self.load()
 
     def load(self):
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-                self.items = [MemoryItem(**item) for item in raw]
-        else:
-            self.items = []
+        raw, records, lines = read_session(self.memory_path)
+        self.items = [MemoryItem(**item) for item in apply_records(raw, records)]
+        if records:
+            log("memory", f"Replayed {len(records)} journal records of session {self.session_id}")
+        if lines and self.journal is not None:
+            # Also when nothing was recovered (e.g. only a torn first record): later appends must not
+            # land after the fragment, where replay stops reading
+            self.journal.adopt()
+            if self.items:
+                self.compact()
+            else:
+                self.journal.reset()
+
+    def _view(self) -> bytes:
+        merged = merge_memory_items([item.dict() for item in self.items])
+        return json.dumps(merged, indent=2).encode("utf-8")
+
+    def compact(self):
+        """Write the merged session JSON and empty the journal."""
+        if self.journal is None:
+            self.save()
+        elif self.items:
+            self.journal.compact(self._view())
+
+    def close(self):
+        """Compact at the end of a run so other readers see the full session JSON."""
+        if self.journal is not None:
+            if self.journal.records:
+                self.compact()
+            self.journal.close()
 
     def save(self):
         # Before opening the file for writing
@@ -88,7 +333,12 @@ class MemoryManager:
 
     def add(self, item: MemoryItem):
         self.items.append(item)
-        self.save()
+        if self.journal is None:
+            self.save()
+            return
+        self.journal.append({"op": "add", "item": item.dict()})
+        if self.journal.records >= self.journal_config["compact_every"]:
+            self.compact()
 
     def add_tool_call(
         self, tool_name: str, tool_args: dict, tags: Optional[List[str]] = None
@@ -149,7 +399,11 @@ class MemoryManager:
             if item.tool_name == tool_name and item.type in {"tool_call", "tool_output"}:
                 item.success = success
                 log("memory", f"✅ Marked {tool_name} as success={success}")
-                self.save()
+                if self.journal is None:
+                    self.save()
+                else:
+                    self.journal.append({"op": "patch", "timestamp": item.timestamp, "type": item.type,
+                                         "tool_name": item.tool_name, "fields": {"success": success}})
                 return
 
         log("memory", f"⚠️ Tried to mark {tool_name} as success={success} but no matching memory found.")
@@ -0,0 +1,288 @@
+# modules/memory_catalog.py
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from modules.memory import JOURNAL_SUFFIX, journal_path, load_session_items
+except ImportError:  # imported from modules/ by mcp_server_memory.py
+    from memory import JOURNAL_SUFFIX, journal_path, load_session_items
+
+# Settings under `memory.catalog:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_CATALOG_CONFIG = {
+    "enabled": True,
+    "path": "memory/catalog.sqlite",
+    "min_sync_seconds": 10.0,   # searches rescan the memory tree (in the background) at most this often
+}
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def item_fields(item: dict) -> Optional[Tuple[str, str, str]]:
+    """
+    (user query, answer, intent) of a memory item, or None if it has none of them. A merged
+    tool_output carries its run's query as input_query and its result as the answer.
+    """
+    query = item.get("user_query") or item.get("input_query") or ""
+    answer = item.get("final_answer") or ""
+    if not answer and item.get("type") == "tool_output" and isinstance(item.get("tool_result"), dict):
+        answer = str(item["tool_result"].get("result", "") or "")
+    intent = item.get("intent") or ""
+    if not (query or answer or intent):
+        return None
+    return str(query), str(answer), str(intent)
+
+
+def match_expression(query: str) -> str:
+    """FTS5 query requiring every term, each as a prefix ("anmol singh" -> "anmol"* AND "singh"*)."""
+    terms = re.findall(r"\w+", query.lower())
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+def day_bounds(since: Optional[str], until: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """Epoch seconds of since 00:00 and the end of until (local time), from YYYY-MM-DD dates."""
+    start = datetime.strptime(since, "%Y-%m-%d").timestamp() if since else None
+    end = (datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)).timestamp() if until else None
+    return start, end
+
+
+class MemoryCatalog:
+    """
+    Persistent SQLite catalog of the session memory under a memory/ tree, for searching past
+    conversations without opening every session file. Each session-*.json (plus its uncompacted
+    journal) is indexed once and re-indexed only when its mtime or size changes; item text is
+    searched through an FTS5 table (a LIKE scan where SQLite lacks FTS5), with optional date
+    bounds, newest or oldest first.
+    """
+
+    def __init__(self, memory_dir: str = "memory", path: Optional[str] = None, min_sync_seconds: float = 10.0):
+        self.memory_dir = Path(memory_dir)
+        self.path = Path(path) if path else self.memory_dir / "catalog.sqlite"
+        self.min_sync_seconds = min_sync_seconds
+        self.last_sync = 0.0
+        self.syncs = 0
+        self.sync_ms = 0.0
+        self.searches = 0
+        self.search_ms = 0.0
+        self._lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "path TEXT PRIMARY KEY, session_id TEXT NOT NULL, signature TEXT NOT NULL, items INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "id INTEGER PRIMARY KEY, path TEXT NOT NULL, session_id TEXT NOT NULL, timestamp REAL NOT NULL, "
+            "type TEXT, user_query TEXT, final_answer TEXT, intent TEXT, success INTEGER)"
+        )
+        if "success" not in {row[1] for row in self._conn.execute("PRAGMA table_info(items)")}:
+            self._conn.execute("ALTER TABLE items ADD COLUMN success INTEGER")
+            self._conn.execute("UPDATE sessions SET signature = ''")  # re-index on the next sync to fill it
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_path ON items (path)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_timestamp ON items (timestamp)")
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(user_query, final_answer, intent)")
+            self.fts = True
+        except sqlite3.OperationalError:
+            _log("WARN", "SQLite has no FTS5, memory search falls back to LIKE scans")
+            self.fts = False
+        self._conn.commit()
+
+    def _scan(self) -> Dict[str, str]:
+        """{session file path: signature} of every session under memory_dir, from stat only."""
+        found = {}
+        for dirpath, _, files in os.walk(self.memory_dir):
+            # a session not compacted yet may only have its journal
+            sessions = {name[:-len(JOURNAL_SUFFIX)] + ".json" if name.endswith(JOURNAL_SUFFIX) else name
+                        for name in files if name.startswith("session-") and name.endswith((".json", JOURNAL_SUFFIX))}
+            for name in sessions:
+                path = os.path.join(dirpath, name)
+                signature = self._signature(path)
+                if signature is not None:
+                    found[os.path.relpath(path, self.memory_dir)] = signature
+        return found
+
+    @staticmethod
+    def _signature(memory_path: str) -> Optional[str]:
+        """mtime and size of a session JSON and of its journal; None if neither exists."""
+        parts = []
+        for path in (memory_path, journal_path(memory_path)):
+            try:
+                stat = os.stat(path)
+                parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+            except FileNotFoundError:
+                parts.append("-")
+        return None if parts == ["-", "-"] else ":".join(parts)
+
+    def _delete(self, paths: List[str]) -> None:
+        for path in paths:
+            if self.fts:
+                self._conn.execute("DELETE FROM items_fts WHERE rowid IN (SELECT id FROM items WHERE path = ?)", (path,))
+            self._conn.execute("DELETE FROM items WHERE path = ?", (path,))
+            self._conn.execute("DELETE FROM sessions WHERE path = ?", (path,))
+
+    def _rows(self, path: str) -> List[tuple]:
+        """Catalog rows of one session file given relative to memory_dir."""
+        try:
+            items = load_session_items(str(self.memory_dir / path))
+        except (OSError, ValueError) as e:
+            _log("WARN", f"Could not read {path}: {e}")
+            items = []
+        session_id = Path(path).name[len("session-"):-len(".json")]
+        rows = []
+        for item in items:
+            fields = item_fields(item)
+            if fields is not None:
+                success = item.get("success")
+                rows.append((path, session_id, float(item.get("timestamp") or 0), item.get("type"), *fields,
+                             None if success is None else int(bool(success))))
+        return rows
+
+    def _write(self, path: str, signature: str, rows: List[tuple]) -> None:
+        self._delete([path])
+        for row in rows:
+            cursor = self._conn.execute(
+                "INSERT INTO items (path, session_id, timestamp, type, user_query, final_answer, intent, success) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            if self.fts:
+                self._conn.execute("INSERT INTO items_fts (rowid, user_query, final_answer, intent) VALUES (?, ?, ?, ?)",
+                                   (cursor.lastrowid, *row[4:7]))
+        self._conn.execute("INSERT INTO sessions (path, session_id, signature, items) VALUES (?, ?, ?, ?)",
+                           (path, Path(path).name[len("session-"):-len(".json")], signature, len(rows)))
+
+    def sync(self, force: bool = False) -> dict:
+        """
+        Index new and changed session files and drop deleted ones (at most every min_sync_seconds).
+        The tree is walked and the changed files read outside the lock, so searches only wait
+        for the catalog writes.
+        """
+        if not force and time.monotonic() - self.last_sync < self.min_sync_seconds:
+            return {}
+        start = time.perf_counter()
+        self.last_sync = time.monotonic()
+        on_disk = self._scan()
+        with self._lock:
+            known = dict(self._conn.execute("SELECT path, signature FROM sessions"))
+        changed = {path: self._rows(path) for path, signature in on_disk.items() if known.get(path) != signature}
+        removed = [path for path in known if path not in on_disk]
+        items = sum(len(rows) for rows in changed.values())
+        with self._lock:
+            if changed or removed:
+                self._delete(removed)
+                for path, rows in changed.items():
+                    self._write(path, on_disk[path], rows)
+                self._conn.commit()
+            self.syncs += 1
+            self.sync_ms += (time.perf_counter() - start) * 1000
+        if changed or removed:
+            _log("INFO", f"Memory catalog: indexed {len(changed)} sessions ({items} items), removed {len(removed)}")
+        return {"indexed": len(changed), "items": items, "removed": len(removed), "sessions": len(on_disk)}
+
+    def update_session(self, memory_path: str) -> int:
+        """Index one session right after it was written (e.g. at the end of an agent run)."""
+        path = os.path.relpath(memory_path, self.memory_dir)
+        signature = self._signature(memory_path)
+        if signature is None:
+            return 0
+        rows = self._rows(path)
+        with self._lock:
+            self._write(path, signature, rows)
+            self._conn.commit()
+        return len(rows)
+
+    def rebuild(self) -> dict:
+        """Drop the catalog and index the whole memory tree once."""
+        with self._lock:
+            if self.fts:
+                self._conn.execute("DELETE FROM items_fts")
+            self._conn.execute("DELETE FROM items")
+            self._conn.execute("DELETE FROM sessions")
+            self._conn.commit()
+        return self.sync(force=True)
+
+    def search(self, query: str = "", since: Optional[str] = None, until: Optional[str] = None,
+               limit: int = 20, order: str = "recent") -> List[dict]:
+        """
+        Items containing every query term (by prefix; all items for an empty query) whose
+        timestamp lies between the since and until dates (YYYY-MM-DD, inclusive), newest first
+        for order="recent" or oldest first for "oldest".
+        Only the first search syncs in line; later ones start a background sync when the last
+        one is older than min_sync_seconds and answer from the catalog as it is.
+        """
+        if not self.last_sync:
+            self.sync(force=True)
+        elif time.monotonic() - self.last_sync >= self.min_sync_seconds and \
+                (self._sync_thread is None or not self._sync_thread.is_alive()):
+            self._sync_thread = threading.Thread(target=self.sync, name="memory-catalog-sync", daemon=True)
+            self._sync_thread.start()
+        start_ts, end_ts = day_bounds(since, until)
+        where, params = [], []
+        expression = match_expression(query)
+        if expression and self.fts:
+            where.append("items.id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)")
+            params.append(expression)
+        elif expression:
+            for term in re.findall(r"\w+", query.lower()):
+                where.append("lower(user_query || ' ' || final_answer || ' ' || intent) LIKE ?")
+                params.append(f"%{term}%")
+        if start_ts is not None:
+            where.append("timestamp >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            where.append("timestamp < ?")
+            params.append(end_ts)
+        sql = ("SELECT session_id, timestamp, type, user_query, final_answer, intent FROM items"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               + f" ORDER BY timestamp {'ASC' if order == 'oldest' else 'DESC'} LIMIT ?")
+        started = time.perf_counter()
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, int(limit)]).fetchall()
+            self.searches += 1
+            self.search_ms += (time.perf_counter() - started) * 1000
+        return [
+            {"session_id": session_id, "timestamp": timestamp, "type": item_type,
+             "user_query": user_query, "final_answer": final_answer, "intent": intent}
+            for session_id, timestamp, item_type, user_query, final_answer, intent in rows
+        ]
+
+    def answered_queries(self) -> List[dict]:
+        """Queries of successful runs with their answers, oldest first (for modules/query_index.py)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, timestamp, user_query, final_answer FROM items "
+                "WHERE type = 'tool_output' AND success = 1 AND user_query != '' AND final_answer != '' "
+                "ORDER BY timestamp"
+            ).fetchall()
+        return [{"session_id": session_id, "timestamp": timestamp, "query": query, "answer": answer}
+                for session_id, timestamp, query, answer in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, items = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(items), 0) FROM sessions").fetchone()
+            return {
+                "sessions": sessions,
+                "items": items,
+                "fts5": self.fts,
+                "syncs": self.syncs,
+                "avg_sync_ms": self.sync_ms / self.syncs if self.syncs else 0.0,
+                "searches": self.searches,
+                "avg_search_ms": self.search_ms / self.searches if self.searches else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,261 @@
+# modules/query_index.py
+
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from modules.rerank import StageTimer
+
+# Settings under `memory.similar_queries:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_QUERY_INDEX_CONFIG = {
+    "enabled": True,
+    "lexical_threshold": 0.7,     # word-set Jaccard of a reusable near-duplicate query
+    "semantic": True,             # also compare query embeddings when no lexical match is found
+    "semantic_threshold": 0.92,   # cosine similarity of a reusable paraphrase
+    "num_perm": 64,               # MinHash permutations (signature length)
+    "bands": 16,                  # LSH bands; num_perm / bands rows each. More bands = more candidates
+    "match_numbers": True,        # only reuse an answer if both queries contain the same numbers
+    "match_terms": True,          # ... and the same words apart from STOPWORDS (subjects, names, units)
+    "embed_retry_seconds": 60,    # after an embedding failure, lexical matching only for this long
+}
+# Words that do not change what a question asks about; any other word that appears in only one of
+# two queries (a subject, a name, a unit) means their answers differ, however high the similarity.
+STOPWORDS = frozenset("""
+a about am an and any are as at be been by can could did do does for from give had has have how i in
+into is it its me my of on or please show should tell than that the their them then there these this
+those to was we were what whats when where which who whom whose why will with would you your
+just now exactly briefly kindly s d ll re ve
+""".split())
+VERIFY_TOP = 4  # LSH candidates, by estimated Jaccard, whose exact Jaccard is computed
+MAX_WORDS = 64
+_SEED = 1234
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def query_words(query: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", query.lower())[:MAX_WORDS])
+
+
+def numbers(words: frozenset) -> frozenset:
+    return frozenset(word for word in words if any(ch.isdigit() for ch in word))
+
+
+def terms(words: frozenset) -> frozenset:
+    return words - STOPWORDS
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+def reusable_answer(answer: str) -> str:
+    """The agent loop expects a FINAL_ANSWER: prefix on a finished result."""
+    return answer if "FINAL_ANSWER:" in answer else f"FINAL_ANSWER: {answer}"
+
+
+class SimilarQueryIndex:
+    """
+    Answered queries of all sessions, for reusing the answer of a repeated question.
+    Lexical near-duplicates are found through MinHash signatures of the query's word set,
+    bucketed by LSH bands so a lookup only verifies (by exact Jaccard) the few queries sharing a
+    band; paraphrases through an exact inner-product FAISS index of normalized query embeddings.
+    With match_numbers, "... paid in 2023" never reuses the answer to "... paid in 2024"; with
+    match_terms, "capital of Germany" never reuses the answer to "capital of France". Both also
+    apply to paraphrases, so a semantic hit needs the same content words in another order or
+    with other stopwords; turn match_terms off to reuse across real rewordings, at that risk.
+    Lookups count lexical / semantic hits and misses and time each stage.
+    """
+
+    def __init__(self, config: Optional[dict] = None, embed: Optional[Callable[[Sequence[str]], np.ndarray]] = None):
+        self.config = {**DEFAULT_QUERY_INDEX_CONFIG, **(config or {})}
+        self.embed = embed if self.config["semantic"] else None
+        num_perm, bands = int(self.config["num_perm"]), int(self.config["bands"])
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(_SEED)
+        # multiply-shift hashing: ((a * h + b) mod 2^64) >> 32 for odd a, one (a, b) per permutation
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self.entries: List[dict] = []
+        self._words: List[frozenset] = []  # per entry
+        self._by_words: Dict[frozenset, int] = {}
+        self._buckets: Dict[tuple, List[int]] = {}
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint64)  # per entry, grown by doubling
+        self._vectors: Optional[faiss.Index] = None
+        self._vector_rows: List[int] = []  # FAISS row -> entry
+        self._embed_failed_at = 0.0
+        self._lock = threading.Lock()
+        self.timings = StageTimer()
+        self.lookups = 0
+        self.lexical_hits = 0
+        self.semantic_hits = 0
+        self.embed_errors = 0
+
+    def signature(self, words: frozenset) -> np.ndarray:
+        hashes = np.array([zlib.crc32(word.encode()) for word in words] or [0], dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return ((hashes[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[tuple]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(len(signature) // self.rows)]
+
+    def _embed(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        if self.embed is None or time.monotonic() - self._embed_failed_at < self.config["embed_retry_seconds"]:
+            return None
+        try:
+            vectors = np.asarray(self.embed(list(texts)), dtype=np.float32).reshape(len(texts), -1)
+        except Exception as e:
+            self.embed_errors += 1
+            self._embed_failed_at = time.monotonic()
+            _log("WARN", f"Query embedding failed, lexical matching only for now: {e}")
+            return None
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def add_many(self, answered: List[dict]) -> int:
+        """Index {"query", "answer", "session_id", "timestamp"} dicts; a repeated query keeps the newest answer."""
+        new = []
+        with self._lock:
+            for entry in answered:
+                words = query_words(entry["query"])
+                if not words:
+                    continue
+                idx = self._by_words.get(words)
+                if idx is not None:
+                    self.entries[idx].update(entry)
+                    continue
+                idx = len(self.entries)
+                self.entries.append(dict(entry))
+                self._words.append(words)
+                self._by_words[words] = idx
+                signature = self.signature(words)
+                if idx == len(self._signatures):
+                    grown = np.zeros((max(idx, 16), self._signatures.shape[1]), dtype=np.uint64)
+                    self._signatures = np.vstack([self._signatures, grown])
+                self._signatures[idx] = signature
+                for key in self._band_keys(signature):
+                    self._buckets.setdefault(key, []).append(idx)
+                new.append(idx)
+        if new:
+            vectors = self._embed([self.entries[idx]["query"] for idx in new])
+            if vectors is not None:
+                with self._lock:
+                    if self._vectors is None:
+                        self._vectors = faiss.IndexFlatIP(vectors.shape[1])
+                    self._vectors.add(vectors)
+                    self._vector_rows.extend(new)
+        return len(new)
+
+    def add(self, query: str, answer: str, session_id: str = "", timestamp: Optional[float] = None) -> None:
+        self.add_many([{"query": query, "answer": answer, "session_id": session_id,
+                        "timestamp": time.time() if timestamp is None else timestamp}])
+
+    def _reusable(self, words: frozenset, idx: int) -> bool:
+        other = self._words[idx]
+        if self.config["match_terms"] and terms(words) != terms(other):
+            return False
+        return not self.config["match_numbers"] or numbers(words) == numbers(other)
+
+    def _lexical(self, words: frozenset) -> Optional[tuple]:
+        with self._lock:
+            idx = self._by_words.get(words)
+            if idx is not None:
+                return idx, 1.0
+            signature = self.signature(words)
+            buckets = [self._buckets[key] for key in self._band_keys(signature) if key in self._buckets]
+            if not buckets:
+                return None
+            candidates = np.unique(np.concatenate(buckets))
+            # MinHash agreement estimates the Jaccard of every candidate at once; verify the best few exactly
+            estimate = (self._signatures[candidates] == signature).mean(axis=1)
+            top = candidates[np.argsort(-estimate, kind="stable")[:VERIFY_TOP]]
+            scored = [(jaccard(words, self._words[i]), int(i)) for i in top if self._reusable(words, i)]
+        best = max(scored, default=None)
+        if best is not None and best[0] >= self.config["lexical_threshold"]:
+            return best[1], best[0]
+        return None
+
+    def _semantic(self, query: str, words: frozenset) -> Optional[tuple]:
+        if self._vectors is None or self._vectors.ntotal == 0:
+            return None
+        with self.timings.stage("embed"):
+            vector = self._embed([query])
+        if vector is None:
+            return None
+        with self.timings.stage("semantic"), self._lock:
+            D, I = self._vectors.search(vector, 1)
+        if I[0][0] >= 0 and D[0][0] >= self.config["semantic_threshold"]:
+            idx = self._vector_rows[I[0][0]]
+            if self._reusable(words, idx):
+                return idx, float(D[0][0])
+        return None
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """The stored entry answering a lexically or semantically similar query, with "match" and "score"; else None."""
+        start = time.perf_counter()
+        words = query_words(query)
+        with self.timings.stage("lexical"):
+            found = self._lexical(words) if words else None
+        match = "lexical"
+        if found is None and self.embed is not None:
+            found, match = self._semantic(query, words), "semantic"
+        self.timings.record("total", time.perf_counter() - start)
+        self.lookups += 1
+        if found is None:
+            return None
+        if match == "lexical":
+            self.lexical_hits += 1
+        else:
+            self.semantic_hits += 1
+        idx, score = found
+        return {**self.entries[idx], "answer": reusable_answer(self.entries[idx]["answer"]),
+                "match": match, "score": score}
+
+    def stats(self) -> dict:
+        hits = self.lexical_hits + self.semantic_hits
+        return {
+            "entries": len(self.entries),
+            "vectors": self._vectors.ntotal if self._vectors is not None else 0,
+            "lookups": self.lookups,
+            "lexical_hits": self.lexical_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.lookups - hits,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+            "embed_errors": self.embed_errors,
+            "stages": self.timings.stats(),
+        }
+
+
+_index: Optional[SimilarQueryIndex] = None
+
+
+def get_query_index(config: Optional[dict] = None, catalog=None, embed=None) -> Optional[SimilarQueryIndex]:
+    """
+    Process-wide index, built on first use from the answered queries in the memory catalog
+    (modules/memory_catalog.py). None when disabled.
+    """
+    global _index
+    config = {**DEFAULT_QUERY_INDEX_CONFIG, **(config or {})}
+    if not config["enabled"]:
+        return None
+    if _index is None:
+        start = time.perf_counter()
+        _index = SimilarQueryIndex(config, embed=embed)
+        if catalog is not None:
+            catalog.sync(force=True)
+            _index.add_many(catalog.answered_queries())
+        _log("INFO", f"Similar-query index: {len(_index.entries)} answered queries "
+                     f"in {time.perf_counter() - start:.2f}s")
+    return _index
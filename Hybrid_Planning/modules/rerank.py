@@ -0,0 +1,171 @@
+# modules/rerank.py
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Settings under `rerank:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_RERANK_CONFIG = {
+    "enabled": False,
+    "candidates": 50,           # hits fetched by hybrid_search before reranking
+    "dense_weight": 0.6,        # share of the normalized cosine score; the rest is normalized BM25
+    "mmr_lambda": 0.7,          # 1 = relevance only, lower = more diverse results
+    "dedupe_threshold": 0.95,   # candidates this close (cosine) to an already picked chunk are dropped
+    "token_budget": 0,          # estimated tokens of chunk text returned per query; 0 = no limit
+                                # (chunks run to ~700 tokens, so a budget under k * 700 returns fewer than k)
+}
+CHARS_PER_TOKEN = 4
+TIMING_WINDOW = 1000  # latest samples kept per stage
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English) without loading a tokenizer."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def minmax(scores: np.ndarray) -> np.ndarray:
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return scores
+    span = float(scores.max() - scores.min())
+    if span <= 1e-12:
+        return np.ones_like(scores) if scores.max() > 0 else np.zeros_like(scores)
+    return (scores - scores.min()) / span
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class StageTimer:
+    """Per-stage latency samples (a rolling window each) of a multi-step search."""
+
+    def __init__(self, window: int = TIMING_WINDOW):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items()}
+        return {
+            name: {
+                "count": len(values),
+                "avg_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+            }
+            for name, values in samples.items() if len(values)
+        }
+
+
+class Reranker:
+    """
+    Second stage for document search: scores over-fetched candidates by a blend of normalized
+    cosine and BM25 scores, then picks results by maximal marginal relevance (MMR) over their
+    pairwise cosine similarities. A candidate whose text or vector nearly repeats an already
+    picked chunk is dropped, and picking stops at k results or when the next chunk no longer
+    fits the token budget (the first result is always kept).
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = {**DEFAULT_RERANK_CONFIG, **(config or {})}
+        self.timings = StageTimer()
+        self.queries = 0
+        self.candidates = 0
+        self.duplicates = 0
+        self.over_budget = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.config["enabled"])
+
+    def relevance(self, query_vec: Optional[np.ndarray], vectors: np.ndarray,
+                  lexical_scores: Sequence[float]) -> np.ndarray:
+        lexical = minmax(lexical_scores)
+        if query_vec is None:
+            return lexical
+        cosine = vectors @ unit_rows(np.asarray(query_vec, dtype=np.float32).ravel())
+        weight = float(self.config["dense_weight"])
+        return weight * minmax(cosine) + (1 - weight) * lexical
+
+    def select(self, entries: List[dict], relevance: np.ndarray, vectors: np.ndarray, k: int) -> List[int]:
+        """Positions of the picked candidates, in pick order."""
+        n = len(entries)
+        lam = float(self.config["mmr_lambda"])
+        threshold = float(self.config["dedupe_threshold"])
+        budget = int(self.config["token_budget"] or 0)
+        similarity = vectors @ vectors.T
+        tokens = np.array([estimate_tokens(entry["chunk"]) for entry in entries])
+
+        available = np.ones(n, dtype=bool)
+        redundancy = np.zeros(n, dtype=np.float32)  # max similarity to anything picked so far
+        picked, seen, used, duplicates, over_budget = [], set(), 0, 0, 0
+        while len(picked) < k and available.any():
+            score = np.where(available, lam * relevance - (1 - lam) * redundancy, -np.inf)
+            best = int(np.argmax(score))
+            available[best] = False
+            if budget and picked and used + tokens[best] > budget:
+                over_budget += 1
+                continue
+            text = normalize_text(entries[best]["chunk"])  # only for chunks that would be picked
+            if text in seen:
+                duplicates += 1
+                continue
+            picked.append(best)
+            seen.add(text)
+            used += tokens[best]
+            near = available & (similarity[best] >= threshold)
+            duplicates += int(near.sum())
+            available &= ~near
+            redundancy = np.maximum(redundancy, similarity[best])
+        with self._lock:
+            self.queries += 1
+            self.candidates += n
+            self.duplicates += duplicates
+            self.over_budget += over_budget
+        return picked
+
+    def rerank(self, entries: List[dict], query_vec: Optional[np.ndarray], vectors: np.ndarray,
+               lexical_scores: Sequence[float], k: int) -> List[dict]:
+        """entries, their chunk embeddings and BM25 scores, aligned; returns at most k entries."""
+        if not entries:
+            return []
+        with self.timings.stage("score"):
+            vectors = unit_rows(vectors)
+            relevance = self.relevance(query_vec, vectors, lexical_scores)
+        with self.timings.stage("select"):
+            picked = self.select(entries, relevance, vectors, k)
+        return [entries[i] for i in picked]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {
+                "queries": self.queries,
+                "avg_candidates": self.candidates / self.queries if self.queries else 0.0,
+                "duplicates_dropped": self.duplicates,
+                "over_budget_dropped": self.over_budget,
+            }
+        return {**counters, "config": self.config, "stages": self.timings.stats()}
@@ -0,0 +1,127 @@
+# modules/result_cache.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change what a search returns."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").strip().lower()
+
+
+class QueryResultCache:
+    """
+    LRU cache of search tool results keyed on (normalized query, k, mode).
+    Entries can expire after ttl seconds (web search) and are tagged with the generation of
+    the index they were computed from, so a reloaded document index never serves stale hits.
+    With a semantic_threshold, a miss falls back to the cached query whose embedding has the
+    highest cosine similarity, if it is at least that close.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = None,
+                 semantic_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    @staticmethod
+    def key(query: str, k: int, mode: str = "") -> Tuple[str, int, str]:
+        return normalize_query(query), int(k), mode
+
+    def _set_generation(self, generation) -> None:
+        if generation != self.generation:
+            self.invalidated += len(self._entries)
+            self._entries.clear()
+            self.generation = generation
+
+    def _live(self, entry: dict, now: float) -> bool:
+        return self.ttl is None or now - entry["created"] < self.ttl
+
+    def get(self, query: str, k: int, mode: str = "", generation=None) -> Optional[Any]:
+        """Exact lookup of a normalized query."""
+        key = self.key(query, k, mode)
+        with self._lock:
+            self._set_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None and not self._live(entry, time.monotonic()):
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+            self.misses += 1
+            return None
+
+    def get_similar(self, vector: np.ndarray, k: int, mode: str = "", generation=None) -> Optional[Any]:
+        """
+        After an exact miss: the result of the most similar cached query with the same k and
+        mode, if above the threshold. Counted in semantic_hits, a subset of misses.
+        """
+        if self.semantic_threshold is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        now = time.monotonic()
+        with self._lock:
+            self._set_generation(generation)
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if key[1:] == (int(k), mode) and entry["vector"] is not None and self._live(entry, now)]
+            if candidates:
+                similarity = np.stack([entry["vector"] for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.semantic_threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return entry["value"]
+            return None
+
+    def put(self, query: str, k: int, mode: str, value: Any, generation=None,
+            vector: Optional[np.ndarray] = None) -> None:
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32).ravel()
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        key = self.key(query, k, mode)
+        with self._lock:
+            self._set_generation(generation)
+            self._entries[key] = {"value": value, "created": time.monotonic(), "vector": vector}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "expired": self.expired,
+                "invalidated": self.invalidated,
+                "generation": self.generation,
+                "ttl_seconds": self.ttl,
+                "semantic_threshold": self.semantic_threshold,
+            }
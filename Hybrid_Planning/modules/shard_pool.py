@@ -0,0 +1,179 @@
+# modules/shard_pool.py
+
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from modules.ann_index import configure_search, prepare_vectors, reconstruct_ids
+from modules.doc_index import SHARD_DIR, SHARD_MANIFEST, read_index, shard_of, shard_path
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def _shard_worker(conn, config: Optional[dict], threads: int, mmap: bool) -> None:
+    """Holds one shard and answers ("load", path), ("search", queries, k), ("reconstruct", ids) and ("stop",)."""
+    faiss.omp_set_num_threads(threads)
+    index = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        try:
+            if message[0] == "load":
+                index = configure_search(read_index(Path(message[1]), mmap=mmap), config)
+                conn.send(("ok", index.ntotal, index.d, index.metric_type))
+            elif message[0] == "search":
+                _, queries, k = message
+                if index is None or index.ntotal == 0:
+                    conn.send(("ok", np.zeros((len(queries), 0), dtype=np.float32),
+                               np.zeros((len(queries), 0), dtype=np.int64)))
+                else:
+                    D, I = index.search(prepare_vectors(queries, index, config), min(k, index.ntotal))
+                    conn.send(("ok", D, I))
+            elif message[0] == "reconstruct":
+                conn.send(("ok",) + reconstruct_ids(index, message[1]))
+            else:
+                break
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+def merge_topk(D: np.ndarray, I: np.ndarray, k: int, metric_type: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top k per row of the concatenated per-shard results (higher is better for inner product)."""
+    D = np.where(I >= 0, D, -np.inf if metric_type == faiss.METRIC_INNER_PRODUCT else np.inf)
+    order = np.argsort(-D if metric_type == faiss.METRIC_INNER_PRODUCT else D, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+
+class ShardPool:
+    """
+    Searches the shards written by a sharded DocumentStore with one worker process per shard.
+    Each worker memory-maps its shard file where the index type allows it (otherwise reads it),
+    a query is scattered to every worker and the per-shard top k are merged. It quacks like the
+    FAISS index of a ResidentIndex: ntotal, d, metric_type and search(queries, k).
+    """
+
+    def __init__(self, index_dir: Path, config: Optional[dict] = None, mmap: bool = True,
+                 threads_per_worker: int = 0):
+        self.index_dir = Path(index_dir)
+        self.config = config
+        self.mmap = mmap
+        self.threads_per_worker = threads_per_worker  # 0 = cores / shards
+        self.ntotal = 0
+        self.d = 0
+        self.metric_type = faiss.METRIC_INNER_PRODUCT
+        self.shard_sizes: List[int] = []
+        self.queries = 0
+        self.search_seconds = 0.0
+        self._workers: List[tuple] = []  # (process, connection)
+        self._lock = threading.Lock()
+        self._closed_at_exit = False
+
+    def _start(self, count: int) -> None:
+        self._stop()
+        # spawn, not fork: a forked child can hang in OpenMP if the parent already ran FAISS
+        ctx = multiprocessing.get_context("spawn")
+        threads = self.threads_per_worker or max(1, (os.cpu_count() or 1) // count)
+        for shard in range(count):
+            parent_conn, child_conn = ctx.Pipe()
+            process = ctx.Process(target=_shard_worker, args=(child_conn, self.config, threads, self.mmap),
+                                  name=f"shard-{shard}", daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn))
+        if not self._closed_at_exit:
+            atexit.register(self.close)
+            self._closed_at_exit = True
+        _log("INFO", f"Started {count} shard workers ({threads} FAISS threads each)")
+
+    def _call(self, messages: list) -> list:
+        for (_, conn), message in zip(self._workers, messages):
+            conn.send(message)
+        replies = [conn.recv() for _, conn in self._workers]
+        errors = [reply[1] for reply in replies if reply[0] == "error"]
+        if errors:
+            raise RuntimeError(f"Shard worker failed: {errors[0]}")
+        return replies
+
+    def _load(self) -> None:
+        manifest = json.loads((self.index_dir / SHARD_DIR / SHARD_MANIFEST).read_text())
+        if len(self._workers) != manifest["count"] or not all(p.is_alive() for p, _ in self._workers):
+            self._start(manifest["count"])
+        replies = self._call([("load", str(shard_path(self.index_dir, i))) for i in range(manifest["count"])])
+        self.shard_sizes = [reply[1] for reply in replies]
+        self.ntotal = sum(self.shard_sizes)
+        self.d, self.metric_type = replies[0][2], replies[0][3]
+
+    def load(self) -> "ShardPool":
+        """(Re)load every shard from disk, starting or resizing the workers as needed."""
+        with self._lock:
+            self._load()
+        return self
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, np.shape(queries)[-1])
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                replies = self._call([("search", queries, k)] * len(self._workers))
+            except (EOFError, OSError) as e:
+                _log("WARN", f"Shard worker lost ({e}), restarting the pool")
+                self._start(len(self._workers))
+                self._load()
+                replies = self._call([("search", queries, k)] * len(self._workers))
+            self.queries += 1
+            self.search_seconds += time.perf_counter() - start
+        D = np.hstack([reply[1] for reply in replies])
+        I = np.hstack([reply[2] for reply in replies])
+        return merge_topk(D, I, k, self.metric_type)
+
+    def reconstruct_ids(self, ids) -> Tuple[np.ndarray, np.ndarray]:
+        """Stored vectors of chunk ids, each read from its owning shard (see ann_index.reconstruct_ids)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.zeros((len(ids), self.d), dtype=np.float32)
+        found = np.zeros(len(ids), dtype=bool)
+        with self._lock:
+            owner = shard_of(ids, len(self._workers))
+            replies = self._call([("reconstruct", ids[owner == shard]) for shard in range(len(self._workers))])
+        for shard, reply in enumerate(replies):
+            vectors[owner == shard], found[owner == shard] = reply[1], reply[2]
+        return vectors, found
+
+    def stats(self) -> dict:
+        return {
+            "shards": len(self._workers),
+            "shard_sizes": self.shard_sizes,
+            "queries": self.queries,
+            "avg_search_ms": 1000 * self.search_seconds / self.queries if self.queries else 0.0,
+        }
+
+    def _stop(self) -> None:
+        for process, conn in self._workers:
+            try:
+                conn.send(("stop",))
+            except (OSError, ValueError):
+                pass
+        for process, conn in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
@@ -0,0 +1,166 @@
+# benchmarks/bench_memory_store.py
+#
+# The persistent MemoryStore of modules/memory.py as it grows to --items memory items spread
+# over --users users with --sessions-per-user sessions each. At every checkpoint it reports the
+# retrieval latency over all memory, a user's id range and a session's id range (IDSelectorRange),
+# and the old way of filtering: search everything for top_k * 2 neighbours, then drop other
+# sessions' items, with the share of queries that came back short. Type filters within a
+# user's range compare the old overfetch (top_k * 2, then drop other types) with
+# filtered_search() for a selective type (2% of items) and a broad one (90%). Also reports bulk_add
+# throughput (rows stored at once, embedded on the background thread) and the time to reopen
+# the store from disk. Run from the Telegram_Gdrive_GMail_Agent directory:
+#
+#   python benchmarks/bench_memory_store.py
+#   python benchmarks/bench_memory_store.py --items 100000 --checkpoints 1000 10000 50000 100000
+#   python benchmarks/bench_memory_store.py --dim 384 --request-ms 0
+#
+# Texts are embedded with a hashed bag of words; --request-ms adds a simulated Ollama latency
+# per embedding request (batch_size texts) to show what the background thread hides from
+# bulk_add. The vector files of --items items at --dim 768 take ~3 KB per item of disk and RAM.
+
+import argparse
+import hashlib
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from modules.memory import MemoryItem, MemoryStore
+
+TOOLS = ["search", "add", "create_google_sheet", "append_rows", "send_email", "convert_webpage_url_into_markdown"]
+TYPES = ["tool_output"] * 45 + ["fact"] * 4 + ["preference"]
+TOPICS = ["F1 standings", "invoice totals", "weather in Bangalore", "stock price of Gensol", "DLF apartment",
+          "Canvas LMS course", "exchange rates", "train timings", "cricket scores", "election results"]
+
+
+class HashedEmbedder:
+    model = "hashed-bag-of-words"
+
+    def __init__(self, dim: int, request_ms: float):
+        self.dim = dim
+        self.request_ms = request_ms
+
+    def embed_batch(self, texts):
+        time.sleep(self.request_ms / 1000)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % self.dim] += 1.0 if digest[4] & 1 else -1.0
+        return vectors
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+def item_text(i: int, rng: np.random.Generator) -> str:
+    tool, topic = TOOLS[rng.integers(len(TOOLS))], TOPICS[rng.integers(len(TOPICS))]
+    return f"{tool}({{'query': '{topic} {i % 97}'}}) → result {i} about {topic}: value {rng.integers(10**6)}"
+
+
+def percentiles(times):
+    return statistics.median(times), float(np.percentile(times, 95))
+
+
+def measure(store, embedder, sessions, queries, top_k):
+    names = ["all memory", "user range", "session range", "global + post-filter"]
+    names += [f"{kind} type, {how}" for kind in ("rare", "common") for how in ("overfetch", "filtered")]
+    rows = {name: [] for name in names}
+    short = dict.fromkeys(names, 0)
+    for q in range(queries):
+        vector = embedder.embed(TOPICS[q % len(TOPICS)])
+        session_id, user_id = sessions[q % len(sessions)]
+        for name, id_range in (("all memory", None), ("user range", store.id_range(user_id=user_id)),
+                               ("session range", store.id_range(session_id))):
+            start = time.perf_counter()
+            expected = len(store.search(vector, top_k, id_range))
+            rows[name].append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        lo, hi = store.id_range(session_id)
+        found = [i for i in store.search(vector, top_k * 2) if lo <= i < hi][:top_k]
+        rows["global + post-filter"].append((time.perf_counter() - start) * 1000)
+        short["global + post-filter"] += len(found) < expected
+
+        id_range = store.id_range(user_id=user_id)
+        for kind, type_filter in (("rare", "preference"), ("common", "tool_output")):
+            start = time.perf_counter()
+            expected = len(store.get(store.filtered_search(vector, top_k, id_range, type_filter)))
+            rows[f"{kind} type, filtered"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            found = [item for item in store.get(store.search(vector, top_k * 2, id_range))
+                     if item.type == type_filter][:top_k]
+            rows[f"{kind} type, overfetch"].append((time.perf_counter() - start) * 1000)
+            short[f"{kind} type, overfetch"] += len(found) < expected
+    return rows, {name: count / queries for name, count in short.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--checkpoints", type=int, nargs="+", default=[1_000, 10_000, 50_000, 100_000])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sessions-per-user", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--request-ms", type=float, default=20.0, help="simulated latency per embedding request")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embedder = HashedEmbedder(args.dim, args.request_ms)
+    sessions = [(f"session-{u}-{s}", f"telegram:{u}") for u in range(args.users) for s in range(args.sessions_per_user)]
+    workdir = Path(tempfile.mkdtemp(prefix="bench_memory_store_"))
+    try:
+        store = MemoryStore(workdir, embedder, {"batch_size": args.batch_size})
+        print(f"{'items':>7} {'search':<26} {'p50 ms':>8} {'p95 ms':>8} {'short':>6}")
+        added, add_seconds, embed_seconds = 0, 0.0, 0.0
+        for checkpoint in sorted(c for c in args.checkpoints if c <= args.items):
+            # each message of a session adds a handful of items, as the agent loop does per step
+            while added < checkpoint:
+                session_id, user_id = sessions[rng.integers(len(sessions))]
+                count = min(int(rng.integers(1, 8)), checkpoint - added)
+                items = [MemoryItem(text=item_text(added + i, rng), type=TYPES[rng.integers(len(TYPES))],
+                                    session_id=session_id) for i in range(count)]
+                start = time.perf_counter()
+                store.add_items(items, session_id, user_id)
+                add_seconds += time.perf_counter() - start
+                added += count
+            start = time.perf_counter()
+            store.wait()
+            embed_seconds += time.perf_counter() - start
+            rows, short = measure(store, embedder, sessions, args.queries, args.top_k)
+            for name, times in rows.items():
+                p50, p95 = percentiles(times)
+                print(f"{checkpoint:>7} {name:<26} {p50:>8.3f} {p95:>8.3f} {short[name]:>6.2f}")
+        stats = store.stats()
+        store.close()
+
+        start = time.perf_counter()
+        reopened = MemoryStore(workdir, embedder, {"batch_size": args.batch_size})
+        reopen = time.perf_counter() - start
+        assert reopened.ntotal == stats["vectors"] == added
+        reopened.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\nbulk_add: {added} items in {add_seconds:.2f}s of caller time ({added / add_seconds:,.0f} items/s); "
+          f"background embedding finished {embed_seconds:.2f}s later "
+          f"({stats['embed_batches']} batches, {stats['avg_embed_batch_ms']:.1f} ms each)")
+    print(f"reopen: {added} items and vectors loaded in {reopen:.2f}s")
+    print(f"filtered_search: {stats['prefiltered']} pre-filtered and {stats['postfiltered']} post-filtered searches, "
+          f"{stats['avg_filter_rounds']:.2f} rounds and {stats['avg_selectivity']:.3f} selectivity on average, "
+          f"{stats['short_results']} short")
+    print("short = share of queries returning fewer items than exist (the filtered search of the same range)")
+
+
+if __name__ == "__main__":
+    main()
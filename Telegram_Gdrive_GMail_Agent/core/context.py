@@ -53,14 +53,18 @@ class ToolCallTrace:
         self.result = result
 
 class AgentContext:
-    def __init__(self, user_input: str, profile: Optional[AgentProfile] = None):
+    def __init__(self, user_input: str, profile: Optional[AgentProfile] = None, user_id: str = "local"):
         self.user_input = user_input
         self.agent_profile = profile or AgentProfile()
+        self.user_id = user_id
         self.session_id = f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}"
         self.step = 0
         self.memory = MemoryManager(
             embedding_model_url=self.agent_profile.memory_config["embedding_url"],
-            model_name=self.agent_profile.memory_config["embedding_model"]
+            model_name=self.agent_profile.memory_config["embedding_model"],
+            session_id=self.session_id,
+            user_id=self.user_id,
+            store_config=self.agent_profile.memory_config.get("store")
         )
         self.memory_trace: List[MemoryItem] = []
         self.tool_calls: List[ToolCallTrace] = []
@@ -11,8 +11,8 @@ import json
 
 
 class AgentLoop:
-    def __init__(self, user_input: str, dispatcher: MultiMCP):
-        self.context = AgentContext(user_input)
+    def __init__(self, user_input: str, dispatcher: MultiMCP, user_id: str = "local"):
+        self.context = AgentContext(user_input, user_id=user_id)
         self.mcp = dispatcher
         self.tools = dispatcher.get_all_tools()
 
@@ -81,12 +81,17 @@ class AgentLoop:
 
                 print(f"[perception] Intent: {perception.intent}, Hint: {perception.tool_hint}")
 
-                # 💾 Memory Retrieval
-                retrieved = self.context.memory.retrieve(
+                # 💾 Memory Retrieval (this session, or every session of this user)
+                memory_config = self.context.agent_profile.memory_config
+                user_scope = memory_config.get("scope", "session") == "user"
+                # In a worker thread: retrieve() may wait for this session's items to be embedded
+                retrieved = await asyncio.to_thread(
+                    self.context.memory.retrieve,
                     query=query,
-                    top_k=self.context.agent_profile.memory_config["top_k"],
-                    type_filter=self.context.agent_profile.memory_config.get("type_filter", None),
-                    session_filter=self.context.session_id
+                    top_k=memory_config["top_k"],
+                    type_filter=memory_config.get("type_filter", None),
+                    session_filter=None if user_scope else self.context.session_id,
+                    user_filter=self.context.user_id if user_scope else None
                 )
                 print(f"[memory] Retrieved {len(retrieved)} memories")
 
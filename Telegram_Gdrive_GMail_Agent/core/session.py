@@ -2,10 +2,14 @@
 
 import os
 import sys
+import time
+import asyncio
 from typing import Optional, Any, List, Dict
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+DEFAULT_STARTUP_TIMEOUT = 30.0  # seconds per server during discovery
+
 
 class MCP:
     """
@@ -56,35 +60,68 @@ class MultiMCP:
     def __init__(self, server_configs: List[dict]):
         self.server_configs = server_configs
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
+        self.unavailable: Dict[str, str] = {}  # server_id -> startup error
+        self.startup_report: Dict[str, Dict[str, Any]] = {}  # server_id -> {status, seconds, ...}
+
+    async def _list_server_tools(self, config: dict) -> List[Any]:
+        params = StdioServerParameters(
+            command=sys.executable,
+            args=[config["script"]],
+            cwd=config.get("cwd", os.getcwd())
+        )
+        print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
+        async with stdio_client(params) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                return tools.tools
+
+    async def _discover(self, config: dict):
+        server_key = config.get("id", config["script"])
+        timeout = config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+        start = time.perf_counter()
+        try:
+            tools = await asyncio.wait_for(self._list_server_tools(config), timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            return server_key, tools, time.perf_counter() - start, None
+        return server_key, [], time.perf_counter() - start, error
 
     async def initialize(self):
+        """
+        Discover tools from all servers concurrently. A server that fails or times out
+        is marked unavailable instead of aborting startup.
+        """
         print("in MultiMCP initialize")
-        for config in self.server_configs:
-            try:
-                params = StdioServerParameters(
-                    command=sys.executable,
-                    args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
-                )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-                async with stdio_client(params) as (read, write):
-                    print("Connection established, creating session...")
-                    try:
-                        async with ClientSession(read, write) as session:
-                            print("[agent] Session created, initializing...")
-                            await session.initialize()
-                            print("[agent] MCP session initialized")
-                            tools = await session.list_tools()
-                            print(f"→ Tools received: {[tool.name for tool in tools.tools]}")
-                            for tool in tools.tools:
-                                self.tool_map[tool.name] = {
-                                    "config": config,
-                                    "tool": tool
-                                }
-                    except Exception as se:
-                        print(f"❌ Session error: {se}")
-            except Exception as e:
-                print(f"❌ Error initializing MCP server {config['script']}: {e}")
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._discover(config) for config in self.server_configs))
+
+        for config, (server_key, tools, elapsed, error) in zip(self.server_configs, results):
+            if error:
+                print(f"❌ Error initializing MCP server {config['script']}: {error}")
+                self.unavailable[server_key] = error
+                self.startup_report[server_key] = {"status": "unavailable", "seconds": elapsed, "error": error}
+                continue
+
+            print(f"→ Tools received from {server_key}: {[tool.name for tool in tools]}")
+            for tool in tools:
+                self.tool_map[tool.name] = {
+                    "config": config,
+                    "tool": tool
+                }
+            self.startup_report[server_key] = {"status": "ok", "seconds": elapsed, "tools": len(tools)}
+
+        self.print_startup_report(time.perf_counter() - started)
+
+    def print_startup_report(self, total_seconds: float):
+        print("MCP server startup:")
+        for server_key, entry in self.startup_report.items():
+            detail = f"{entry['tools']} tools" if entry["status"] == "ok" else entry["error"]
+            print(f"  {server_key:<12} {entry['status']:<12} {entry['seconds']:>7.2f}s  {detail}")
+        print(f"  {'total':<12} {'':<12} {total_seconds:>7.2f}s")
 
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
         entry = self.tool_map.get(tool_name)
@@ -15,7 +15,6 @@ from markitdown import MarkItDown
 import time
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput, PythonCodeInput, PythonCodeOutput, UrlInput, FilePathInput, MarkdownInput, MarkdownOutput, ChunkListOutput
 from tqdm import tqdm
-import hashlib
 from pydantic import BaseModel
 import subprocess
 import sqlite3
@@ -23,11 +22,13 @@ import trafilatura
 import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+from modules.embeddings import get_client
+from modules.fingerprint import fingerprint
 
 
 mcp = FastMCP("Calculator")
 
-EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBED_URL = "http://localhost:11434/api/embed"
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
 OLLAMA_URL = "http://localhost:11434/api/generate"
 EMBED_MODEL = "nomic-embed-text"
@@ -38,12 +39,11 @@ CHUNK_OVERLAP = 40
 MAX_CHUNK_LENGTH = 512  # characters
 TOP_K = 3  # FAISS top-K matches
 ROOT = Path(__file__).parent.resolve()
+EMBEDDER = get_client(EMBED_URL, EMBED_MODEL)  # shares the project-wide embedding cache
 
 
 def get_embedding(text: str) -> np.ndarray:
-    response = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
-    response.raise_for_status()
-    return np.array(response.json()["embedding"], dtype=np.float32)
+    return EMBEDDER.embed(text)
 
 def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     words = text.split()
@@ -114,6 +114,12 @@ def search_documents(query: str) -> list[str]:
         return [f"ERROR: Failed to search: {str(e)}"]
 
 
+@mcp.tool()
+def embedding_cache_stats() -> dict:
+    """Report embedding cache hit rate and estimated saved latency. Usage: result = await mcp.call_tool('embedding_cache_stats', {})"""
+    return EMBEDDER.cache.stats()
+
+
 def caption_image(img_url_or_path: str) -> str:
     mcp_log("CAPTION", f"🖼️ Attempting to caption image: {img_url_or_path}")
 
@@ -312,19 +318,26 @@ def process_documents():
     METADATA_FILE = INDEX_CACHE / "metadata.json"
     CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
 
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
+    # The cache maps file name -> fingerprint; only files whose size, mtime or inode changed are read
     CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-
+    changed, refreshed = [], False
     for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
+        fp, unchanged = fingerprint(file, CACHE_META.get(file.name))
+        if unchanged:
+            refreshed |= CACHE_META.get(file.name) != fp
+            CACHE_META[file.name] = fp
             mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
             continue
+        changed.append((file, fp))
+    if refreshed:
+        CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
+    if not changed:
+        return
+
+    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
+    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
 
+    for file, fp in changed:
         mcp_log("PROC", f"Processing: {file.name}")
         try:
             ext = file.suffix.lower()
@@ -356,11 +369,10 @@ def process_documents():
                 chunks = semantic_merge(markdown)
 
 
-            embeddings_for_file = []
+            mcp_log("INFO", f"Embedding {len(chunks)} chunks of {file.name}")
+            embeddings_for_file = list(EMBEDDER.embed_batch(chunks))
             new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
+            for i, chunk in enumerate(chunks):
                 new_metadata.append({
                     "doc": file.name,
                     "chunk": chunk,
@@ -373,7 +385,7 @@ def process_documents():
                     index = faiss.IndexFlatL2(dim)
                 index.add(np.stack(embeddings_for_file))
                 metadata.extend(new_metadata)
-                CACHE_META[file.name] = fhash
+                CACHE_META[file.name] = fp
 
                 # ✅ Immediately save index and metadata
                 CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
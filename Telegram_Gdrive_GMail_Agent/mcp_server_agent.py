@@ -35,7 +35,7 @@ active_conversations: Dict[int, asyncio.Queue] = {}
 # Create FastAPI app
 app = FastAPI()
 
-async def process_with_agent(message: str) -> str:
+async def process_with_agent(message: str, user_id: str = "local") -> str:
     """Process a message through the agent and return the final answer."""
     try:
         # Load MCP server configs from profiles.yaml
@@ -48,7 +48,8 @@ async def process_with_agent(message: str) -> str:
 
         agent = AgentLoop(
             user_input=message,
-            dispatcher=multi_mcp
+            dispatcher=multi_mcp,
+            user_id=user_id  # memory of this user's earlier messages is shared across sessions
         )
 
         final_response = await agent.run()
@@ -70,7 +71,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     # Process message through agent
     try:
-        final_answer = await process_with_agent(message_text)
+        final_answer = await process_with_agent(message_text, user_id=f"telegram:{user_id}")
         await update.message.reply_text(final_answer)
     except Exception as e:
         logger.error(f"Error processing message: {e}")
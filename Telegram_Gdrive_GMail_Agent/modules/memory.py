@@ -7,7 +7,9 @@
 
 # Use local embedding server (e.g., Ollama) to vectorize input
 
-# Filter memory based on type/tags/session
+# Filter memory based on type/tags/session/user
+
+# Persist the memory of all sessions on disk, shared by concurrent sessions
 
 # Dependencies:
 
@@ -21,12 +23,47 @@
 
 # modules/memory.py
 
-from typing import List, Optional, Literal
+import atexit
+import json
+import math
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Literal, Tuple
 from pydantic import BaseModel
 from datetime import datetime
-import requests
 import numpy as np
 import faiss
+from modules.embeddings import get_client
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Settings under `memory.store:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_STORE_CONFIG = {
+    "path": "memory",         # directory (relative to the project root) for items.sqlite and vectors.*
+    "batch_size": 64,         # items per background embedding request
+    "fsync_seconds": 2.0,     # vector files are fsynced at most this often (0 = after every batch)
+    "prefilter_max": 4096,        # type/tag filters matching at most this many items ...
+    "prefilter_selectivity": 0.2, # ... and at most this share of the searched range search only those
+    "overfetch": 2,               # broader filters fetch top_k * overfetch / share neighbours, then adapt
+}
+MAX_ID = (1 << 63) - 1
+
+# Item ids are (user number << 40) | (session number within the user << 20) | item number, so the
+# items of one user, or of one of their sessions, form a contiguous id range.
+USER_SHIFT = 40
+SESSION_SHIFT = 20
+MAX_SESSIONS_PER_USER = 1 << (USER_SHIFT - SESSION_SHIFT)
+MAX_ITEMS_PER_SESSION = 1 << SESSION_SHIFT
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
 
 
 class MemoryItem(BaseModel):
@@ -39,31 +76,444 @@ class MemoryItem(BaseModel):
     session_id: Optional[str] = None
 
 
+class MemoryStore:
+    """
+    Memory of every session and user, shared by all MemoryManagers of the process and kept on disk.
+    Items live in SQLite (items.sqlite); their vectors in one FAISS IndexIDMap2 that is rebuilt on
+    open from two append-only files (vectors.f32, vectors.ids), so adding an item never rewrites
+    the index. Ids encode user and session (see USER_SHIFT), and searches restrict themselves to a
+    user's or a session's id range with an IDSelectorRange instead of filtering after the search;
+    type and tag filters are planned by filtered_search().
+    add_items() stores the rows at once and embeds them in batches on a background thread;
+    search() first waits for the items added before it to the range it searches. Rows whose vectors were lost (a crash
+    before the append, an embedding error) are embedded again on the next open.
+    One process writes a store directory at a time.
+    """
+
+    def __init__(self, path: Path, embedder, config: Optional[dict] = None):
+        self.config = {**DEFAULT_STORE_CONFIG, **(config or {})}
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder
+        self.index: Optional[faiss.IndexIDMap2] = None
+        self._lock = threading.Lock()  # index, database and the id maps below
+        self._users: Dict[str, int] = {}
+        self._sessions: Dict[str, List[int]] = {}  # session_id -> [first id, next id]
+        self._conn = sqlite3.connect(str(self.path / "items.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS users (user_no INTEGER PRIMARY KEY, user_id TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS sessions (first_id INTEGER PRIMARY KEY, session_id TEXT UNIQUE NOT NULL, "
+            "user_no INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, session_id TEXT, type TEXT, tool_name TEXT, "
+            "user_query TEXT, tags TEXT, text TEXT NOT NULL, timestamp TEXT);"
+            "CREATE INDEX IF NOT EXISTS items_type ON items (type, id);"
+            "CREATE TABLE IF NOT EXISTS item_tags (tag TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (tag, id)) "
+            "WITHOUT ROWID;"
+        )
+        if self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM item_tags) AND EXISTS (SELECT 1 FROM items)").fetchone()[0]:
+            # stores written before item_tags existed
+            self._conn.executemany("INSERT OR IGNORE INTO item_tags (tag, id) VALUES (?, ?)",
+                                   [(tag, i) for i, tags in self._conn.execute("SELECT id, tags FROM items")
+                                    for tag in json.loads(tags or "[]")])
+        self._conn.commit()
+        self._queue: "queue.Queue[Tuple[int, str]]" = queue.Queue()
+        self._done = threading.Condition()
+        self._queued = 0
+        self._processed = 0
+        self._queued_upto: Dict[int, int] = {}  # session's first id -> _queued after its last enqueued item
+        self._vectors_file = None
+        self._ids_file = None
+        self._synced_at = time.monotonic()
+        self.embed_batches = 0
+        self.embed_errors = 0
+        self.embed_seconds = 0.0
+        self.searches = 0
+        self.search_seconds = 0.0
+        self.filtered = {"prefiltered": 0, "postfiltered": 0, "rounds": 0, "short": 0, "selectivity": 0.0}
+        self._load()
+        threading.Thread(target=self._worker, name="memory-embedder", daemon=True).start()
+        self._recover()
+
+    # ---------------------------------------------------------------- loading
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _load(self):
+        start = time.perf_counter()
+        self._users = dict(self._conn.execute("SELECT user_id, user_no FROM users"))
+        last_ids = dict(self._conn.execute("SELECT session_id, MAX(id) FROM items GROUP BY session_id"))
+        for first_id, session_id in self._conn.execute("SELECT first_id, session_id FROM sessions"):
+            last = last_ids.get(session_id)
+            self._sessions[session_id] = [first_id, first_id if last is None else last + 1]
+
+        vectors_path, ids_path = self.path / "vectors.f32", self.path / "vectors.ids"
+        dim = int(self._meta("dim") or 0)
+        if self._meta("model") not in (None, self.embedder.model):
+            _log("WARN", f"Memory vectors were made by {self._meta('model')}, re-embedding with {self.embedder.model}")
+            dim = 0
+        if dim and vectors_path.exists() and ids_path.exists():
+            ids = np.fromfile(ids_path, dtype=np.int64)
+            vectors = np.fromfile(vectors_path, dtype=np.float32)
+            count = min(len(ids), len(vectors) // dim)  # a torn last append is dropped
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+            self.index.add_with_ids(vectors[:count * dim].reshape(count, dim), ids[:count])
+            if ids_path.stat().st_size != count * 8 or vectors_path.stat().st_size != count * dim * 4:
+                self._rewrite_vectors()
+        else:
+            for p in (vectors_path, ids_path):
+                p.unlink(missing_ok=True)
+        items = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        _log("INFO", f"Memory store {self.path}: {items} items, {self.ntotal} vectors, "
+                     f"{len(self._sessions)} sessions in {time.perf_counter() - start:.2f}s")
+
+    def _rewrite_vectors(self):
+        """Rewrite the vector files from the index (after dropping a torn append)."""
+        self._close_files()
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        for name, data in (("vectors.f32", vectors), ("vectors.ids", ids)):
+            tmp = self.path / f"{name}.tmp"
+            data.tofile(tmp)
+            os.replace(tmp, self.path / name)
+
+    def _recover(self):
+        with self._lock:
+            stored = np.array([row[0] for row in self._conn.execute("SELECT id FROM items ORDER BY id")], dtype=np.int64)
+            indexed = faiss.vector_to_array(self.index.id_map) if self.index is not None else np.zeros(0, np.int64)
+            missing = np.setdiff1d(stored, indexed, assume_unique=True)
+            texts = self._texts(missing)
+        if len(missing):
+            _log("INFO", f"Memory store: embedding {len(missing)} items without vectors")
+            self._enqueue(list(zip(missing.tolist(), texts)))
+
+    def _texts(self, ids) -> List[str]:
+        texts = {}
+        ids = [int(i) for i in ids]
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            texts.update(self._conn.execute(
+                f"SELECT id, text FROM items WHERE id IN ({','.join('?' * len(batch))})", batch))
+        return [texts[i] for i in ids]
+
+    # ---------------------------------------------------------------- writing
+
+    def _session(self, session_id: str, user_id: str) -> List[int]:
+        """[first id, next id] of a session, registering the user and session on first use."""
+        session = self._sessions.get(session_id)
+        if session is not None:
+            return session
+        user_no = self._users.get(user_id)
+        if user_no is None:
+            user_no = len(self._users) + 1
+            self._conn.execute("INSERT INTO users (user_no, user_id) VALUES (?, ?)", (user_no, user_id))
+            self._users[user_id] = user_no
+        user_first = user_no << USER_SHIFT
+        count = self._conn.execute("SELECT COUNT(*) FROM sessions WHERE user_no = ?", (user_no,)).fetchone()[0]
+        if count >= MAX_SESSIONS_PER_USER:
+            raise ValueError(f"User {user_id} has more than {MAX_SESSIONS_PER_USER} memory sessions")
+        first_id = user_first + (count << SESSION_SHIFT)
+        self._conn.execute("INSERT INTO sessions (first_id, session_id, user_no) VALUES (?, ?, ?)",
+                           (first_id, session_id, user_no))
+        session = self._sessions[session_id] = [first_id, first_id]
+        return session
+
+    def add_items(self, items: List[MemoryItem], session_id: str, user_id: str) -> List[int]:
+        """Store items of one session now and embed them in the background; returns their ids."""
+        if not items:
+            return []
+        with self._lock:
+            session = self._session(session_id, user_id)
+            if session[1] + len(items) > session[0] + MAX_ITEMS_PER_SESSION:
+                raise ValueError(f"Session {session_id} has more than {MAX_ITEMS_PER_SESSION} memory items")
+            ids = list(range(session[1], session[1] + len(items)))
+            session[1] += len(items)
+            self._conn.executemany(
+                "INSERT INTO items (id, session_id, type, tool_name, user_query, tags, text, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(i, session_id, item.type, item.tool_name, item.user_query, json.dumps(item.tags), item.text,
+                  item.timestamp) for i, item in zip(ids, items)],
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO item_tags (tag, id) VALUES (?, ?)",
+                                   [(tag, i) for i, item in zip(ids, items) for tag in item.tags])
+            self._conn.commit()
+        self._enqueue([(i, item.text) for i, item in zip(ids, items)])
+        return ids
+
+    def _enqueue(self, entries: List[Tuple[int, str]]):
+        # Queued under the condition so queue order matches the _queued count: the worker takes
+        # items in that order, so _processed >= n means the first n queued items are done
+        with self._done:
+            for entry in entries:
+                self._queued += 1
+                self._queued_upto[entry[0] >> SESSION_SHIFT << SESSION_SHIFT] = self._queued
+                self._queue.put(entry)
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.config["batch_size"]:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._embed(batch)
+            except Exception as e:  # the rows stay in SQLite and are embedded again on the next open
+                self.embed_errors += len(batch)
+                _log("WARN", f"Memory store: embedding {len(batch)} items failed: {e}")
+            with self._done:
+                self._processed += len(batch)
+                self._done.notify_all()
+
+    def _embed(self, batch: List[Tuple[int, str]]):
+        start = time.perf_counter()
+        vectors = np.ascontiguousarray(self.embedder.embed_batch([text for _, text in batch]), dtype=np.float32)
+        ids = np.array([i for i, _ in batch], dtype=np.int64)
+        with self._lock:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+                self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       [("dim", str(vectors.shape[1])), ("model", self.embedder.model)])
+                self._conn.commit()
+            self.index.add_with_ids(vectors, ids)
+            self._append(vectors, ids)
+        self.embed_batches += 1
+        self.embed_seconds += time.perf_counter() - start
+
+    def _append(self, vectors: np.ndarray, ids: np.ndarray):
+        if self._vectors_file is None:
+            self._vectors_file = open(self.path / "vectors.f32", "ab")
+            self._ids_file = open(self.path / "vectors.ids", "ab")
+        # vectors before ids: on load, an id without its complete vector is dropped and re-embedded
+        self._vectors_file.write(vectors.tobytes())
+        self._vectors_file.flush()
+        self._ids_file.write(ids.tobytes())
+        self._ids_file.flush()
+        if time.monotonic() - self._synced_at >= self.config["fsync_seconds"]:
+            self._fsync()
+
+    def _fsync(self):
+        for f in (self._vectors_file, self._ids_file):
+            if f is not None:
+                os.fsync(f.fileno())
+        self._synced_at = time.monotonic()
+
+    def _close_files(self):
+        for f in (self._vectors_file, self._ids_file):
+            if f is not None:
+                f.close()
+        self._vectors_file = self._ids_file = None
+
+    def wait(self, timeout: Optional[float] = None, id_range: Optional[Tuple[int, int]] = None) -> bool:
+        """
+        Wait until every item added so far is embedded (or failed), or only those of the sessions
+        in id_range [lo, hi) when given, so a search does not queue behind other users' items.
+        False on timeout.
+        """
+        with self._done:
+            if id_range is None:
+                target = self._queued
+            else:
+                lo, hi = id_range
+                target = max((upto for first, upto in self._queued_upto.items() if lo <= first < hi), default=0)
+            return self._done.wait_for(lambda: self._processed >= target, timeout)
+
+    def close(self, timeout: float = 30.0):
+        self.wait(timeout)
+        with self._lock:
+            self._fsync()
+            self._close_files()
+
+    # ---------------------------------------------------------------- reading
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def id_range(self, session_id: Optional[str] = None, user_id: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """[lo, hi) ids of a session (of that user, if given) or of a user; (0, 0) when unknown; None = all."""
+        with self._lock:
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+                if session is None or (user_id is not None and session[0] >> USER_SHIFT != self._users.get(user_id)):
+                    return 0, 0
+                return session[0], session[0] + MAX_ITEMS_PER_SESSION
+            if user_id is not None:
+                user_no = self._users.get(user_id)
+                return (user_no << USER_SHIFT, (user_no + 1) << USER_SHIFT) if user_no else (0, 0)
+        return None
+
+    def search(self, vector: np.ndarray, k: int, id_range: Optional[Tuple[int, int]] = None,
+               ids: Optional[List[int]] = None) -> List[int]:
+        """Ids of the k nearest vectors, restricted to [lo, hi) when id_range is given and to ids when given."""
+        self.wait(id_range=id_range)
+        start = time.perf_counter()
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0 or id_range == (0, 0) or ids == [] or k <= 0:
+                return []
+            if ids is not None:
+                selector = faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64))
+            elif id_range:
+                selector = faiss.IDSelectorRange(*id_range)
+            else:
+                selector = None
+            params = faiss.SearchParameters(sel=selector) if selector is not None else None
+            _, I = self.index.search(np.asarray(vector, dtype=np.float32).reshape(1, -1), k, params=params)
+        self.searches += 1
+        self.search_seconds += time.perf_counter() - start
+        return [int(i) for i in I[0] if i >= 0]
+
+    @staticmethod
+    def _filter_sql(id_range: Optional[Tuple[int, int]], type_filter: Optional[str],
+                    tag_filter: Optional[List[str]]) -> Tuple[str, list]:
+        where, params = "id >= ? AND id < ?", list(id_range or (0, MAX_ID))
+        if type_filter:
+            where += " AND type = ?"
+            params.append(type_filter)
+        if tag_filter:
+            where += f" AND id IN (SELECT id FROM item_tags WHERE tag IN ({','.join('?' * len(tag_filter))}))"
+            params.extend(tag_filter)
+        return where, params
+
+    def _range_count(self, id_range: Optional[Tuple[int, int]]) -> int:
+        if id_range is None:
+            return self.ntotal
+        return self._conn.execute("SELECT COUNT(*) FROM items WHERE id >= ? AND id < ?", id_range).fetchone()[0]
+
+    def _matching(self, ids: List[int], where: str, params: list) -> set:
+        passed = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                passed.update(row[0] for row in self._conn.execute(
+                    f"SELECT id FROM items WHERE {where} AND id IN ({','.join('?' * len(batch))})", [*params, *batch]))
+        return passed
+
+    def filtered_search(self, vector: np.ndarray, k: int, id_range: Optional[Tuple[int, int]] = None,
+                        type_filter: Optional[str] = None, tag_filter: Optional[List[str]] = None) -> List[int]:
+        """
+        Ids of the k nearest items in id_range with type_filter and any of tag_filter. A selective
+        filter (see prefilter_max) searches exactly the matching items (IDSelectorBatch); a broad
+        one searches the range for k * overfetch / (share of matching items) neighbours and, while
+        fewer than k pass, again for more, sized by the share that passed. Either way k ids come
+        back if k match.
+        """
+        if not type_filter and not tag_filter:
+            return self.search(vector, k, id_range)
+        if id_range == (0, 0) or k <= 0:
+            return []
+        self.wait(id_range=id_range)
+        where, params = self._filter_sql(id_range, type_filter, tag_filter)
+        with self._lock:
+            in_range = self._range_count(id_range)
+            limit = min(self.config["prefilter_max"], int(in_range * self.config["prefilter_selectivity"]))
+            allowed = [row[0] for row in self._conn.execute(
+                f"SELECT id FROM items WHERE {where} LIMIT ?", [*params, limit + 1])]
+        selectivity = len(allowed) / max(in_range, 1)  # a lower bound when the limit was reached
+        if len(allowed) <= limit:
+            found = self.search(vector, k, id_range, ids=allowed)
+            self._record_filter(True, 1, selectivity, len(found) < min(k, len(allowed)))
+            return found
+
+        fetch, rounds = min(math.ceil(k * self.config["overfetch"] / max(selectivity, 1e-6)), in_range), 0
+        while True:
+            rounds += 1
+            candidates = self.search(vector, fetch, id_range)
+            passed = self._matching(candidates, where, params)
+            found = [i for i in candidates if i in passed][:k]
+            if len(found) >= k or len(candidates) < fetch or fetch >= in_range:
+                break
+            fetch = min(in_range, max(fetch * 2, math.ceil(fetch * k / max(len(passed), 1) * 1.5)))
+        self._record_filter(False, rounds, len(passed) / max(len(candidates), 1), len(found) < k)
+        return found
+
+    def _record_filter(self, prefiltered: bool, rounds: int, selectivity: float, short: bool):
+        with self._lock:
+            self.filtered["prefiltered" if prefiltered else "postfiltered"] += 1
+            self.filtered["rounds"] += rounds
+            self.filtered["selectivity"] += selectivity
+            self.filtered["short"] += short
+
+    def get(self, ids: List[int]) -> List[MemoryItem]:
+        """Items by id, in the order given."""
+        if not ids:
+            return []
+        with self._lock:
+            rows = {row[0]: row[1:] for row in self._conn.execute(
+                "SELECT id, session_id, type, tool_name, user_query, tags, text, timestamp FROM items "
+                f"WHERE id IN ({','.join('?' * len(ids))})", ids)}
+        return [MemoryItem(session_id=s, type=t, tool_name=tool, user_query=q, tags=json.loads(tags), text=text,
+                           timestamp=ts)
+                for s, t, tool, q, tags, text, ts in (rows[i] for i in ids if i in rows)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            items = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        with self._done:
+            pending = self._queued - self._processed
+        filtered = self.filtered["prefiltered"] + self.filtered["postfiltered"]
+        return {
+            "items": items,
+            "vectors": self.ntotal,
+            "pending": pending,
+            "users": len(self._users),
+            "sessions": len(self._sessions),
+            "embed_batches": self.embed_batches,
+            "embed_errors": self.embed_errors,
+            "avg_embed_batch_ms": self.embed_seconds * 1000 / self.embed_batches if self.embed_batches else 0.0,
+            "searches": self.searches,
+            "avg_search_ms": self.search_seconds * 1000 / self.searches if self.searches else 0.0,
+            "filtered_searches": filtered,
+            "prefiltered": self.filtered["prefiltered"],
+            "postfiltered": self.filtered["postfiltered"],
+            "avg_filter_rounds": self.filtered["rounds"] / filtered if filtered else 0.0,
+            "avg_selectivity": self.filtered["selectivity"] / filtered if filtered else 0.0,  # share of items passing
+            "short_results": self.filtered["short"],  # fewer than top_k although more items matched
+        }
+
+
+_stores: Dict[Path, MemoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(embedder, config: Optional[dict] = None) -> MemoryStore:
+    """Process-wide store per directory, so concurrent sessions share one index."""
+    config = {**DEFAULT_STORE_CONFIG, **(config or {})}
+    path = (PROJECT_ROOT / config["path"]).resolve()
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MemoryStore(path, embedder, config)
+        return _stores[path]
+
+
+@atexit.register
+def _close_stores():
+    for store in list(_stores.values()):
+        store.close()
+
+
 class MemoryManager:
-    def __init__(self, embedding_model_url: str, model_name: str = "nomic-embed-text"):
+    """
+    One session's view of the shared MemoryStore: items are added under session_id and user_id,
+    and retrieve() can search this session, a user's past sessions or everything.
+    """
+
+    def __init__(self, embedding_model_url: str, model_name: str = "nomic-embed-text",
+                 session_id: Optional[str] = None, user_id: Optional[str] = None,
+                 store_config: Optional[dict] = None):
         self.embedding_model_url = embedding_model_url
         self.model_name = model_name
-        self.index: Optional[faiss.IndexFlatL2] = None
-        self.data: List[MemoryItem] = []
-        self.embeddings: List[np.ndarray] = []
-
-    def _get_embedding(self, text: str) -> np.ndarray:
-        response = requests.post(
-            self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text}
-        )
-        response.raise_for_status()
-        return np.array(response.json()["embedding"], dtype=np.float32)
+        self.embedder = get_client(embedding_model_url, model_name)  # shared pooled client
+        self.session_id = session_id or ""
+        self.user_id = user_id or ""
+        self.store = get_store(self.embedder, store_config)
 
     def add(self, item: MemoryItem):
-        embedding = self._get_embedding(item.text)
-        self.embeddings.append(embedding)
-        self.data.append(item)
-
-        # Init or add to index
-        if self.index is None:
-            self.index = faiss.IndexFlatL2(len(embedding))
-        self.index.add(np.stack([embedding]))
+        self.bulk_add([item])
 
     def retrieve(
         self,
@@ -71,33 +521,23 @@ class MemoryManager:
         top_k: int = 3,
         type_filter: Optional[str] = None,
         tag_filter: Optional[List[str]] = None,
-        session_filter: Optional[str] = None
+        session_filter: Optional[str] = None,
+        user_filter: Optional[str] = None
     ) -> List[MemoryItem]:
-        if not self.index or len(self.data) == 0:
+        id_range = self.store.id_range(session_filter, user_filter)
+        self.store.wait(id_range=id_range)
+        if id_range == (0, 0) or self.store.ntotal == 0:
             return []
 
-        query_vec = self._get_embedding(query).reshape(1, -1)
-        D, I = self.index.search(query_vec, top_k * 2)  # overfetch for filtering
-
-        results = []
-        for idx in I[0]:
-            if idx >= len(self.data):
-                continue
-            item = self.data[idx]
-
-            if type_filter and item.type != type_filter:
-                continue
-            if tag_filter and not any(tag in item.tags for tag in tag_filter):
-                continue
-            if session_filter and item.session_id != session_filter:
-                continue
-
-            results.append(item)
-            if len(results) >= top_k:
-                break
-
-        return results
+        query_vec = self.embedder.embed(query)
+        if type_filter == "all":
+            type_filter = None
+        return self.store.get(self.store.filtered_search(query_vec, top_k, id_range, type_filter, tag_filter))
 
     def bulk_add(self, items: List[MemoryItem]):
+        """Store items now; they are embedded in batches in the background (retrieve() waits for them)."""
+        by_session: Dict[str, List[MemoryItem]] = {}
         for item in items:
-            self.add(item)
+            by_session.setdefault(item.session_id or self.session_id, []).append(item)
+        for session_id, session_items in by_session.items():
+            self.store.add_items(session_items, session_id, self.user_id)
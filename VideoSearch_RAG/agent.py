@@ -3,9 +3,10 @@ import time
 import os
 import datetime
 from perception import extract_perception
-from memory import MemoryManager, MemoryItem
+from memory import MemoryManager, MemoryItem, load_memory_config
 from decision import generate_plan
 from action import execute_tool
+from frame_table import FrameTable
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
  # use this to connect to running server
@@ -52,21 +53,10 @@ def open_video_and_frame(input_string):
                 METADATA_FILE = ROOT / "faiss_index" / "metadata.json"
                 
                 if METADATA_FILE.exists():
-                    with open(METADATA_FILE, 'r') as f:
-                        metadata = json.load(f)
-                    
-                    # Find the matching metadata entry
-                    video_id = f"video{video_number}"
-                    matching_entry = None
-                    
-                    # metadata is a list of lists, where each inner list contains metadata for a video
-                    for video_metadata in metadata:
-                        for entry in video_metadata:
-                            if entry['video_id'] == video_id and entry['video_segment_id'] == frame_number:
-                                matching_entry = entry
-                                break
-                        if matching_entry:
-                            break
+                    # Same flat frame table as search_videos: direct (video, segment) lookup
+                    table = FrameTable.from_file(METADATA_FILE)
+                    row = table.find(f"video{video_number}", frame_number)
+                    matching_entry = table.row(row) if row is not None else None
                     
                     if matching_entry:
                         # Convert milliseconds to seconds
@@ -122,7 +112,8 @@ async def main(user_input: str):
 
                             log("agent", f"{len(tools)} tools loaded")
 
-                            memory = MemoryManager()
+                            memory_config = load_memory_config(Path(__file__).parent.resolve() / "config" / "profiles.yaml")
+                            memory = MemoryManager(config=memory_config)
                             session_id = f"session-{int(time.time())}"
                             query = user_input  # Store original intent
                             step = 0
@@ -164,6 +155,11 @@ async def main(user_input: str):
                                     break
 
                                 step += 1
+
+                            stats = memory.stats()
+                            log("memory", f"{stats['filtered_searches']} filtered retrievals "
+                                          f"({stats['prefiltered']} pre-filtered), average selectivity "
+                                          f"{stats['avg_selectivity']:.2f}, {stats['short_results']} short")
                         except Exception as e:
                             print(f"[agent] Session initialization error: {str(e)}")
                 except Exception as e:
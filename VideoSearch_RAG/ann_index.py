@@ -0,0 +1,255 @@
+# ann_index.py
+#
+# Verbatim copy of Hybrid_Planning/modules/ann_index.py below this header; that file is the
+# source of truth. Change it there and copy it here rather than editing this one.
+
+import sys
+from pathlib import Path
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+# Settings under `index:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_INDEX_CONFIG = {
+    "type": "flat",        # [flat, hnsw, ivfpq]
+    "metric": "ip",        # ip = cosine on L2-normalized vectors; l2 = raw L2 distance
+    "promote_at": 20000,   # hnsw/ivfpq: stay exact (flat) until the corpus has this many vectors
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+    "ivfpq": {"nlist": 0, "m": 64, "nbits": 8, "nprobe": 16},  # nlist 0 = 4 * sqrt(n) at training time
+}
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def merge_config(config: Optional[dict]) -> dict:
+    merged = {key: (dict(value) if isinstance(value, dict) else value) for key, value in DEFAULT_INDEX_CONFIG.items()}
+    for key, value in (config or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key].update(value)
+        else:
+            merged[key] = value
+    if merged["type"] not in ("flat", "hnsw", "ivfpq"):
+        raise ValueError(f"Unknown index type '{merged['type']}', expected flat, hnsw or ivfpq")
+    return merged
+
+
+def load_index_config(profile_path: Path) -> dict:
+    """Read the `index:` section of a profiles.yaml, if there is one."""
+    config = {}
+    if Path(profile_path).exists():
+        import yaml
+        config = (yaml.safe_load(Path(profile_path).read_text()) or {}).get("index", {}) or {}
+    return merge_config(config)
+
+
+def _metric(config: dict) -> int:
+    return faiss.METRIC_INNER_PRODUCT if config["metric"] == "ip" else faiss.METRIC_L2
+
+
+def base_index(index):
+    """The underlying index of an IndexIDMap/IndexIDMap2, downcast to its concrete type."""
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.downcast_index(index.index)
+    return faiss.downcast_index(index)
+
+
+def index_kind(index) -> str:
+    base = base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def prepare_vectors(vectors, index=None, config: Optional[dict] = None) -> np.ndarray:
+    """float32, contiguous and, for cosine (inner-product) search, unit length."""
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, np.shape(vectors)[-1]))
+    if index is None:
+        normalize = merge_config(config)["metric"] == "ip"
+    else:
+        # IVF-PQ for cosine is built with L2 on unit vectors (see _new_ivfpq), so it is normalized too
+        normalize = index.metric_type == faiss.METRIC_INNER_PRODUCT or \
+            (index_kind(index) == "ivfpq" and merge_config(config)["metric"] == "ip")
+    if normalize:
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _wrap(base, with_ids: bool):
+    # IVF indexes store arbitrary ids natively, and an IndexIDMap over them would go out of
+    # step with the inverted lists after remove_ids, so only flat and HNSW get the wrapper.
+    if not with_ids or isinstance(base, faiss.IndexIVF):
+        return base
+    return faiss.IndexIDMap2(base)
+
+
+def has_ids(index) -> bool:
+    """True for indexes addressed by caller-chosen ids rather than insertion position."""
+    return isinstance(index, faiss.IndexIDMap) or isinstance(faiss.downcast_index(index), faiss.IndexIVF)
+
+
+def new_flat_index(dim: int, config: Optional[dict] = None, with_ids: bool = True):
+    config = merge_config(config)
+    return _wrap(faiss.IndexFlat(dim, _metric(config)), with_ids)
+
+
+def new_index(dim: int, config: Optional[dict] = None, with_ids: bool = True):
+    """Empty index for a new corpus: flat until promote_at, or HNSW right away when promote_at is 0."""
+    config = merge_config(config)
+    if config["type"] == "hnsw" and config["promote_at"] <= 0:
+        return _wrap(_new_hnsw(dim, config), with_ids)
+    return new_flat_index(dim, config, with_ids)
+
+
+def _new_hnsw(dim: int, config: dict):
+    params = config["hnsw"]
+    index = faiss.IndexHNSWFlat(dim, params["m"], _metric(config))
+    index.hnsw.efConstruction = params["ef_construction"]
+    index.hnsw.efSearch = params["ef_search"]
+    return index
+
+
+def _new_ivfpq(vectors: np.ndarray, config: dict):
+    params = config["ivfpq"]
+    n, dim = vectors.shape
+    nlist = params["nlist"] or int(4 * np.sqrt(n))
+    nlist = max(1, min(nlist, n // 39))  # FAISS wants ~39 training points per centroid
+    m = params["m"]
+    while dim % m:
+        m -= 1  # PQ sub-quantizers must divide the dimension
+    # On unit vectors L2 ranks exactly like inner product, and PQ residuals are encoded far more
+    # accurately under L2, so cosine IVF-PQ indexes use METRIC_L2 on normalized vectors.
+    quantizer = faiss.IndexFlatL2(dim)
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, params["nbits"], faiss.METRIC_L2)
+    _log("INFO", f"Training IVF-PQ (nlist={nlist}, m={m}) on {n} vectors")
+    index.train(vectors)
+    index.nprobe = min(params["nprobe"], nlist)
+    return index
+
+
+def index_contents(index):
+    """
+    All vectors of an index with their ids (positions without an id map). IVF-PQ vectors are
+    decoded from their codes, so they are approximations of the originals.
+    """
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        invlists = base.invlists
+        ids = [faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+               for l in range(base.nlist) if invlists.list_size(l)]
+        ids = np.concatenate(ids).astype(np.int64) if ids else np.zeros(0, dtype=np.int64)
+        if not len(ids):
+            return np.zeros((0, base.d), dtype=np.float32), ids
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)  # reconstruct by arbitrary id
+        return base.reconstruct_batch(ids), ids
+    vectors = base.reconstruct_n(0, base.ntotal) if base.ntotal else np.zeros((0, base.d), dtype=np.float32)
+    if isinstance(index, faiss.IndexIDMap):
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    else:
+        ids = np.arange(base.ntotal, dtype=np.int64)
+    return vectors, ids
+
+
+def reconstruct_ids(index, ids) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stored vectors of the given ids and a mask of the ids that could be reconstructed: those held
+    by an IndexIDMap2, or by an IVF index with a direct map. Rows of other ids are zero.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    vectors = np.zeros((len(ids), index.d), dtype=np.float32)
+    found = np.zeros(len(ids), dtype=bool)
+    base = base_index(index)
+    if isinstance(base, faiss.IndexIVF) and base.direct_map.type == faiss.DirectMap.NoMap:
+        return vectors, found
+    if isinstance(index, faiss.IndexIDMap) and not isinstance(index, faiss.IndexIDMap2):
+        return vectors, found
+    source = base if isinstance(base, faiss.IndexIVF) else index
+    for row, idx in enumerate(ids.tolist()):
+        try:
+            vectors[row] = source.reconstruct(idx)
+            found[row] = True
+        except RuntimeError:
+            pass  # not in the index (removed, or added after the search)
+    return vectors, found
+
+
+def _rebuild(index, kind: str, config: dict, vectors: np.ndarray, ids: np.ndarray):
+    with_ids = has_ids(index)
+    if kind == "hnsw":
+        base = _new_hnsw(index.d, config)
+    elif kind == "ivfpq":
+        base = _new_ivfpq(vectors, config)
+    else:
+        base = faiss.IndexFlat(index.d, _metric(config))
+    rebuilt = _wrap(base, with_ids)
+    if len(vectors):
+        if has_ids(rebuilt):
+            rebuilt.add_with_ids(vectors, ids)
+        else:
+            rebuilt.add(vectors)
+    return rebuilt
+
+
+def maybe_promote(index, config: Optional[dict] = None):
+    """Swap a flat index for the configured ANN type once the corpus reaches promote_at."""
+    config = merge_config(config)
+    if index is None or config["type"] == "flat" or index_kind(index) != "flat":
+        return index
+    threshold = config["promote_at"]
+    if config["type"] == "ivfpq":
+        threshold = max(threshold, 39 * (1 << config["ivfpq"]["nbits"]))  # enough points to train the PQ codebooks
+    if index.ntotal < threshold:
+        return index
+    _log("INFO", f"Promoting flat index with {index.ntotal} vectors to {config['type']}")
+    vectors, ids = index_contents(index)
+    return _rebuild(index, config["type"], config, vectors, ids)
+
+
+def conform_metric(index, config: Optional[dict] = None):
+    """Convert an existing flat index to the configured metric (e.g. a legacy IndexFlatL2 to cosine)."""
+    config = merge_config(config)
+    if index is None or index.metric_type == _metric(config) or index_kind(index) != "flat":
+        return index
+    _log("INFO", f"Converting flat index with {index.ntotal} vectors to metric '{config['metric']}'")
+    vectors, ids = index_contents(index)
+    if config["metric"] == "ip":
+        faiss.normalize_L2(vectors)
+    return _rebuild(index, "flat", config, vectors, ids)
+
+
+def remove_ids(index, ids: np.ndarray):
+    """remove_ids that also works for HNSW, which FAISS can only rebuild without the removed ids."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if index_kind(index) != "hnsw":
+        index.remove_ids(ids)
+        return index
+    vectors, current = index_contents(index)
+    keep = ~np.isin(current, ids)
+    base = base_index(index)
+    config = merge_config({
+        "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        "hnsw": {"m": base.hnsw.nb_neighbors(1), "ef_construction": base.hnsw.efConstruction,
+                 "ef_search": base.hnsw.efSearch},
+    })
+    return _rebuild(index, "hnsw", config, vectors[keep], current[keep])
+
+
+def configure_search(index, config: Optional[dict] = None):
+    """Apply query-time parameters (HNSW efSearch, IVF nprobe) to a loaded index."""
+    config = merge_config(config)
+    base = base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = config["hnsw"]["ef_search"]
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(config["ivfpq"]["nprobe"], base.nlist)
+    return index
+
+
+def index_memory_bytes(index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,127 @@
+# benchmarks/bench_frame_extraction.py
+#
+# Frames/second of transcript-frame extraction: the previous seek-per-segment loop
+# (video.set(CAP_PROP_POS_MSEC) + read() + imwrite) against the single-pass grab()/retrieve()
+# extractor in frame_extractor.py, on a locally generated synthetic video and WebVTT file.
+# Also checks that both pick the same frames. Run from the VideoSearch_RAG directory:
+#
+#   python benchmarks/bench_frame_extraction.py
+#   python benchmarks/bench_frame_extraction.py --seconds 600 --width 1280 --height 720 --videos 4
+#
+# Sequential decoding pays for every frame, a seek for the frames since the last keyframe, so
+# the single pass wins when cues are closer together than about half the keyframe interval
+# (YouTube encodes use 2-5 s); --cue-seconds sweeps that.
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from frame_extractor import extract_and_save_frames_and_metadata, extract_videos, maintain_aspect_ratio_resize
+from transcript_windows import transcript_segments
+
+
+def make_video(path: Path, seconds: int, fps: int, width: int, height: int, rng: np.random.Generator):
+    """Moving gradient with a frame counter, so every frame differs."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    base = np.linspace(0, 255, width, dtype=np.uint8)[None, :, None].repeat(height, 0).repeat(3, 2)
+    for i in range(seconds * fps):
+        frame = np.roll(base, i * 4, axis=1)
+        cv2.putText(frame, str(i), (40, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 6)
+        writer.write(frame)
+    writer.release()
+
+
+def make_vtt(path: Path, seconds: int, cue_seconds: float):
+    def stamp(t):
+        return f"{int(t // 3600):02d}:{int(t % 3600 // 60):02d}:{t % 60:06.3f}"
+    lines, t, i = ["WEBVTT", ""], 0.0, 0
+    while t + cue_seconds <= seconds:
+        lines += [f"{stamp(t)} --> {stamp(t + cue_seconds)}", f"cue {i}", ""]
+        t, i = t + cue_seconds, i + 1
+    path.write_text("\n".join(lines))
+
+
+def legacy_extract(video_path, vtt_path, out_dir):
+    """The loop process_videos used before: one seek and a synchronous imwrite per segment."""
+    video = cv2.VideoCapture(str(video_path))
+    saved = 0
+    for idx, mid_time_ms, _ in transcript_segments(str(vtt_path), {"window_seconds": 0}):
+        video.set(cv2.CAP_PROP_POS_MSEC, mid_time_ms)
+        success, frame = video.read()
+        if success:
+            cv2.imwrite(os.path.join(out_dir, f"frame_{idx}.jpg"), maintain_aspect_ratio_resize(frame, height=350))
+            saved += 1
+    video.release()
+    return saved
+
+
+def same_frames(dir_a: Path, dir_b: Path, sample: int = 20) -> float:
+    names = sorted(p.name for p in dir_a.glob("*.jpg"))[:: max(1, len(list(dir_a.glob("*.jpg"))) // sample)]
+    diffs = [np.abs(cv2.imread(str(dir_a / n)).astype(int) - cv2.imread(str(dir_b / n)).astype(int)).mean()
+             for n in names if (dir_b / n).exists()]
+    return float(np.mean([d < 1.0 for d in diffs])) if diffs else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame extraction benchmark")
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--width", type=int, default=854)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--cue-seconds", type=float, nargs="+", default=[0.5, 2.0, 5.0], help="transcript cue lengths")
+    parser.add_argument("--videos", type=int, default=2, help="videos for the multi-process run")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="bench_frames_"))
+    try:
+        rng = np.random.default_rng(0)
+        video = work / "video.mp4"
+        start = time.perf_counter()
+        make_video(video, args.seconds, args.fps, args.width, args.height, rng)
+        print(f"synthetic video: {args.seconds}s {args.width}x{args.height} @ {args.fps} fps "
+              f"(generated in {time.perf_counter() - start:.1f}s), {os.cpu_count()} CPUs")
+        print(f"{'cue s':>6} {'extractor':>28} {'frames':>7} {'seconds':>8} {'frames/s':>9} {'same frames':>12}")
+
+        for cue_seconds in args.cue_seconds:
+            run = work / f"cues_{cue_seconds}"
+            legacy_dir, single_dir = run / "legacy", run / "single"
+            legacy_dir.mkdir(parents=True), single_dir.mkdir()
+            vtt = run / "video.vtt"
+            make_vtt(vtt, args.seconds, cue_seconds)
+
+            start = time.perf_counter()
+            saved = legacy_extract(video, vtt, legacy_dir)
+            elapsed = time.perf_counter() - start
+            print(f"{cue_seconds:>6} {'seek per segment':>28} {saved:>7} {elapsed:>8.2f} {saved / elapsed:>9.1f}")
+
+            start = time.perf_counter()
+            saved = len(extract_and_save_frames_and_metadata(str(video), str(vtt), str(single_dir), "video1"))
+            elapsed = time.perf_counter() - start
+            print(f"{cue_seconds:>6} {'single pass + encode pool':>28} {saved:>7} {elapsed:>8.2f} "
+                  f"{saved / elapsed:>9.1f} {same_frames(legacy_dir, single_dir):>12.0%}")
+
+            jobs = []
+            for i in range(args.videos):
+                out = run / f"multi{i}"
+                out.mkdir()
+                jobs.append((str(video), str(vtt), str(out), f"video{i + 1}"))
+            start = time.perf_counter()
+            saved = sum(len(m) for m in extract_videos(jobs))
+            elapsed = time.perf_counter() - start
+            print(f"{cue_seconds:>6} {f'{args.videos} videos, processes':>28} {saved:>7} {elapsed:>8.2f} {saved / elapsed:>9.1f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
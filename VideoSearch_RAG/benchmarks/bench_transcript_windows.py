@@ -0,0 +1,134 @@
+# benchmarks/bench_transcript_windows.py
+#
+# Per-cue segments (the previous process_videos behaviour) against transcript windows of
+# transcript_windows.py on a fixture lecture transcript with labelled answer spans
+# (fixtures/lecture.vtt, fixtures/lecture_queries.json). Reports index size, ingestion time and
+# retrieval quality. Run from the VideoSearch_RAG directory:
+#
+#   python benchmarks/bench_transcript_windows.py
+#   python benchmarks/bench_transcript_windows.py --windows 0/0 10/2 20/5 30/5 --ollama
+#
+# Offline, texts are embedded with a hashed bag of words, and ingestion time adds a simulated
+# embedding latency per request (--request-ms) and per text (--text-ms) to the measured time;
+# --ollama uses nomic-embed-text instead and reports the real time. A query is a hit when a
+# returned segment overlaps the labelled answer span, which favours long windows; "on target"
+# is stricter: the top result's frame time (where the agent opens the video) lies within
+# --tolerance seconds of the answer span.
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ann_index import prepare_vectors
+from transcript_windows import transcript_cues, window_cues
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+DIM = 768
+BATCH_SIZE = 32  # texts per /api/embed request (EmbeddingClient default)
+STOPWORDS = set("a an and are as at be by did do does for from how in is it its of on one or so that the "
+                "this to was were what when where which who why with".split())
+
+
+def hashed_embed(texts):
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in re.findall(r"\w+", text.lower()):
+            if token in STOPWORDS:
+                continue
+            digest = hashlib.blake2b(token.rstrip("s").encode(), digest_size=8).digest()
+            slot = int.from_bytes(digest[:4], "little")
+            vectors[row, slot % DIM] += 1.0 if digest[4] & 1 else -1.0
+    return vectors
+
+
+def segments_for(cues, window_seconds, overlap_seconds, max_words):
+    if not window_seconds:
+        return [{"start_ms": s, "end_ms": e, "mid_time_ms": (s + e) / 2, "text": t} for s, e, t in cues]
+    return window_cues(cues, window_seconds, overlap_seconds, max_words)
+
+
+def evaluate(segments, embed, queries, k, request_ms, text_ms, offline, tolerance):
+    start = time.perf_counter()
+    vectors = np.asarray(embed([s["text"] for s in segments]), dtype=np.float32)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(prepare_vectors(vectors, index))
+    seconds = time.perf_counter() - start
+    requests = math.ceil(len(segments) / BATCH_SIZE)
+    if offline:
+        seconds += (requests * request_ms + len(segments) * text_ms) / 1000
+
+    query_vecs = prepare_vectors(np.asarray(embed([q["query"] for q in queries]), dtype=np.float32), index)
+    _, I = index.search(query_vecs, k)
+    hits, top_hits, on_target, reciprocal = 0, 0, 0, 0.0
+    for q, row in zip(queries, I):
+        lo, hi = q["start_seconds"] * 1000, q["end_seconds"] * 1000
+        top = segments[row[0]]
+        on_target += lo - tolerance * 1000 <= top["mid_time_ms"] <= hi + tolerance * 1000
+        for rank, i in enumerate(row):
+            seg = segments[i]
+            if seg["start_ms"] < hi and seg["end_ms"] > lo:
+                hits += 1
+                top_hits += rank == 0
+                reciprocal += 1 / (rank + 1)
+                break
+    metadata_bytes = len(json.dumps([{"transcript": s["text"], "mid_time_ms": s["mid_time_ms"]} for s in segments]))
+    return {
+        "segments": len(segments),
+        "avg_words": np.mean([len(s["text"].split()) for s in segments]),
+        "index_kb": (vectors.nbytes + metadata_bytes) / 1024,
+        "requests": requests,
+        "ingest_ms": seconds * 1000,
+        "hit_1": top_hits / len(queries),
+        "hit_k": hits / len(queries),
+        "mrr": reciprocal / len(queries),
+        "on_target": on_target / len(queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--windows", nargs="+", default=["0/0", "10/2", "20/5", "30/5", "20/0"],
+                        help="window_seconds/overlap_seconds; 0/0 = one segment per cue")
+    parser.add_argument("--max-words", type=int, default=120)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=5, help="seconds around the answer span for on-target")
+    parser.add_argument("--request-ms", type=float, default=40, help="simulated latency per embed request")
+    parser.add_argument("--text-ms", type=float, default=8, help="simulated latency per embedded text")
+    parser.add_argument("--ollama", action="store_true", help="embed with nomic-embed-text via Ollama")
+    args = parser.parse_args()
+
+    fixture = json.loads((FIXTURES / "lecture_queries.json").read_text())
+    cues = transcript_cues(str(FIXTURES / fixture["transcript"]))
+    queries = fixture["queries"]
+    if args.ollama:
+        from embeddings import get_client
+        embed = get_client().embed_batch
+    else:
+        embed = hashed_embed
+    print(f"{len(cues)} cues, {len(queries)} queries, "
+          f"{'nomic-embed-text' if args.ollama else 'hashed bag-of-words embeddings'}\n")
+
+    print(f"{'window/overlap':<15} {'segments':>8} {'words':>6} {'index KB':>9} {'requests':>8} "
+          f"{'ingest ms':>10} {'hit@1':>6} {f'hit@{args.k}':>6} {'MRR':>6} {'on target':>9}")
+    for spec in args.windows:
+        window_seconds, overlap_seconds = (float(x) for x in spec.split("/"))
+        r = evaluate(segments_for(cues, window_seconds, overlap_seconds, args.max_words), embed, queries,
+                     args.k, args.request_ms, args.text_ms, offline=not args.ollama, tolerance=args.tolerance)
+        name = "per cue" if not window_seconds else f"{window_seconds:g}s/{overlap_seconds:g}s"
+        print(f"{name:<15} {r['segments']:>8} {r['avg_words']:>6.1f} {r['index_kb']:>9.1f} {r['requests']:>8} "
+              f"{r['ingest_ms']:>10.1f} {r['hit_1']:>6.2f} {r['hit_k']:>6.2f} {r['mrr']:>6.2f} {r['on_target']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# embeddings.py
+
+import sys
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / "cache" / "embeddings.sqlite"
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when embeddings cannot be produced; callers must not index a placeholder vector."""
+
+
+def _base_url(url: str) -> str:
+    """Accept either the server root or a full /api/embed(dings) endpoint URL."""
+    url = url.rstrip("/")
+    for suffix in ("/api/embeddings", "/api/embed"):
+        if url.endswith(suffix):
+            return url[: -len(suffix)]
+    return url
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store keyed by (model, sha256 of normalized text).
+    Vectors persist in SQLite so every server and memory manager in the project shares them;
+    an in-process LRU sits in front of the database.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, memory_items: int = 10_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_items = memory_items
+        self._lru: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+    def _remember(self, model: str, key: str, vector: np.ndarray):
+        self._lru[(model, key)] = vector
+        self._lru.move_to_end((model, key))
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            pending = []
+            for key in dict.fromkeys(keys):
+                vector = self._lru.get((model, key))
+                if vector is None:
+                    pending.append(key)
+                else:
+                    self._lru.move_to_end((model, key))
+                    found[key] = vector
+                    self.memory_hits += 1
+            for i in range(0, len(pending), 500):
+                batch = pending[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(model, key, vector)
+                    self.disk_hits += 1
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray], seconds: float = 0.0):
+        """Store freshly computed vectors; seconds is the time spent computing them."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vector) VALUES (?, ?, ?, ?)",
+                [(model, key, len(vector), np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in vectors.items()],
+            )
+            self._conn.commit()
+            for key, vector in vectors.items():
+                self._remember(model, key, vector)
+            self.misses += len(vectors)
+            self.miss_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                "entries": entries,
+                "memory_entries": len(self._lru),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_miss_ms": avg_miss * 1000,
+                "saved_seconds": hits * avg_miss,  # estimated from the average cost of a miss
+            }
+
+
+class EmbeddingClient:
+    """
+    Pooled, batching client for Ollama embeddings.
+    Texts are sent in batches through /api/embed with bounded concurrency and retried with
+    exponential backoff. Servers without /api/embed fall back to one /api/embeddings call per text.
+    The vector dimension is detected from the first response and enforced afterwards.
+    With a cache attached, only texts not already embedded for this model hit the server.
+    """
+
+    def __init__(
+        self,
+        url: str = OLLAMA_BASE_URL,
+        model: str = DEFAULT_EMBED_MODEL,
+        batch_size: int = 32,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30.0,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.base_url = _base_url(url)
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.dimension: Optional[int] = None
+        self._legacy_api = False
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path: str, payload: dict) -> dict:
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+                if response.status_code == 404 and path == "/api/embed":
+                    raise FileNotFoundError(path)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return response.json()
+                last_error = requests.HTTPError(f"{response.status_code} from {path}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            except requests.RequestException as e:
+                raise EmbeddingError(f"Embedding request failed: {e}") from e
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        raise EmbeddingError(f"Embedding request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def _check_dimension(self, vectors: np.ndarray) -> np.ndarray:
+        if vectors.ndim != 2 or vectors.shape[1] == 0:
+            raise EmbeddingError(f"Embedding server returned malformed vectors with shape {vectors.shape}")
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise EmbeddingError(f"Embedding dimension changed from {self.dimension} to {vectors.shape[1]}")
+        return vectors
+
+    def _embed_legacy(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = [self._post("/api/embeddings", {"model": self.model, "prompt": text})["embedding"] for text in texts]
+        return np.array(vectors, dtype=np.float32)
+
+    def _embed_chunk(self, texts: Sequence[str]) -> np.ndarray:
+        if not self._legacy_api:
+            try:
+                data = self._post("/api/embed", {"model": self.model, "input": list(texts)})
+                vectors = np.array(data.get("embeddings", []), dtype=np.float32)
+                if len(vectors) != len(texts):
+                    raise EmbeddingError(f"Expected {len(texts)} embeddings, got {len(vectors)}")
+                return self._check_dimension(vectors)
+            except FileNotFoundError:
+                sys.stderr.write("WARN: /api/embed not available, falling back to /api/embeddings\n")
+                self._legacy_api = True
+        return self._check_dimension(self._embed_legacy(texts))
+
+    def _embed_uncached(self, texts: Sequence[str]) -> np.ndarray:
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(chunks) == 1 or self.max_concurrency <= 1:
+            return np.vstack([self._embed_chunk(chunk) for chunk in chunks])
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chunks))) as pool:
+            return np.vstack(list(pool.map(self._embed_chunk, chunks)))
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts in order, returning a (len(texts), dimension) float32 array."""
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        keys = [self.cache.key(text) for text in texts]
+        found = self.cache.get_many(self.model, keys)
+        missing = {}  # key -> normalized text, deduplicated in order
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = normalize_text(text)
+        if missing:
+            start = time.perf_counter()
+            vectors = self._embed_uncached(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self.cache.put_many(self.model, computed, seconds=time.perf_counter() - start)
+            found.update(computed)
+        return self._check_dimension(np.vstack([found[key] for key in keys]))
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def close(self):
+        self.session.close()
+
+
+_default_clients = {}
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> EmbeddingCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = EmbeddingCache(DEFAULT_CACHE_PATH)
+    return _default_cache
+
+
+def get_client(url: str = OLLAMA_BASE_URL, model: str = DEFAULT_EMBED_MODEL) -> EmbeddingClient:
+    """Process-wide cached client per (server, model) so every caller shares one pool and one cache."""
+    key = (_base_url(url), model)
+    if key not in _default_clients:
+        _default_clients[key] = EmbeddingClient(url=url, model=model, cache=get_cache())
+    return _default_clients[key]
+
+
+def get_embedding(text: str, url: str = OLLAMA_BASE_URL, model: str = DEFAULT_EMBED_MODEL) -> np.ndarray:
+    return get_client(url, model).embed(text)
+
+
+def get_embeddings(texts: List[str], url: str = OLLAMA_BASE_URL, model: str = DEFAULT_EMBED_MODEL) -> np.ndarray:
+    return get_client(url, model).embed_batch(texts)
@@ -0,0 +1,55 @@
+# fingerprint.py
+
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+CHUNK_SIZE = 1 << 20  # bytes read per hash update, so memory use does not grow with file size
+HASH_PREFIX = "blake2b:"
+# A file modified within this window of being fingerprinted can change again without its
+# mtime moving (coarse filesystem timestamps), so its stat alone is not trusted next time.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def stat_signature(path: Union[str, Path]) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+
+def content_hash(path: Union[str, Path], chunk_size: int = CHUNK_SIZE,
+                 legacy_md5: bool = False) -> Tuple[str, Optional[str]]:
+    """
+    Streaming BLAKE2b of a file. With legacy_md5 the md5 of the same pass is returned too, so
+    caches written with the old md5 hashes can be matched without reading the file twice.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    md5 = hashlib.md5() if legacy_md5 else None
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+            if md5 is not None:
+                md5.update(block)
+    return HASH_PREFIX + digest.hexdigest(), md5.hexdigest() if md5 is not None else None
+
+
+def fingerprint(path: Union[str, Path], previous: Union[dict, str, None] = None,
+                chunk_size: int = CHUNK_SIZE) -> Tuple[dict, bool]:
+    """
+    Return (fingerprint, unchanged) for a file. previous is the stored fingerprint, a bare
+    md5 string from older caches, or None. When size, mtime and inode match the stored ones
+    the file is not read at all; otherwise it is hashed and compared by content, so a touched
+    but identical file is still unchanged and only needs its fingerprint refreshed.
+    """
+    current = stat_signature(path)
+    if isinstance(previous, str):
+        previous = {"hash": previous}
+    previous = previous or {}
+    stored = previous.get("hash")
+    if stored and all(previous.get(key) == value for key, value in current.items()) \
+            and current["mtime_ns"] < previous.get("checked_ns", 0) - RACY_WINDOW_NS:
+        return {**previous}, True
+
+    digest, md5 = content_hash(path, chunk_size, legacy_md5=bool(stored) and not stored.startswith(HASH_PREFIX))
+    return {"hash": digest, **current, "checked_ns": time.time_ns()}, stored is not None and stored in (digest, md5)
@@ -0,0 +1,175 @@
+# frame_extractor.py
+#
+# Frame extraction for process_videos: one sequential decode per video instead of a seek per
+# transcript segment. Kept free of the heavy imports in utils.py so worker processes start fast.
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+
+FRAME_HEIGHT = 350
+JPEG_QUALITY = 95  # cv2.imwrite default
+MAX_PENDING_FRAMES = 64  # decoded frames waiting for the encode pool, bounds memory use
+SEEK_GAP_MS = 10_000  # seek instead of decoding through gaps longer than this (long silences)
+
+
+# a help function that helps to convert a specific time written as a string in format `webvtt` into a time in miliseconds
+def str2time(strtime):
+    # strip character " if exists
+    strtime = strtime.strip('"')
+    # get hour, minute, second from time string
+    hrs, mins, seconds = [float(c) for c in strtime.split(':')]
+    # get the corresponding time as total seconds
+    total_seconds = hrs * 60**2 + mins * 60 + seconds
+    total_miliseconds = total_seconds * 1000
+    return total_miliseconds
+
+
+# Resizes a image and maintains aspect ratio
+def maintain_aspect_ratio_resize(image, width=None, height=None, inter=cv2.INTER_AREA):
+    # Grab the image size and initialize dimensions
+    dim = None
+    (h, w) = image.shape[:2]
+
+    # Return original image if no need to resize
+    if width is None and height is None:
+        return image
+
+    # We are resizing height if width is none
+    if width is None:
+        # Calculate the ratio of the height and construct the dimensions
+        r = height / float(h)
+        dim = (int(w * r), height)
+    # We are resizing width if height is none
+    else:
+        # Calculate the ratio of the width and construct the dimensions
+        r = width / float(w)
+        dim = (width, int(h * r))
+
+    # Return the resized image
+    return cv2.resize(image, dim, interpolation=inter)
+
+
+def _save_frame(frame, path: str, height: int):
+    image = maintain_aspect_ratio_resize(frame, height=height)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError(f"JPEG encoding failed for {path}")
+    with open(path, "wb") as f:
+        f.write(encoded.tobytes())
+
+
+def grab_frames_at(video: "cv2.VideoCapture", times_ms: Sequence[float], seek_gap_ms: float = SEEK_GAP_MS):
+    """
+    Decode the video once, front to back, and yield (position in times_ms, frame) for the frame
+    a seek to each requested time would return. Frames between targets are only grab()bed,
+    never converted, and a frame shared by several targets is retrieved once. Gaps longer than
+    seek_gap_ms are skipped with a seek, which is cheaper than decoding through them.
+    """
+    fps = video.get(cv2.CAP_PROP_FPS)
+    # OpenCV seeks to the frame nearest the requested time; match that when the rate is known
+    target_frames = [int(t * fps / 1000 + 0.5) for t in times_ms] if fps and fps > 0 else None
+    order = sorted(range(len(times_ms)), key=lambda i: times_ms[i])
+    frame_no, next_target = -1, 0
+    while next_target < len(order):
+        if target_frames is not None and \
+                (target_frames[order[next_target]] - frame_no) * 1000.0 / fps > seek_gap_ms:
+            video.set(cv2.CAP_PROP_POS_FRAMES, target_frames[order[next_target]])
+            frame_no = target_frames[order[next_target]] - 1
+        if not video.grab():
+            break
+        frame_no += 1
+        if target_frames is not None:
+            due = lambda i: target_frames[i] <= frame_no
+        else:
+            now_ms = video.get(cv2.CAP_PROP_POS_MSEC)  # timestamp of the frame just grabbed
+            due = lambda i: times_ms[i] <= now_ms
+        if not due(order[next_target]):
+            continue
+        success, frame = video.retrieve()
+        while next_target < len(order) and due(order[next_target]):
+            if success:
+                yield order[next_target], frame
+            next_target += 1
+
+
+def extract_and_save_frames_and_metadata(
+        path_to_video,
+        path_to_transcript,
+        path_to_save_extracted_frames,
+        video_id,
+        height: int = FRAME_HEIGHT,
+        workers: Optional[int] = None,
+        segments: Optional[List[Tuple[int, float, str]]] = None):
+    """
+    Frames at the middle of every transcript segment, saved as frame_<idx>.jpg, with the same
+    metadata entries as before. Resize and JPEG encoding run on a thread pool (OpenCV releases
+    the GIL) while the main thread keeps decoding. segments defaults to one per WebVTT cue;
+    pass transcript_windows.transcript_segments() to extract one frame per window instead.
+    """
+    if segments is None:
+        # imported here: transcript_windows imports str2time from this module
+        from transcript_windows import transcript_segments
+        segments = transcript_segments(path_to_transcript, {"window_seconds": 0})
+    video = cv2.VideoCapture(path_to_video)
+    extracted = {}
+    pending = threading.BoundedSemaphore(MAX_PENDING_FRAMES)
+    workers = workers or min(4, os.cpu_count() or 1)
+
+    def save(frame, path):
+        try:
+            _save_frame(frame, path, height)
+        finally:
+            pending.release()
+
+    futures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for pos, frame in grab_frames_at(video, [mid for _, mid, _ in segments]):
+                idx = segments[pos][0]
+                img_fpath = os.path.join(path_to_save_extracted_frames, f'frame_{idx}.jpg')
+                pending.acquire()
+                futures[pos] = pool.submit(save, frame, img_fpath)
+                extracted[pos] = img_fpath
+    finally:
+        video.release()
+
+    # metadatas will store the metadata of all extracted frames, in transcript order
+    metadatas = []
+    for pos, (idx, mid_time_ms, text) in enumerate(segments):
+        if pos not in futures or futures[pos].exception() is not None:
+            print(f"ERROR! Cannot extract frame: idx = {idx}")
+            continue
+        metadatas.append({
+            'extracted_frame_path': extracted[pos],
+            'transcript': text,
+            'video_segment_id': idx,
+            'video_path': path_to_video,
+            'mid_time_ms': mid_time_ms,
+            'video_id': video_id
+        })
+    return metadatas
+
+
+def _extract_job(job):
+    return extract_and_save_frames_and_metadata(*job)
+
+
+def extract_videos(jobs: Sequence[tuple], processes: Optional[int] = None,
+                   segments: Optional[Sequence[list]] = None) -> List[list]:
+    """
+    Run extract_and_save_frames_and_metadata for several videos in parallel processes.
+    jobs are (video path, transcript path, frame dir, video_id) tuples; results keep their order.
+    segments, if given, holds the precomputed transcript segments of each job.
+    """
+    segments = segments if segments is not None else [None] * len(jobs)
+    processes = min(len(jobs), processes or os.cpu_count() or 1)
+    if processes <= 1:
+        return [_extract_job((*job, FRAME_HEIGHT, None, segs)) for job, segs in zip(jobs, segments)]
+    # Each process already runs its own encode threads, so split the cores between them
+    threads = max(1, (os.cpu_count() or 1) // processes)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_extract_job, [(*job, FRAME_HEIGHT, threads, segs) for job, segs in zip(jobs, segments)]))
@@ -0,0 +1,199 @@
+# frame_table.py
+
+import json
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from ann_index import configure_search, index_kind, merge_config, prepare_vectors
+from transcript_windows import multimodal_query
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def flatten_metadata(metadata: list) -> List[dict]:
+    """
+    Frame metadata in FAISS row order. mcp_rag.process_videos() appends one list per video and
+    process_videos.py extends a flat list; both add vectors in the same order as the entries.
+    """
+    flat = []
+    for entry in metadata:
+        if isinstance(entry, list):
+            flat.extend(entry)
+        else:
+            flat.append(entry)
+    return flat
+
+
+class FrameTable:
+    """
+    Column-wise frame metadata indexed by FAISS row id. Transcripts and frame paths are stored
+    as one string each with prefix-sum offsets, and each video's rows are kept as (start, end)
+    runs, so lookups by row, by (video_id, segment) and by time window need no scan.
+    """
+
+    def __init__(self, metadata: list):
+        frames = flatten_metadata(metadata)
+        self.video_ids: List[str] = []
+        video_index: Dict[str, int] = {}
+        self.video = np.empty(len(frames), dtype=np.int32)
+        self.segment = np.empty(len(frames), dtype=np.int32)
+        self.mid_time_ms = np.empty(len(frames), dtype=np.float64)
+        self.video_paths: List[str] = []
+        self._video_path_index = np.empty(len(frames), dtype=np.int32)
+        self._runs: Dict[str, List[Tuple[int, int]]] = {}
+        self._by_segment: Dict[Tuple[str, int], int] = {}
+
+        transcripts, frame_paths = [], []
+        for row, frame in enumerate(frames):
+            video_id = frame["video_id"]
+            if video_id not in video_index:
+                video_index[video_id] = len(self.video_ids)
+                self.video_ids.append(video_id)
+            self.video[row] = video_index[video_id]
+            self.segment[row] = frame["video_segment_id"]
+            self.mid_time_ms[row] = frame["mid_time_ms"]
+            if not self.video_paths or self.video_paths[-1] != frame["video_path"]:
+                self.video_paths.append(frame["video_path"])
+            self._video_path_index[row] = len(self.video_paths) - 1
+            transcripts.append(frame["transcript"])
+            frame_paths.append(frame["extracted_frame_path"])
+
+            runs = self._runs.setdefault(video_id, [])
+            if runs and runs[-1][1] == row:
+                runs[-1] = (runs[-1][0], row + 1)
+            else:
+                runs.append((row, row + 1))
+            self._by_segment[(video_id, int(frame["video_segment_id"]))] = row  # latest processing wins
+
+        self._transcripts, self.transcript_offsets = self._pack(transcripts)
+        self._frame_paths, self.frame_path_offsets = self._pack(frame_paths)
+
+    @staticmethod
+    def _pack(strings: List[str]) -> Tuple[str, np.ndarray]:
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+        return "".join(strings), offsets
+
+    @classmethod
+    def from_file(cls, path: Path) -> "FrameTable":
+        path = Path(path)
+        return cls(json.loads(path.read_text()) if path.exists() else [])
+
+    def __len__(self) -> int:
+        return len(self.segment)
+
+    def transcript(self, row: int) -> str:
+        return self._transcripts[self.transcript_offsets[row]:self.transcript_offsets[row + 1]]
+
+    def frame_path(self, row: int) -> str:
+        return self._frame_paths[self.frame_path_offsets[row]:self.frame_path_offsets[row + 1]]
+
+    def row(self, row: int) -> dict:
+        """The original metadata entry of a FAISS row."""
+        return {
+            "extracted_frame_path": self.frame_path(row),
+            "transcript": self.transcript(row),
+            "video_segment_id": int(self.segment[row]),
+            "video_path": self.video_paths[self._video_path_index[row]],
+            "mid_time_ms": float(self.mid_time_ms[row]),
+            "video_id": self.video_ids[self.video[row]],
+        }
+
+    def find(self, video_id: str, segment_id: int) -> Optional[int]:
+        """Row of a video's transcript segment (the frame_<segment_id>.jpg of that video)."""
+        return self._by_segment.get((video_id, int(segment_id)))
+
+    def select(self, video_id: Optional[str] = None, start_ms: Optional[float] = None,
+               end_ms: Optional[float] = None) -> Optional[np.ndarray]:
+        """Rows of one video and/or a time window; None when nothing is filtered."""
+        if video_id is None and start_ms is None and end_ms is None:
+            return None
+        if video_id is not None:
+            runs = self._runs.get(video_id, [])
+            rows = np.concatenate([np.arange(start, end) for start, end in runs]) if runs else \
+                np.zeros(0, dtype=np.int64)
+        else:
+            rows = np.arange(len(self), dtype=np.int64)
+        times = self.mid_time_ms[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start_ms is not None:
+            keep &= times >= start_ms
+        if end_ms is not None:
+            keep &= times <= end_ms
+        return rows[keep].astype(np.int64)
+
+
+def _search_params(index, selector, config: dict):
+    kind = index_kind(index)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=config["hnsw"]["ef_search"])
+    if kind == "ivfpq":
+        return faiss.SearchParametersIVF(sel=selector, nprobe=config["ivfpq"]["nprobe"])
+    return faiss.SearchParameters(sel=selector)
+
+
+class ResidentVideoIndex:
+    """
+    FAISS index and FrameTable held in process memory and reloaded only when index.bin or
+    metadata.json change on disk. Video and time-window filters are applied inside the FAISS
+    search with an IDSelector, so a filtered query still returns its top k.
+    """
+
+    def __init__(self, index_dir: Path, config: Optional[dict] = None):
+        self.index_path = Path(index_dir) / "index.bin"
+        self.metadata_path = Path(index_dir) / "metadata.json"
+        self.config = merge_config(config)
+        self.index = None
+        self.table: Optional[FrameTable] = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _disk_signature(self):
+        try:
+            index_stat, metadata_stat = self.index_path.stat(), self.metadata_path.stat()
+        except FileNotFoundError:
+            return None
+        return index_stat.st_mtime_ns, index_stat.st_size, metadata_stat.st_mtime_ns, metadata_stat.st_size
+
+    def load(self) -> bool:
+        """Return True if an index is resident, reloading it first when it changed on disk."""
+        signature = self._disk_signature()
+        if signature is None:
+            return self.index is not None
+        with self._lock:
+            if signature != self._signature:
+                index = configure_search(faiss.read_index(str(self.index_path)), self.config)
+                table = FrameTable.from_file(self.metadata_path)
+                if index.ntotal != len(table):
+                    _log("WARN", f"FAISS index has {index.ntotal} vectors but metadata has {len(table)} frames")
+                self.index, self.table, self._signature = index, table, signature
+                _log("INFO", f"Loaded video index: {index.ntotal} vectors, {len(table.video_ids)} videos")
+        return True
+
+    def search(self, query_vec: np.ndarray, k: int, video_id: Optional[str] = None,
+               start_ms: Optional[float] = None, end_ms: Optional[float] = None) -> List[dict]:
+        if not self.load() or self.index.ntotal == 0:
+            return []
+        index, table = self.index, self.table
+        rows = table.select(video_id, start_ms, end_ms)
+        # Indexes built with frame-caption vectors are twice the text dimension
+        query = prepare_vectors(multimodal_query(query_vec, index.d), index, self.config)
+        if rows is None:
+            D, I = index.search(query, k)
+        elif len(rows) == 0:
+            return []
+        else:
+            if rows[-1] - rows[0] + 1 == len(rows):
+                selector = faiss.IDSelectorRange(int(rows[0]), int(rows[-1]) + 1)
+            else:
+                selector = faiss.IDSelectorBatch(rows)
+            D, I = index.search(query, k, params=_search_params(index, selector, self.config))
+        return [table.row(int(i)) for i in I[0] if 0 <= i < len(table)]
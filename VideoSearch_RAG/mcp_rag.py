@@ -18,18 +18,28 @@ import webvtt
 from models import AddInput, AddOutput, SqrtInput, SqrtOutput, StringsToIntsInput, StringsToIntsOutput, ExpSumInput, ExpSumOutput
 from PIL import Image as PILImage
 from tqdm import tqdm
-import hashlib
-from utils import download_video, get_transcript_vtt, str2time, maintain_aspect_ratio_resize
+from utils import download_video, get_transcript_vtt
+from frame_extractor import extract_videos
+from transcript_windows import load_window_config, transcript_segments, window_vectors
+from fingerprint import fingerprint
+from embeddings import get_client
+from ann_index import load_index_config, new_index, prepare_vectors, maybe_promote, conform_metric
+from frame_table import ResidentVideoIndex
+from typing import Optional
 # from process_videos import process_videos
 
 
 mcp = FastMCP("Calculator")
 
-EMBED_URL = "http://localhost:11434/api/embeddings"
+EMBED_URL = "http://localhost:11434/api/embed"
 EMBED_MODEL = "nomic-embed-text"
 CHUNK_SIZE = 256
 CHUNK_OVERLAP = 40
 ROOT = Path(__file__).parent.resolve()
+EMBEDDER = get_client(EMBED_URL, EMBED_MODEL)  # shares the project-wide embedding cache
+INDEX_CONFIG = load_index_config(ROOT / "config" / "profiles.yaml")  # flat / hnsw / ivfpq
+WINDOW_CONFIG = load_window_config(ROOT / "config" / "profiles.yaml")  # transcript windows per segment
+VIDEO_INDEX = ResidentVideoIndex(ROOT / "faiss_index", INDEX_CONFIG)  # reloaded only when the files change
 
 
 # List of video URLs to process
@@ -41,9 +51,7 @@ video_urls = [
 ]
 
 def get_embedding(text: str) -> np.ndarray:
-    response = requests.post(EMBED_URL, json={"model": EMBED_MODEL, "prompt": text})
-    response.raise_for_status()
-    return np.array(response.json()["embedding"], dtype=np.float32)
+    return EMBEDDER.embed(text)
 
 def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
     words = text.split()
@@ -74,43 +82,33 @@ def mcp_log(level: str, message: str) -> None:
 #         return [f"ERROR: Failed to search: {str(e)}"]
 
 @mcp.tool()
-def search_videos(query: str) -> list[str]:
-    """Search for factual content from processed videos."""
+def search_videos(query: str, video_id: Optional[str] = None, start_seconds: Optional[float] = None,
+                  end_seconds: Optional[float] = None) -> list[str]:
+    """Search for factual content from processed videos. Optionally restrict to one video (e.g. video_id="video1") and/or a time window in seconds."""
     mcp_log("SEARCH", f"Video Query: {query}")
     try:
-        # Load the FAISS index and metadata
-        index = faiss.read_index(str(ROOT / "faiss_index" / "index.bin"))
-        all_metadata = json.loads((ROOT / "faiss_index" / "metadata.json").read_text())
-        
-        # Get embedding for the query
-        query_vec = get_embedding(query).reshape(1, -1)
-        
-        # Search the index
-        D, I = index.search(query_vec, k=5)
-        
-        # Process results
         results = []
-        for idx in I[0]:
-            # Since all_metadata is a list of video metadata lists, we need to find the correct video and frame
-            video_idx = 0
-            frame_idx = idx
-            while video_idx < len(all_metadata) and frame_idx >= len(all_metadata[video_idx]):
-                frame_idx -= len(all_metadata[video_idx])
-                video_idx += 1
-            
-            if video_idx < len(all_metadata) and frame_idx < len(all_metadata[video_idx]):
-                frame_data = all_metadata[video_idx][frame_idx]
-                results.append(
-                    f"Transcript: {frame_data['transcript']}\n"
-                    f"Video: {frame_data['video_id']}\n"
-                    f"Time: {frame_data['mid_time_ms']/1000:.2f}s\n"
-                    f"Frame: {frame_data['extracted_frame_path']}"
-                )
+        for frame_data in VIDEO_INDEX.search(
+            get_embedding(query), k=5, video_id=video_id,
+            start_ms=start_seconds * 1000 if start_seconds is not None else None,
+            end_ms=end_seconds * 1000 if end_seconds is not None else None,
+        ):
+            results.append(
+                f"Transcript: {frame_data['transcript']}\n"
+                f"Video: {frame_data['video_id']}\n"
+                f"Time: {frame_data['mid_time_ms']/1000:.2f}s\n"
+                f"Frame: {frame_data['extracted_frame_path']}"
+            )
         
         return results if results else ["No matching video segments found."]
     except Exception as e:
         return [f"ERROR: Failed to search videos: {str(e)}"]
 
+@mcp.tool()
+def embedding_cache_stats() -> dict:
+    """Report embedding cache hit rate and estimated saved latency"""
+    return EMBEDDER.cache.stats()
+
 @mcp.tool()
 def add(input: AddInput) -> AddOutput:
     print("CALLED: add(AddInput) -> AddOutput")
@@ -276,45 +274,53 @@ def process_documents():
     METADATA_FILE = INDEX_CACHE / "metadata.json"
     CACHE_FILE = INDEX_CACHE / "doc_index_cache.json"
 
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
+    # The cache maps file name -> fingerprint; only files whose size, mtime or inode changed are read
     CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-    all_embeddings = []
-    converter = MarkItDown()
-
+    changed, refreshed = [], False
     for file in DOC_PATH.glob("*.*"):
-        fhash = file_hash(file)
-        if file.name in CACHE_META and CACHE_META[file.name] == fhash:
+        fp, unchanged = fingerprint(file, CACHE_META.get(file.name))
+        if unchanged:
+            refreshed |= CACHE_META.get(file.name) != fp
+            CACHE_META[file.name] = fp
             mcp_log("SKIP", f"Skipping unchanged file: {file.name}")
             continue
+        changed.append((file, fp))
+
+    if not changed:
+        if refreshed:
+            CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
+        mcp_log("WARN", "No new documents or updates to process.")
+        return
+
+    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
+    index = conform_metric(faiss.read_index(str(INDEX_FILE)), INDEX_CONFIG) if INDEX_FILE.exists() else None
+    all_embeddings = []
+    converter = MarkItDown()
 
+    for file, fp in changed:
         mcp_log("PROC", f"Processing: {file.name}")
         try:
             result = converter.convert(str(file))
             markdown = result.text_content
             chunks = list(chunk_text(markdown))
-            embeddings_for_file = []
+            embeddings_for_file = list(EMBEDDER.embed_batch(chunks))
             new_metadata = []
-            for i, chunk in enumerate(tqdm(chunks, desc=f"Embedding {file.name}")):
-                embedding = get_embedding(chunk)
-                embeddings_for_file.append(embedding)
+            for i, chunk in enumerate(chunks):
                 new_metadata.append({"doc": file.name, "chunk": chunk, "chunk_id": f"{file.stem}_{i}"})
             if embeddings_for_file:
                 if index is None:
                     dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
+                    index = new_index(dim, INDEX_CONFIG, with_ids=False)
+                index.add(prepare_vectors(np.stack(embeddings_for_file), index, INDEX_CONFIG))
                 metadata.extend(new_metadata)
-            CACHE_META[file.name] = fhash
+            CACHE_META[file.name] = fp
         except Exception as e:
             mcp_log("ERROR", f"Failed to process {file.name}: {e}")
 
     CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
     METADATA_FILE.write_text(json.dumps(metadata, indent=2))
     if index and index.ntotal > 0:
+        index = maybe_promote(index, INDEX_CONFIG)
         faiss.write_index(index, str(INDEX_FILE))
         mcp_log("SUCCESS", "Saved FAISS index and metadata")
     else:
@@ -343,71 +349,11 @@ def process_videos():
     METADATA_FILE = INDEX_CACHE / "metadata.json"
     CACHE_FILE = INDEX_CACHE / "video_index_cache.json"
 
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
     # all_metadata = []
     CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    all_metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-    all_embeddings = []
-
-    def extract_and_save_frames_and_metadata(
-            path_to_video, 
-            path_to_transcript, 
-            path_to_save_extracted_frames,
-            video_id):
-        
-        # metadatas will store the metadata of all extracted frames
-        metadatas = []
 
-        # load video using cv2
-        video = cv2.VideoCapture(path_to_video)
-        # load transcript using webvtt
-        trans = webvtt.read(path_to_transcript)
-        
-        # iterate transcript file
-        # for each video segment specified in the transcript file
-        for idx, transcript in enumerate(trans):
-            # get the start time and end time in seconds
-            start_time_ms = str2time(transcript.start)
-            end_time_ms = str2time(transcript.end)
-            # get the time in ms exactly 
-            # in the middle of start time and end time
-            mid_time_ms = (end_time_ms + start_time_ms) / 2
-            # get the transcript, remove the next-line symbol
-            text = transcript.text.replace("\n", ' ')
-            # get frame at the middle time
-            video.set(cv2.CAP_PROP_POS_MSEC, mid_time_ms)
-            success, frame = video.read()
-            if success:
-                # if the frame is extracted successfully, resize it
-                image = maintain_aspect_ratio_resize(frame, height=350)
-                # save frame as JPEG file
-                img_fname = f'frame_{idx}.jpg'
-                img_fpath = os.path.join(
-                    path_to_save_extracted_frames, img_fname
-                )
-                cv2.imwrite(img_fpath, image)
-
-                # prepare the metadata
-                frame_metadata = {
-                    'extracted_frame_path': img_fpath,
-                    'transcript': text,
-                    'video_segment_id': idx,
-                    'video_path': path_to_video,
-                    'mid_time_ms': mid_time_ms,
-                    'video_id': video_id
-                }
-                metadatas.append(frame_metadata)
-
-            else:
-                print(f"ERROR! Cannot extract frame: idx = {idx}")
-
-        return metadatas
-
-
-    # Process each video
+    # Download new or changed videos first; frames are then extracted for all of them in parallel
+    pending, refreshed = [], False
     for video_idx, video_url in enumerate(video_urls):
         video_id = f"video{video_idx + 1}"
         video_dir = VIDEO_PATH / video_id
@@ -418,9 +364,11 @@ def process_videos():
             # Download video
             video_filepath = download_video(video_url, str(video_dir))
             
-            # Check if video has been processed
-            fhash = file_hash(video_filepath)
-            if video_filepath in CACHE_META and CACHE_META[video_filepath] == fhash:
+            # Check if video has been processed (the file is only hashed when its stat changed)
+            fp, unchanged = fingerprint(video_filepath, CACHE_META.get(video_filepath))
+            if unchanged:
+                refreshed |= CACHE_META.get(video_filepath) != fp
+                CACHE_META[video_filepath] = fp
                 print(f"Skipping unchanged file: {video_filepath}")
                 continue
             
@@ -430,29 +378,46 @@ def process_videos():
             # Create directory for extracted frames
             extracted_frames_path = video_dir / 'extracted_frame'
             extracted_frames_path.mkdir(parents=True, exist_ok=True)
-            
-            # Extract frames and metadata
-            video_metadatas = extract_and_save_frames_and_metadata(
-                video_filepath,
-                transcript_filepath,
-                str(extracted_frames_path),
-                video_id
-            )
-            
+            pending.append((video_url, video_filepath, fp,
+                            (video_filepath, transcript_filepath, str(extracted_frames_path), video_id)))
+        except Exception as e:
+            print(f"Failed to process {video_url}: {e}")
+
+    if not pending:
+        if refreshed:
+            CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
+        print("No new videos or updates to process.")
+        return
+
+    all_metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
+    index = conform_metric(faiss.read_index(str(INDEX_FILE)), INDEX_CONFIG) if INDEX_FILE.exists() else None
+    all_embeddings = []
+
+    # Extract one frame per transcript window and its metadata, one process per video
+    try:
+        jobs = [job for *_, job in pending]
+        extracted = extract_videos(jobs, segments=[transcript_segments(job[1], WINDOW_CONFIG) for job in jobs])
+    except Exception as e:
+        print(f"Failed to extract frames: {e}")
+        extracted = []
+
+    for (video_url, video_filepath, fp, _), video_metadatas in zip(pending, extracted):
+        try:
             # Get embeddings for each frame's transcript
-            embeddings_for_file = []
-            for frame_metadata in tqdm(video_metadatas, desc=f"Embedding {video_url}"):
-                embedding = get_embedding(frame_metadata['transcript'])
-                embeddings_for_file.append(embedding)
+            print(f"Embedding {len(video_metadatas)} transcript segments of {video_url}")
+            embeddings_for_file = list(window_vectors(video_metadatas, EMBEDDER.embed_batch, WINDOW_CONFIG))
             
             if embeddings_for_file:
+                if index is not None and index.d != len(embeddings_for_file[0]):
+                    raise ValueError(f"index has dimension {index.d} but new vectors have {len(embeddings_for_file[0])}; "
+                                     f"remove faiss_index/ to rebuild after changing caption_frames")
                 if index is None:
                     dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
+                    index = new_index(dim, INDEX_CONFIG, with_ids=False)
+                index.add(prepare_vectors(np.stack(embeddings_for_file), index, INDEX_CONFIG))
                 print(f"all_metadata = {all_metadata}")
                 all_metadata.append(video_metadatas)
-                CACHE_META[video_filepath] = fhash
+                CACHE_META[video_filepath] = fp
                 
         except Exception as e:
             print(f"Failed to process {video_url}: {e}")
@@ -461,6 +426,7 @@ def process_videos():
     CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
     METADATA_FILE.write_text(json.dumps(all_metadata, indent=2))
     if index and index.ntotal > 0:
+        index = maybe_promote(index, INDEX_CONFIG)
         faiss.write_index(index, str(INDEX_FILE))
         print("Saved FAISS index and metadata")
     else:
@@ -1,12 +1,30 @@
 # memory.py
 
+import math
 import numpy as np
 import faiss
-import requests
-from typing import List, Optional, Literal
+from embeddings import get_client
+from pathlib import Path
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel
 from datetime import datetime
 
+# Settings under `memory:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_MEMORY_CONFIG = {
+    "prefilter_max": 4096,         # filters matching at most this many items ...
+    "prefilter_selectivity": 0.2,  # ... and this share of all items search only those (IDSelectorBatch)
+    "overfetch": 2,                # broader filters fetch top_k * overfetch / share neighbours, then adapt
+}
+
+
+def load_memory_config(profile_path: Path) -> dict:
+    """Read the `memory:` section of a profiles.yaml, if there is one."""
+    config = {}
+    if Path(profile_path).exists():
+        import yaml
+        config = (yaml.safe_load(Path(profile_path).read_text()) or {}).get("memory", {}) or {}
+    return {**DEFAULT_MEMORY_CONFIG, **config}
+
 
 class MemoryItem(BaseModel):
     text: str
@@ -19,24 +37,38 @@ class MemoryItem(BaseModel):
 
 
 class MemoryManager:
-    def __init__(self, embedding_model_url="http://localhost:11434/api/embeddings", model_name="nomic-embed-text"):
+    """
+    Items and their vectors in one FAISS index, with per-session, per-type and per-tag lists of
+    index positions so filtered retrieval knows which items match before searching.
+    """
+
+    def __init__(self, embedding_model_url="http://localhost:11434/api/embeddings", model_name="nomic-embed-text",
+                 config: Optional[dict] = None):
         self.embedding_model_url = embedding_model_url
         self.model_name = model_name
+        self.embedder = get_client(embedding_model_url, model_name)  # shared pooled client
+        self.config = {**DEFAULT_MEMORY_CONFIG, **(config or {})}
         self.index = None
         self.data: List[MemoryItem] = []
         self.embeddings: List[np.ndarray] = []
+        self.by_session: Dict[Optional[str], List[int]] = {}
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_tag: Dict[str, List[int]] = {}
+        self.filtered = {"prefiltered": 0, "postfiltered": 0, "rounds": 0, "short": 0, "selectivity": 0.0}
+
+    def _register(self, item: MemoryItem, position: int):
+        self.by_session.setdefault(item.session_id, []).append(position)
+        self.by_type.setdefault(item.type, []).append(position)
+        for tag in set(item.tags):
+            self.by_tag.setdefault(tag, []).append(position)
 
     def _get_embedding(self, text: str) -> np.ndarray:
-        response = requests.post(
-            self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text}
-        )
-        response.raise_for_status()
-        return np.array(response.json()["embedding"], dtype=np.float32)
+        return self.embedder.embed(text)
 
     def add(self, item: MemoryItem):
         emb = self._get_embedding(item.text)
         self.embeddings.append(emb)
+        self._register(item, len(self.data))
         self.data.append(item)
 
         # Initialize or add to index
@@ -56,32 +88,82 @@ class MemoryManager:
             return []
 
         query_vec = self._get_embedding(query).reshape(1, -1)
-        D, I = self.index.search(query_vec, top_k * 2)  # Overfetch to allow filtering
-
-        results = []
-        for idx in I[0]:
-            if idx >= len(self.data):
-                continue
-            item = self.data[idx]
-
-            # Filter by type
-            if type_filter and item.type != type_filter:
-                continue
-
-            # Filter by tags
-            if tag_filter and not any(tag in item.tags for tag in tag_filter):
-                continue
-
-            # Filter by session
-            if session_filter and item.session_id != session_filter:
-                continue
-
-            results.append(item)
-            if len(results) >= top_k:
-                break
-
-        return results
+        if not (type_filter or tag_filter or session_filter):
+            D, I = self.index.search(query_vec, top_k)
+            return [self.data[idx] for idx in I[0] if 0 <= idx < len(self.data)]
+        return [self.data[idx] for idx in self._filtered_search(query_vec, top_k, type_filter, tag_filter, session_filter)]
+
+    def _matching(self, type_filter, tag_filter, session_filter) -> List[int]:
+        """Sorted positions of the items passing every filter (tags: any of them)."""
+        lists = []
+        if session_filter:
+            lists.append(self.by_session.get(session_filter, []))
+        if type_filter:
+            lists.append(self.by_type.get(type_filter, []))
+        if tag_filter:
+            tagged = set()
+            for tag in tag_filter:
+                tagged.update(self.by_tag.get(tag, []))
+            lists.append(sorted(tagged))
+        lists.sort(key=len)
+        others = [set(positions) for positions in lists[1:]]
+        return [p for p in lists[0] if all(p in s for s in others)]
+
+    def _filtered_search(self, query_vec, top_k, type_filter, tag_filter, session_filter) -> List[int]:
+        """
+        A selective filter searches exactly the matching items (IDSelectorBatch); a broad one
+        searches everything for top_k * overfetch / (share of matching items) neighbours and,
+        while fewer than top_k match, again for more. top_k items come back whenever top_k match.
+        """
+        allowed = self._matching(type_filter, tag_filter, session_filter)
+        total = self.index.ntotal
+        selectivity = len(allowed) / total
+        if not allowed:
+            found, rounds, prefiltered = [], 0, True
+        elif len(allowed) <= self.config["prefilter_max"] and selectivity <= self.config["prefilter_selectivity"]:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.asarray(allowed, dtype=np.int64)))
+            D, I = self.index.search(query_vec, top_k, params=params)
+            found, rounds, prefiltered = [int(idx) for idx in I[0] if idx >= 0], 1, True
+        else:
+            allowed_set = set(allowed)
+            fetch, rounds, prefiltered = min(math.ceil(top_k * self.config["overfetch"] / selectivity), total), 0, False
+            while True:
+                rounds += 1
+                D, I = self.index.search(query_vec, fetch)
+                candidates = [int(idx) for idx in I[0] if idx >= 0]
+                passed = [idx for idx in candidates if idx in allowed_set]
+                found = passed[:top_k]
+                if len(found) >= top_k or fetch >= total:
+                    break
+                fetch = min(total, max(fetch * 2, math.ceil(fetch * top_k / max(len(passed), 1) * 1.5)))
+        self.filtered["prefiltered" if prefiltered else "postfiltered"] += 1
+        self.filtered["rounds"] += rounds
+        self.filtered["selectivity"] += selectivity
+        self.filtered["short"] += len(found) < min(top_k, len(allowed))
+        return found
+
+    def stats(self) -> dict:
+        filtered = self.filtered["prefiltered"] + self.filtered["postfiltered"]
+        return {
+            "items": len(self.data),
+            "sessions": len(self.by_session),
+            "filtered_searches": filtered,
+            "prefiltered": self.filtered["prefiltered"],
+            "postfiltered": self.filtered["postfiltered"],
+            "avg_filter_rounds": self.filtered["rounds"] / filtered if filtered else 0.0,
+            "avg_selectivity": self.filtered["selectivity"] / filtered if filtered else 0.0,  # share of items passing
+            "short_results": self.filtered["short"],  # fewer than top_k although more items matched
+        }
 
     def bulk_add(self, items: List[MemoryItem]):
-        for item in items:
-            self.add(item)
+        if not items:
+            return
+        embeddings = self.embedder.embed_batch([item.text for item in items])
+        self.embeddings.extend(embeddings)
+        for position, item in enumerate(items, start=len(self.data)):
+            self._register(item, position)
+        self.data.extend(items)
+
+        if self.index is None:
+            self.index = faiss.IndexFlatL2(embeddings.shape[1])
+        self.index.add(embeddings)
@@ -1,7 +1,6 @@
 import os
 from pathlib import Path
 import json
-import hashlib
 import faiss
 import numpy as np
 from tqdm import tqdm
@@ -9,11 +8,16 @@ import cv2
 import webvtt
 from utils import (
     download_video, 
-    get_transcript_vtt, 
-    str2time, 
-    maintain_aspect_ratio_resize,
-    get_embedding
+    get_transcript_vtt
 )
+from frame_extractor import extract_videos
+from transcript_windows import load_window_config, transcript_segments, window_vectors
+from fingerprint import fingerprint
+from embeddings import get_embeddings
+from ann_index import load_index_config, new_index, prepare_vectors, maybe_promote, conform_metric
+
+INDEX_CONFIG = load_index_config(Path(__file__).parent.resolve() / "config" / "profiles.yaml")
+WINDOW_CONFIG = load_window_config(Path(__file__).parent.resolve() / "config" / "profiles.yaml")
 
 def process_videos():
     """Process videos and create FAISS index"""
@@ -26,67 +30,7 @@ def process_videos():
     METADATA_FILE = INDEX_CACHE / "metadata.json"
     CACHE_FILE = INDEX_CACHE / "video_index_cache.json"
 
-    def file_hash(path):
-        return hashlib.md5(Path(path).read_bytes()).hexdigest()
-
     CACHE_META = json.loads(CACHE_FILE.read_text()) if CACHE_FILE.exists() else {}
-    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
-    index = faiss.read_index(str(INDEX_FILE)) if INDEX_FILE.exists() else None
-    all_embeddings = []
-
-    def extract_and_save_frames_and_metadata(
-            path_to_video, 
-            path_to_transcript, 
-            path_to_save_extracted_frames,
-            video_id):
-        
-        # metadatas will store the metadata of all extracted frames
-        metadatas = []
-
-        # load video using cv2
-        video = cv2.VideoCapture(path_to_video)
-        # load transcript using webvtt
-        trans = webvtt.read(path_to_transcript)
-        
-        # iterate transcript file
-        # for each video segment specified in the transcript file
-        for idx, transcript in enumerate(trans):
-            # get the start time and end time in seconds
-            start_time_ms = str2time(transcript.start)
-            end_time_ms = str2time(transcript.end)
-            # get the time in ms exactly 
-            # in the middle of start time and end time
-            mid_time_ms = (end_time_ms + start_time_ms) / 2
-            # get the transcript, remove the next-line symbol
-            text = transcript.text.replace("\n", ' ')
-            # get frame at the middle time
-            video.set(cv2.CAP_PROP_POS_MSEC, mid_time_ms)
-            success, frame = video.read()
-            if success:
-                # if the frame is extracted successfully, resize it
-                image = maintain_aspect_ratio_resize(frame, height=350)
-                # save frame as JPEG file
-                img_fname = f'frame_{idx}.jpg'
-                img_fpath = os.path.join(
-                    path_to_save_extracted_frames, img_fname
-                )
-                cv2.imwrite(img_fpath, image)
-
-                # prepare the metadata
-                metadata = {
-                    'extracted_frame_path': img_fpath,
-                    'transcript': text,
-                    'video_segment_id': idx,
-                    'video_path': path_to_video,
-                    'mid_time_ms': mid_time_ms,
-                    'video_id': video_id
-                }
-                metadatas.append(metadata)
-
-            else:
-                print(f"ERROR! Cannot extract frame: idx = {idx}")
-
-        return metadatas
 
     # List of video URLs to process
     video_urls = [
@@ -94,7 +38,8 @@ def process_videos():
         "https://www.youtube.com/watch?v=H5VRs7-17Kg"
     ]
 
-    # Process each video
+    # Download new or changed videos first; frames are then extracted for all of them in parallel
+    pending, refreshed = [], False
     for video_idx, video_url in enumerate(video_urls):
         video_id = f"video{video_idx + 1}"
         video_dir = VIDEO_PATH / video_id
@@ -105,9 +50,11 @@ def process_videos():
             # Download video
             video_filepath = download_video(video_url, str(video_dir))
             
-            # Check if video has been processed
-            fhash = file_hash(video_filepath)
-            if video_filepath in CACHE_META and CACHE_META[video_filepath] == fhash:
+            # Check if video has been processed (the file is only hashed when its stat changed)
+            fp, unchanged = fingerprint(video_filepath, CACHE_META.get(video_filepath))
+            if unchanged:
+                refreshed |= CACHE_META.get(video_filepath) != fp
+                CACHE_META[video_filepath] = fp
                 print(f"Skipping unchanged file: {video_filepath}")
                 continue
             
@@ -117,28 +64,45 @@ def process_videos():
             # Create directory for extracted frames
             extracted_frames_path = video_dir / 'extracted_frame'
             extracted_frames_path.mkdir(parents=True, exist_ok=True)
-            
-            # Extract frames and metadata
-            video_metadatas = extract_and_save_frames_and_metadata(
-                video_filepath,
-                transcript_filepath,
-                str(extracted_frames_path),
-                video_id
-            )
-            
+            pending.append((video_url, video_filepath, fp,
+                            (video_filepath, transcript_filepath, str(extracted_frames_path), video_id)))
+        except Exception as e:
+            print(f"Failed to process {video_url}: {e}")
+
+    if not pending:
+        if refreshed:
+            CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
+        print("No new videos or updates to process.")
+        return
+
+    metadata = json.loads(METADATA_FILE.read_text()) if METADATA_FILE.exists() else []
+    index = conform_metric(faiss.read_index(str(INDEX_FILE)), INDEX_CONFIG) if INDEX_FILE.exists() else None
+    all_embeddings = []
+
+    # Extract one frame per transcript window and its metadata, one process per video
+    try:
+        jobs = [job for *_, job in pending]
+        extracted = extract_videos(jobs, segments=[transcript_segments(job[1], WINDOW_CONFIG) for job in jobs])
+    except Exception as e:
+        print(f"Failed to extract frames: {e}")
+        extracted = []
+
+    for (video_url, video_filepath, fp, _), video_metadatas in zip(pending, extracted):
+        try:
             # Get embeddings for each frame's transcript
-            embeddings_for_file = []
-            for metadata in tqdm(video_metadatas, desc=f"Embedding {video_url}"):
-                embedding = get_embedding(metadata['transcript'])
-                embeddings_for_file.append(embedding)
+            print(f"Embedding {len(video_metadatas)} transcript segments of {video_url}")
+            embeddings_for_file = list(window_vectors(video_metadatas, get_embeddings, WINDOW_CONFIG))
             
             if embeddings_for_file:
+                if index is not None and index.d != len(embeddings_for_file[0]):
+                    raise ValueError(f"index has dimension {index.d} but new vectors have {len(embeddings_for_file[0])}; "
+                                     f"remove faiss_index/ to rebuild after changing caption_frames")
                 if index is None:
                     dim = len(embeddings_for_file[0])
-                    index = faiss.IndexFlatL2(dim)
-                index.add(np.stack(embeddings_for_file))
+                    index = new_index(dim, INDEX_CONFIG, with_ids=False)
+                index.add(prepare_vectors(np.stack(embeddings_for_file), index, INDEX_CONFIG))
                 metadata.extend(video_metadatas)
-                CACHE_META[video_filepath] = fhash
+                CACHE_META[video_filepath] = fp
                 
         except Exception as e:
             print(f"Failed to process {video_url}: {e}")
@@ -147,6 +111,7 @@ def process_videos():
     CACHE_FILE.write_text(json.dumps(CACHE_META, indent=2))
     METADATA_FILE.write_text(json.dumps(metadata, indent=2))
     if index and index.ntotal > 0:
+        index = maybe_promote(index, INDEX_CONFIG)
         faiss.write_index(index, str(INDEX_FILE))
         print("Saved FAISS index and metadata")
     else:
@@ -0,0 +1,152 @@
+# transcript_windows.py
+#
+# Groups WebVTT cues into time-bounded, overlapping windows so each indexed segment carries a
+# few sentences instead of a 2-5 word cue, and builds the (optionally multimodal) window vectors.
+
+import base64
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+import webvtt
+
+from frame_extractor import str2time
+
+# Settings under `transcript_windows:` in config/profiles.yaml; missing keys fall back to these.
+DEFAULT_WINDOW_CONFIG = {
+    "window_seconds": 20,       # longest span of one window; 0 = one segment per cue (no merging)
+    "overlap_seconds": 5,       # the next window starts this much before the previous one ends
+    "max_words": 120,           # close a window early when it reaches this many words
+    "caption_frames": False,    # also caption each window's frame and concatenate its embedding
+    "caption_model": "gemma3:12b",
+    "caption_weight": 0.3,      # share of the similarity that comes from the frame caption
+    "caption_concurrency": 2,
+}
+OLLAMA_GENERATE_URL = "http://localhost:11434/api/generate"
+CAPTION_PROMPT = "Describe what is shown in this video frame in one or two sentences."
+
+
+def _log(level: str, message: str) -> None:
+    sys.stderr.write(f"{level}: {message}\n")
+    sys.stderr.flush()
+
+
+def load_window_config(profile_path: Path) -> dict:
+    """Read the `transcript_windows:` section of a profiles.yaml, if there is one."""
+    config = {}
+    if Path(profile_path).exists():
+        import yaml
+        config = (yaml.safe_load(Path(profile_path).read_text()) or {}).get("transcript_windows", {}) or {}
+    return {**DEFAULT_WINDOW_CONFIG, **config}
+
+
+def transcript_cues(path_to_transcript) -> List[Tuple[float, float, str]]:
+    """(start ms, end ms, text) of every WebVTT cue, in file order."""
+    return [(str2time(cue.start), str2time(cue.end), cue.text.replace("\n", " "))
+            for cue in webvtt.read(path_to_transcript)]
+
+
+def window_cues(cues: Sequence[Tuple[float, float, str]], window_seconds: float = 20,
+                overlap_seconds: float = 5, max_words: int = 120) -> List[dict]:
+    """
+    Merge adjacent cues into windows of at most window_seconds (or max_words), each starting
+    overlap_seconds before the previous one ended. Every window holds at least one cue and the
+    representative frame is taken at its middle. With window_seconds 0 each cue is its own window.
+    """
+    window_ms, overlap_ms = window_seconds * 1000, overlap_seconds * 1000
+    windows = []
+    first = 0
+    while first < len(cues):
+        last, words = first, len(cues[first][2].split())
+        while last + 1 < len(cues) and cues[last + 1][1] - cues[first][0] <= window_ms \
+                and words + len(cues[last + 1][2].split()) <= max_words:
+            last += 1
+            words += len(cues[last][2].split())
+        start_ms, end_ms = cues[first][0], cues[last][1]
+        windows.append({
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "mid_time_ms": (start_ms + end_ms) / 2,
+            "text": " ".join(text.strip() for _, _, text in cues[first:last + 1]),
+            "cues": (first, last),
+        })
+        if last + 1 >= len(cues):
+            break
+        # Next window: first cue that starts at or after (end - overlap), always moving forward
+        restart = end_ms - overlap_ms
+        nxt = first + 1
+        while nxt <= last and cues[nxt][0] < restart:
+            nxt += 1
+        first = nxt
+    return windows
+
+
+def transcript_segments(path_to_transcript, config: Optional[dict] = None) -> List[Tuple[int, float, str]]:
+    """(segment index, middle time in ms, text) per window, the shape frame_extractor consumes."""
+    config = {**DEFAULT_WINDOW_CONFIG, **(config or {})}
+    cues = transcript_cues(path_to_transcript)
+    if not config["window_seconds"]:
+        return [(idx, (start + end) / 2, text) for idx, (start, end, text) in enumerate(cues)]
+    windows = window_cues(cues, config["window_seconds"], config["overlap_seconds"], config["max_words"])
+    return [(idx, window["mid_time_ms"], window["text"]) for idx, window in enumerate(windows)]
+
+
+def caption_frame(path: str, model: str, url: str = OLLAMA_GENERATE_URL) -> str:
+    encoded = base64.b64encode(Path(path).read_bytes()).decode("utf-8")
+    response = requests.post(url, json={"model": model, "prompt": CAPTION_PROMPT, "images": [encoded],
+                                        "stream": False}, timeout=300)
+    response.raise_for_status()
+    return response.json().get("response", "").strip()
+
+
+def combine_vectors(text_vecs: np.ndarray, caption_vecs: np.ndarray, caption_weight: float) -> np.ndarray:
+    """
+    [(1 - w) * text, w * caption] of unit vectors. Against multimodal_query(q) the inner product
+    is (1 - w) cos(q, text) + w cos(q, caption), so the index keeps a single vector per window.
+    All rows share one norm, so normalizing them for cosine search does not change the ranking.
+    """
+    def unit(v):
+        v = np.asarray(v, dtype=np.float32)
+        return v / np.maximum(np.linalg.norm(v, axis=1, keepdims=True), 1e-12)
+    return np.hstack([(1 - caption_weight) * unit(text_vecs), caption_weight * unit(caption_vecs)])
+
+
+def multimodal_query(query_vec: np.ndarray, index_dim: int) -> np.ndarray:
+    """Tile a text query vector to match an index built with combine_vectors()."""
+    query_vec = np.asarray(query_vec, dtype=np.float32).reshape(1, -1)
+    if query_vec.shape[1] * 2 != index_dim:
+        return query_vec
+    query_vec = query_vec / max(float(np.linalg.norm(query_vec)), 1e-12)
+    return np.hstack([query_vec, query_vec])
+
+
+def window_vectors(metadatas: List[dict], embed_batch: Callable[[Sequence[str]], np.ndarray],
+                   config: Optional[dict] = None) -> np.ndarray:
+    """
+    Embed the transcripts of one video's windows in one batched call. With caption_frames, each
+    window's frame is captioned (stored as metadata['frame_caption']) and its caption embedding
+    is concatenated, doubling the vector size; the index must then be built that way from scratch.
+    """
+    config = {**DEFAULT_WINDOW_CONFIG, **(config or {})}
+    text_vecs = np.asarray(embed_batch([m["transcript"] for m in metadatas]), dtype=np.float32)
+    if not config["caption_frames"] or not len(metadatas):
+        return text_vecs
+
+    def caption(meta):
+        try:
+            return caption_frame(meta["extracted_frame_path"], config["caption_model"])
+        except Exception as e:
+            _log("WARN", f"Could not caption {meta['extracted_frame_path']}: {e}")
+            return ""
+
+    with ThreadPoolExecutor(max_workers=config["caption_concurrency"]) as pool:
+        captions = list(pool.map(caption, metadatas))
+    for meta, text in zip(metadatas, captions):
+        meta["frame_caption"] = text
+    # Frames without a caption fall back to their transcript, so the caption half stays meaningful
+    caption_vecs = np.asarray(embed_batch([c or m["transcript"] for c, m in zip(captions, metadatas)]),
+                              dtype=np.float32)
+    return combine_vectors(text_vecs, caption_vecs, config["caption_weight"])
@@ -26,6 +26,8 @@ from langchain_core.prompt_values import PromptValue
 from langchain_core.messages import (
     MessageLikeRepresentation,
 )
+# Defined next to the frame extractor so its worker processes do not import this module
+from frame_extractor import str2time, maintain_aspect_ratio_resize
 
 MultimodalModelInput = Union[PromptValue, str, Sequence[MessageLikeRepresentation], Dict[str, Any]]
 
@@ -180,17 +182,6 @@ def format_timestamp(seconds: float, always_include_hours: bool = False, fractio
     hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
     return f"{hours_marker}{minutes:02d}:{seconds:02d}{fractionalSeperator}{milliseconds:03d}"
 
-# a help function that helps to convert a specific time written as a string in format `webvtt` into a time in miliseconds
-def str2time(strtime):
-    # strip character " if exists
-    strtime = strtime.strip('"')
-    # get hour, minute, second from time string
-    hrs, mins, seconds = [float(c) for c in strtime.split(':')]
-    # get the corresponding time as total seconds 
-    total_seconds = hrs * 60**2 + mins * 60 + seconds
-    total_miliseconds = total_seconds * 1000
-    return total_miliseconds
-    
 def _processText(text: str, maxLineWidth=None):
     if (maxLineWidth is None or maxLineWidth < 0):
         return text
@@ -198,30 +189,6 @@ def _processText(text: str, maxLineWidth=None):
     lines = textwrap.wrap(text, width=maxLineWidth, tabsize=4)
     return '\n'.join(lines)
 
-# Resizes a image and maintains aspect ratio
-def maintain_aspect_ratio_resize(image, width=None, height=None, inter=cv2.INTER_AREA):
-    # Grab the image size and initialize dimensions
-    dim = None
-    (h, w) = image.shape[:2]
-
-    # Return original image if no need to resize
-    if width is None and height is None:
-        return image
-
-    # We are resizing height if width is none
-    if width is None:
-        # Calculate the ratio of the height and construct the dimensions
-        r = height / float(h)
-        dim = (int(w * r), height)
-    # We are resizing width if height is none
-    else:
-        # Calculate the ratio of the width and construct the dimensions
-        r = width / float(w)
-        dim = (width, int(h * r))
-
-    # Return the resized image
-    return cv2.resize(image, dim, interpolation=inter)
-    
 # helper function to convert transcripts generated by whisper to .vtt file
 def write_vtt(transcript: Iterator[dict], file: TextIO, maxLineWidth=None):
     print("WEBVTT\n", file=file)